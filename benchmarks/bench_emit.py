@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark da emissão de RECORDs: serialização padrão do CDK (uma linha por print)
+contra o RecordWriter de source_btg/emit.py (orjson, envelope pré-serializado, blocos).
+As duas saídas são comparadas byte a byte antes da medição.
+
+    python benchmarks/bench_emit.py [--rows 200000]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from airbyte_cdk.entrypoint import AirbyteEntrypoint  # noqa: E402
+from airbyte_cdk.models import AirbyteMessage, AirbyteRecordMessage, Type  # noqa: E402
+
+from source_btg.emit import RecordWriter  # noqa: E402
+
+STREAM = "GESTORA_carteira"
+METADATA = {
+    "_route": STREAM,
+    "_category": "GESTORA",
+    "_endpoint": "carteira",
+    "_source_category": "GESTORA",
+    "_api_endpoint": "/reports/Portfolio",
+}
+
+
+def make_rows(n: int):
+    for i in range(n):
+        row = {
+            "Data": "2024-01-02",
+            "Fundo": "FUNDO MULTIMERCADO FIC FIM",
+            "Ativo": f"ATIVO{i % 500}",
+            "Quantidade": str(i * 10),
+            "Preco": "12,345678",
+            "Valor": f"{i * 123.45:.2f}",
+            "Descrição": "posição em carteira",
+            "_dt_referencia": "02/01/2024",
+            "_ticket_id": "3f2c9a4e8b0d4e6f9a1b2c3d4e5f6a7b",
+            "_row_number": i,
+            "_file_info": None,
+            **METADATA,
+        }
+        yield AirbyteMessage(type=Type.RECORD,
+                             record=AirbyteRecordMessage(stream=STREAM, data=row, emitted_at=1704204000000))
+
+
+def default_path(rows: int) -> bytes:
+    out = io.StringIO()
+    for message in make_rows(rows):
+        out.write(f"{AirbyteEntrypoint.airbyte_message_to_string(message)}\n")
+    return out.getvalue().encode()
+
+
+def fast_path(rows: int) -> bytes:
+    out = io.BytesIO()
+    writer = RecordWriter(write=out.write)
+    for message in make_rows(rows):
+        writer.record(message)
+    writer.flush()
+    return out.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if default_path(1000) != fast_path(1000):
+        sys.exit("saídas diferentes entre o CDK e o RecordWriter")
+    for name, fn in (("cdk", default_path), ("fast", fast_path)):
+        best = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            size = len(fn(args.rows))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{name:>5}: {best:.2f}s  {args.rows / best:,.0f} rec/s  {size / best / 1e6:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,15 +7,20 @@ This file serves as the entry point for Airbyte to run the connector.
 
 import sys
 import traceback
-from airbyte_cdk.entrypoint import launch
 from source_btg import SourceBtg
+from source_btg.emit import launch_fast
+from source_btg.plan import run_plan
 
 
 def main():
     """Main function to launch the BTG Source connector."""
     try:
         source = SourceBtg()
-        launch(source, sys.argv[1:])
+        if sys.argv[1:2] == ["plan"]:
+            # dry-run: tickets por stream e tempo estimado, sem chamar a API (source_btg/plan.py)
+            sys.exit(run_plan(source, sys.argv[2:]))
+        # RECORDs serializados em blocos (source_btg/emit.py); `fast_emit: false` volta ao padrão do CDK
+        launch_fast(source, sys.argv[1:])
     except Exception as e:
         print(f"Fatal error in BTG Source: {e}")
         traceback.print_exc()
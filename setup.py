@@ -4,6 +4,7 @@ MAIN_REQUIREMENTS = [
     "airbyte-cdk>=0.51.0",
     "requests>=2.28.0",
     "python-dateutil>=2.8.0",
+    "orjson>=3.9.0",
 ]
 
 TEST_REQUIREMENTS = [
@@ -22,6 +23,9 @@ setup(
     install_requires=MAIN_REQUIREMENTS,
     extras_require={
         "tests": TEST_REQUIREMENTS,
+        "token-cache": ["cryptography>=41.0.0"],
+        "asyncio": ["httpx[http2]>=0.24.0"],
+        "csv": ["pyarrow>=10.0.0"],
     },
     package_data={
         "": ["*.json", "*.yaml", "*.yml"],
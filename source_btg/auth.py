@@ -1,11 +1,21 @@
 # source_btg/auth.py
+import asyncio
 import logging
 import requests
+import threading
 import time
-from typing import Mapping, Any, Optional
+from typing import Mapping, Any, Optional, Tuple
+
+from .http import get_session, timeouts
+from .token_cache import get_token_cache
 
 log = logging.getLogger("airbyte")
 
+# token é renovado quando falta menos que isso para expirar
+EXPIRY_MARGIN = 300
+# renovação em background: quanto antes da margem acima
+RENEW_AHEAD = 300
+
 
 class BTGTokenProvider:
     """Provider de token com suporte a múltiplas categorias BTG"""
@@ -25,6 +35,9 @@ class BTGTokenProvider:
 
         self.token: Optional[str] = None
         self.token_expires_at: float = 0.0
+        # uma renovação por vez (threads e, via aget, corrotinas); ver get()
+        self._lock = threading.RLock()
+        self._renewal: Optional[threading.Timer] = None
 
         # ordem de preferência para o endpoint de token
         self.auth_url = (
@@ -33,6 +46,9 @@ class BTGTokenProvider:
             or self._derive_auth_from_base(self.config.get("base_url"))
         )
 
+        # cache em disco compartilhado entre processos (opcional)
+        self._cache = get_token_cache(self.config.get("token_cache_dir"))
+
         log.info(f"🔐 BTG auth init category={self.category} auth_url={self.auth_url}")
 
     @staticmethod
@@ -45,14 +61,76 @@ class BTGTokenProvider:
             base = base.split("/reports")[0]
         return base.rstrip("/") + "/connect/token"
 
-    def get(self) -> str:
-        """Retorna token válido (renova se estiver a <5min de expirar)."""
-        if self.token and time.time() < (self.token_expires_at - 300):
-            return self.token
-        self._refresh_token()
-        return self.token  # type: ignore[return-value]
+    def _valid(self) -> bool:
+        return bool(self.token) and time.time() < (self.token_expires_at - EXPIRY_MARGIN)
 
-    def _refresh_token(self) -> None:
+    def get(self) -> str:
+        """Retorna token válido (renova se estiver a <5min de expirar). Renovações concorrentes viram uma só."""
+        if self._valid():
+            return self.token  # type: ignore[return-value]
+        with self._lock:
+            if not self._valid():
+                self._obtain()
+            return self.token  # type: ignore[return-value]
+
+    async def aget(self) -> str:
+        """`get` para código asyncio: a renovação (bloqueante) roda fora do event loop."""
+        if self._valid():
+            return self.token  # type: ignore[return-value]
+        return await asyncio.get_running_loop().run_in_executor(None, self.get)
+
+    def _obtain(self) -> None:
+        """Renova o token (chamar com o lock)."""
+        self.token, self.token_expires_at = self._acquire()
+        self._schedule_renewal()
+
+    def _acquire(self, newer_than: float = 0.0) -> Tuple[str, float]:
+        """
+        (token, expires_at) novo, sem tocar no estado do provider. Com cache em disco, aceita o de outro
+        processo se expirar depois de `newer_than`.
+        """
+        if self._cache is None:
+            return self._fetch_token()
+
+        # só um processo renova; os demais reaproveitam o token que ele gravou
+        client_id = self.config.get("client_id")
+        client_secret = self.config.get("client_secret")
+        with self._cache.locked(self.auth_url, client_id):
+            cached = self._cache.load(self.auth_url, client_id, client_secret)
+            if cached and time.time() < (cached[1] - EXPIRY_MARGIN) and cached[1] > newer_than:
+                log.info(f"♻️  Token do cache category={self.category}")
+                return cached
+            token, expires_at = self._fetch_token()
+            self._cache.store(self.auth_url, client_id, client_secret, token, expires_at)
+            return token, expires_at
+
+    def _schedule_renewal(self) -> None:
+        """Agenda a renovação antes da margem de expiração, para o `get` nunca bloquear no caminho da request."""
+        if self._renewal is not None:
+            self._renewal.cancel()
+        lifetime = self.token_expires_at - time.time()
+        delay = max(lifetime / 2, lifetime - EXPIRY_MARGIN - RENEW_AHEAD)
+        self._renewal = threading.Timer(delay, self._renew_in_background)
+        self._renewal.daemon = True
+        self._renewal.start()
+
+    def _renew_in_background(self) -> None:
+        """Busca o token fora do lock (o `get` segue com o atual) e só troca se for mais novo que o em uso."""
+        current = self.token_expires_at
+        try:
+            token, expires_at = self._acquire(newer_than=current)
+        except Exception as e:
+            # o token atual ainda vale; o próximo get tenta de novo se preciso
+            log.warning(f"⚠️  Renovação em background falhou category={self.category}: {e}")
+            return
+        with self._lock:
+            # get/invalidate podem ter mexido no token enquanto isso: fica o que expira depois
+            if expires_at <= self.token_expires_at:
+                return
+            self.token, self.token_expires_at = token, expires_at
+            self._schedule_renewal()
+
+    def _fetch_token(self) -> Tuple[str, float]:
         client_id = self.config.get("client_id")
         client_secret = self.config.get("client_secret")
         if not client_id or not client_secret:
@@ -66,14 +144,14 @@ class BTGTokenProvider:
 
         try:
             log.info(f"🔄 Refreshing token category={self.category}")
-            r = requests.post(
+            r = get_session(self.auth_url, self.config.get("http_pool_size")).post(
                 self.auth_url,
                 data=payload,
                 headers={
                     "Content-Type": "application/x-www-form-urlencoded",
                     "Accept": "application/json",
                 },
-                timeout=30,
+                timeout=timeouts(self.config, read=30),
             )
             log.debug(f"Auth status={r.status_code} body={r.text[:300]}")
             r.raise_for_status()
@@ -84,19 +162,26 @@ class BTGTokenProvider:
                 raise Exception("No access_token in response")
 
             expires_in = int(data.get("expires_in", 3600))
-            self.token = token
-            self.token_expires_at = time.time() + expires_in
-
             log.info(f"✅ Token ok category={self.category} expires_in={expires_in}s (tok:{token[:12]}…)")
+            return token, time.time() + expires_in
 
         except requests.RequestException as e:
             msg = f"Auth request failed: {e}"
             log.error(msg)
             raise Exception(msg) from e
 
-    def invalidate(self) -> None:
-        self.token = None
-        self.token_expires_at = 0
+    def invalidate(self, token: Optional[str] = None) -> None:
+        """Descarta o token. Com `token`, só se ainda for o atual (outra thread pode já ter renovado após um 401)."""
+        with self._lock:
+            if token is not None and token != self.token:
+                return
+            if self._cache is not None and self.token:
+                self._cache.clear(self.auth_url, self.config.get("client_id"), self.config.get("client_secret"), self.token)
+            if self._renewal is not None:
+                self._renewal.cancel()
+                self._renewal = None
+            self.token = None
+            self.token_expires_at = 0
         log.info(f"🗑️  Token invalidated for {self.category}")
 
 
@@ -0,0 +1,130 @@
+# source_btg/emit.py
+import sys
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import logging
+from airbyte_cdk.entrypoint import AirbyteEntrypoint, launch
+from airbyte_cdk.models import AirbyteMessage, Type
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+try:
+    # airbyte-cdk que serializa o stdout pelo PRINT_BUFFER; nas versões antigas fica o launch padrão
+    from airbyte_cdk.logger import PRINT_BUFFER
+except ImportError:  # pragma: no cover - depende da versão do CDK
+    PRINT_BUFFER = None
+
+log = logging.getLogger("airbyte")
+
+# tamanho do bloco de RECORDs escrito de uma vez no stdout
+BLOCK_BYTES = 1024 * 1024
+
+
+def _write_stdout(block: bytes) -> None:
+    """Bloco direto no fd do stdout, depois do que já estiver no PRINT_BUFFER (logs/estado)."""
+    with PRINT_BUFFER.lock:
+        PRINT_BUFFER.flush()
+        out = sys.__stdout__
+        if hasattr(out, "buffer"):
+            out.buffer.write(block)
+            out.buffer.flush()
+        else:  # pragma: no cover - stdout sem camada binária
+            out.write(block.decode())
+            out.flush()
+
+
+class RecordWriter:
+    """
+    Serializa mensagens RECORD com orjson e as escreve em blocos, com a mesma saída do CDK
+    (`AirbyteEntrypoint.airbyte_message_to_string`), byte a byte:
+      - envelope (`{"type":"RECORD","record":{"stream":...,"data":`) pré-serializado por stream
+      - chaves de `data` com valor None ficam de fora, como no serializer do CDK (só no primeiro nível)
+      - qualquer outra mensagem (estado, log, trace) esvazia o bloco antes, mantendo a ordem
+    Registros que o orjson não serializa (ex. inteiro acima de 64 bits) caem no caminho padrão do CDK.
+    """
+
+    def __init__(self, write: Callable[[bytes], None] = _write_stdout, block_bytes: int = BLOCK_BYTES):
+        self._write = write
+        self._block_bytes = block_bytes
+        self._parts: List[bytes] = []
+        self._size = 0
+        self._envelopes: Dict[Tuple[str, Optional[str]], Tuple[bytes, bytes]] = {}
+
+    def _envelope(self, stream: str, namespace: Optional[str]) -> Tuple[bytes, bytes]:
+        """(prefixo, sufixo) da stream; calculado no primeiro registro."""
+        key = (stream, namespace)
+        envelope = self._envelopes.get(key)
+        if envelope is None:
+            prefix = b'{"type":"RECORD","record":{"stream":' + orjson.dumps(stream) + b',"data":'
+            suffix = b',"namespace":' + orjson.dumps(namespace) + b"}}\n" if namespace is not None else b"}}\n"
+            envelope = self._envelopes[key] = (prefix, suffix)
+        return envelope
+
+    def _serialize(self, message: AirbyteMessage) -> bytes:
+        record = message.record
+        if record.meta is not None or getattr(record, "file_reference", None) is not None:
+            return AirbyteEntrypoint.airbyte_message_to_string(message).encode() + b"\n"
+        data = record.data
+        if None in data.values():
+            data = {k: v for k, v in data.items() if v is not None}
+        try:
+            body = orjson.dumps(data)
+        except TypeError:
+            return AirbyteEntrypoint.airbyte_message_to_string(message).encode() + b"\n"
+        prefix, suffix = self._envelope(record.stream, record.namespace)
+        return b"".join((prefix, body, b',"emitted_at":%d' % record.emitted_at, suffix))
+
+    def record(self, message: AirbyteMessage) -> None:
+        line = self._serialize(message)
+        self._parts.append(line)
+        self._size += len(line)
+        if self._size >= self._block_bytes:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._parts:
+            self._write(b"".join(self._parts))
+            self._parts = []
+            self._size = 0
+
+
+class FastEntrypoint(AirbyteEntrypoint):
+    """
+    AirbyteEntrypoint com emissão rápida no `read`: RECORDs vão pelo RecordWriter
+    e só as demais mensagens seguem para a serialização padrão do CDK.
+    Desligado com `fast_emit: false` no config.
+    """
+
+    def read(self, source_spec, config, catalog, state) -> Iterable[AirbyteMessage]:
+        technical = config.get("technical") or {}
+        enabled = config.get("fast_emit", technical.get("fast_emit", True))
+        if not enabled:
+            yield from super().read(source_spec, config, catalog, state)
+            return
+
+        writer = RecordWriter()
+        try:
+            for message in super().read(source_spec, config, catalog, state):
+                if message.type == Type.RECORD:
+                    writer.record(message)
+                else:
+                    writer.flush()
+                    yield message
+        finally:
+            writer.flush()
+
+
+def launch_fast(source, args: List[str]) -> None:
+    """`airbyte_cdk.entrypoint.launch` com FastEntrypoint; sem orjson ou PRINT_BUFFER, o launch padrão."""
+    if orjson is None or PRINT_BUFFER is None:
+        log.debug("emissão rápida indisponível (orjson/airbyte_cdk.logger.PRINT_BUFFER); usando o launch do CDK")
+        launch(source, args)
+        return
+    entrypoint = FastEntrypoint(source)
+    parsed_args = entrypoint.parse_args(args)
+    with PRINT_BUFFER:
+        for message in entrypoint.run(parsed_args):
+            print(f"{message}\n", end="")
@@ -0,0 +1,66 @@
+# source_btg/http.py
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger("airbyte")
+
+DEFAULT_POOL_SIZE = 20
+DEFAULT_CONNECT_TIMEOUT = 10
+
+try:  # urllib3 só decodifica brotli se um dos pacotes estiver instalado
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:  # pragma: no cover - depende do ambiente
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+_SESSIONS: Dict[str, requests.Session] = {}
+_POOL_SIZES: Dict[str, int] = {}
+_LOCK = threading.Lock()
+
+
+def _host_key(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme or 'https'}://{parsed.netloc}"
+
+
+def get_session(url: str, pool_size: Optional[int] = None) -> requests.Session:
+    """
+    Session do processo para o host de `url` (submit, poll, download e token compartilham):
+      - conexões keep-alive reaproveitadas entre streams e categorias
+      - pool com até `pool_size` conexões (cresce se outra stream pedir mais)
+      - transferência comprimida (gzip/deflate, e br quando suportado)
+    """
+    key = _host_key(url)
+    size = int(pool_size or DEFAULT_POOL_SIZE)
+    with _LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            session = _SESSIONS[key] = requests.Session()
+            session.headers.update({"Accept-Encoding": ACCEPT_ENCODING, "Connection": "keep-alive"})
+        if size > _POOL_SIZES.get(key, 0):
+            log.debug(f"http: pool {key} com {size} conexões")
+            previous = session.adapters.get(key + "/")
+            session.mount(key + "/", HTTPAdapter(pool_connections=1, pool_maxsize=size))
+            _POOL_SIZES[key] = size
+            if previous is not None:
+                # conexões ociosas do pool antigo fecham já; as em uso, quando devolvidas
+                previous.close()
+        return session
+
+
+def timeouts(config, read: Optional[float] = None) -> Tuple[float, float]:
+    """(connect, read) a partir do config: `connect_timeout_seconds` e `http_timeout_seconds`."""
+    technical = config.get("technical") or {}
+    connect = config.get("connect_timeout_seconds") or technical.get("connect_timeout_seconds") or DEFAULT_CONNECT_TIMEOUT
+    if read is None:
+        read = config.get("http_timeout_seconds") or 60
+    return float(connect), float(read)
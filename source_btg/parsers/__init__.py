@@ -0,0 +1,26 @@
+"""
+Parsers de payload dos relatórios BTG.
+
+Os parsers consomem streams binários e emitem registros incrementalmente,
+para que a memória não cresça com o tamanho do arquivo. O formato de cada
+endpoint é declarado no ENDPOINT_CONFIGS (`format`) ou detectado pelos
+primeiros bytes (ver registry.py).
+"""
+
+from .block import RowBlock
+from .csv_parser import iter_csv_row_blocks, iter_csv_records, sniff_csv
+from .registry import get_parser, register_parser, sniff_format
+from .xml_parser import XMLParseError, element_to_dict, iter_xml_records
+
+__all__ = [
+    "RowBlock",
+    "XMLParseError",
+    "element_to_dict",
+    "get_parser",
+    "iter_csv_row_blocks",
+    "iter_csv_records",
+    "iter_xml_records",
+    "register_parser",
+    "sniff_csv",
+    "sniff_format",
+]
@@ -0,0 +1,117 @@
+import itertools
+from typing import Any, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - depende do ambiente
+    pa = None
+
+# registros heterogêneos (XML/JSON) agrupados por bloco
+ROWS_PER_BLOCK = 1_000
+
+
+def to_pylist(column: Any) -> list:
+    """Coluna como lista Python (pyarrow.Array é convertido só aqui)."""
+    return column.to_pylist() if hasattr(column, "to_pylist") else list(column)
+
+
+class RowBlock:
+    """
+    Bloco de linhas entre o parse e a emissão (não é um pyarrow.RecordBatch: as colunas podem ser
+    listas Python e os dicts de XML/JSON seguem como estão):
+      - colunar (`names` + `columns`, listas ou pyarrow.Array) para CSV, ou lista de dicts para XML/JSON
+      - metadados como colunas constantes (`constants`) ou por linha (`extra`), sem copiar as linhas
+      - `_row_number` como faixa a partir de `first_row`
+    Os dicts só são montados em `rows()`, um por linha (novo, as linhas do bloco não são alteradas),
+    já com todos os metadados.
+    """
+
+    __slots__ = ("names", "columns", "records", "constants", "extra", "first_row")
+
+    def __init__(self, names: Optional[Sequence[str]] = None, columns: Optional[Sequence[Any]] = None,
+                 records: Optional[List[dict]] = None, constants: Optional[Mapping[str, Any]] = None,
+                 extra: Optional[Mapping[str, Sequence[Any]]] = None, first_row: Optional[int] = None):
+        self.names = list(names or [])
+        self.columns = list(columns or [])
+        self.records = records
+        self.constants = dict(constants or {})
+        self.extra = dict(extra or {})
+        self.first_row = first_row
+
+    @classmethod
+    def from_records(cls, records: Iterable[Any], size: int = ROWS_PER_BLOCK) -> Iterator["RowBlock"]:
+        """Agrupa registros (não dict vira {"value": ...}) em blocos de `size`."""
+        it = iter(records)
+        while True:
+            chunk = [r if isinstance(r, dict) else {"value": r} for r in itertools.islice(it, size)]
+            if not chunk:
+                return
+            yield cls(records=chunk)
+
+    def __len__(self) -> int:
+        if self.records is not None:
+            return len(self.records)
+        return len(self.columns[0]) if self.columns else 0
+
+    num_rows = property(__len__)
+
+    def _derive(self, **changes) -> "RowBlock":
+        batch = RowBlock(self.names, self.columns, self.records, self.constants, self.extra, self.first_row)
+        for key, value in changes.items():
+            setattr(batch, key, value)
+        return batch
+
+    def with_constants(self, **values: Any) -> "RowBlock":
+        return self._derive(constants={**self.constants, **values})
+
+    def with_column(self, name: str, values: Sequence[Any]) -> "RowBlock":
+        return self._derive(extra={**self.extra, name: values})
+
+    def numbered(self, first_row: int) -> "RowBlock":
+        return self._derive(first_row=first_row)
+
+    def take(self, indices: Sequence[int]) -> "RowBlock":
+        """Só as linhas em `indices` (na ordem dada); colunas pyarrow continuam pyarrow."""
+
+        def pick(column: Any) -> Any:
+            if pa is not None and isinstance(column, pa.Array):
+                return column.take(pa.array(indices, pa.int64()))
+            return [column[i] for i in indices]
+
+        extra = {k: pick(v) for k, v in self.extra.items()}
+        if self.records is not None:
+            return self._derive(records=pick(self.records), extra=extra)
+        return self._derive(columns=[pick(c) for c in self.columns], extra=extra)
+
+    def column(self, name: str) -> Optional[list]:
+        """Valores de uma coluna do payload (None se não existir)."""
+        if self.records is not None:
+            return [rec.get(name) for rec in self.records] if any(name in rec for rec in self.records) else None
+        try:
+            return to_pylist(self.columns[self.names.index(name)])
+        except ValueError:
+            return None
+
+    def rows(self) -> Iterator[dict]:
+        """Um dict por linha: colunas do payload, metadados constantes, por linha e `_row_number`."""
+        # metadados entram como colunas (repeat/count) no mesmo zip: um único dict por linha
+        names = list(self.constants) + list(self.extra)
+        meta = [itertools.repeat(v) for v in self.constants.values()] + [to_pylist(v) for v in self.extra.values()]
+        if self.first_row is not None:
+            names.append("_row_number")
+            meta.append(itertools.count(self.first_row))
+
+        if self.records is not None:
+            if not names:
+                for rec in self.records:
+                    yield dict(rec)
+                return
+            for rec, values in zip(self.records, zip(*meta)):
+                row = dict(rec)
+                row.update(zip(names, values))
+                yield row
+            return
+
+        names = self.names + names
+        for row in zip(*[to_pylist(c) for c in self.columns], *meta):
+            yield dict(zip(names, row))
@@ -1,13 +1,192 @@
-from typing import List, Mapping
-import pandas as pd
-from io import BytesIO
+import codecs
+import csv
+import io
+import itertools
+from typing import IO, Any, Iterator, List, Optional, Tuple
 
+import logging
 
-def parse_csv(payload: bytes, sep: str = ",", encoding: str = "utf-8", header: bool = True) -> List[Mapping]:
-    opts = {"sep": sep, "dtype": str}
+from .block import RowBlock, to_pylist
+
+# engines vetorizados, em ordem de preferência; sem nenhum, csv da stdlib
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:  # pragma: no cover - depende do ambiente
+    pa = None
+try:
+    import pandas as pd
+except ImportError:  # pragma: no cover - depende do ambiente
+    pd = None
+
+log = logging.getLogger("airbyte")
+
+DELIMITERS = ",;\t|"
+CHUNK_ROWS = 50_000
+BLOCK_BYTES = 4 * 1024 * 1024
+SNIFF_BYTES = 64 * 1024
+
+# (cabeçalho, colunas) de um bloco: colunas de str já sem espaços nas bordas,
+# listas ou pyarrow.Array (convertidas só na emissão, ver block.to_pylist)
+Batch = Tuple[List[str], List[Any]]
+
+
+def sniff_encoding(head: bytes) -> str:
+    """utf-8 (com ou sem BOM) se os primeiros bytes decodificam; senão latin-1."""
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        head.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        # caractere multibyte cortado no fim da amostra não conta
+        if e.start >= len(head) - 3 and e.reason == "unexpected end of data":
+            return "utf-8"
+        return "latin-1"
+
+
+def sniff_csv(head: bytes) -> Optional[Tuple[str, str]]:
+    """(separador, encoding) se a amostra parece CSV (cabeçalho com separador + ao menos uma linha), senão None."""
+    encoding = sniff_encoding(head)
+    text = head.decode(encoding, errors="ignore")
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) < 2:
+        return None
+    header = lines[0]
+    try:
+        sep = csv.Sniffer().sniff("\n".join(lines[:20]), delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        # mesma preferência do parser antigo: vírgula, depois ponto e vírgula
+        sep = next((d for d in DELIMITERS if d in header), None)
+    if sep is None or sep not in header:
+        return None
+    return sep, encoding
+
+
+def _head(stream: IO[bytes], size: int) -> bytes:
+    if hasattr(stream, "peek"):
+        return stream.peek(size)[:size]
+    pos = stream.tell()
+    head = stream.read(size)
+    stream.seek(pos)
+    return head
+
+
+def _is_decode_error(exc: BaseException) -> bool:
+    if isinstance(exc, UnicodeDecodeError):
+        return True
+    return pa is not None and isinstance(exc, pa.ArrowInvalid) and "UTF8" in str(exc)
+
+
+def iter_csv_batches(stream: IO[bytes], sep: Optional[str] = None, encoding: Optional[str] = None,
+                     chunk_rows: int = CHUNK_ROWS) -> Iterator[Batch]:
+    """
+    CSV em blocos colunares (pyarrow > pandas > stdlib), sem montar um dict por linha.
+      - separador/encoding detectados na amostra inicial quando não informados
+      - campos entre aspas são respeitados; linhas com campos a mais são descartadas, e as curtas
+        também (no engine pandas elas completam com "")
+      - se um byte inválido em utf-8 aparecer depois da amostra, relê em latin-1 a partir da linha em que parou
+    """
+    head = _head(stream, SNIFF_BYTES)
+    if sep is None or encoding is None:
+        sniffed = sniff_csv(head)
+        if sniffed is None:
+            raise ValueError("conteúdo não parece CSV")
+        sep = sep or sniffed[0]
+        encoding = encoding or sniffed[1]
+
+    start = stream.tell() if stream.seekable() else None
+    emitted = 0
+    try:
+        for batch in _read(stream, head, sep, encoding, chunk_rows):
+            emitted += len(batch[1][0]) if batch[1] else 0
+            yield batch
+    except Exception as e:
+        if not _is_decode_error(e) or encoding == "latin-1" or start is None:
+            raise
+        log.debug(f"csv: utf-8 inválido após {emitted} linhas, relendo em latin-1")
+        stream.seek(start)
+        skip = emitted
+        for headers, columns in _read(stream, head, sep, "latin-1", chunk_rows):
+            rows = len(columns[0]) if columns else 0
+            if skip >= rows:
+                skip -= rows
+                continue
+            yield headers, [col[skip:] for col in columns]
+            skip = 0
+
+
+def iter_csv_records(stream: IO[bytes], sep: Optional[str] = None, encoding: Optional[str] = None,
+                     chunk_rows: int = CHUNK_ROWS) -> Iterator[dict]:
+    """Um dict por linha (valores str, sem espaços nas bordas), montado bloco a bloco."""
+    for headers, columns in iter_csv_batches(stream, sep, encoding, chunk_rows):
+        for row in zip(*[to_pylist(c) for c in columns]):
+            yield dict(zip(headers, row))
+
+
+def iter_csv_row_blocks(stream: IO[bytes], sep: Optional[str] = None, encoding: Optional[str] = None,
+                        chunk_rows: int = CHUNK_ROWS) -> Iterator[RowBlock]:
+    """Blocos colunares como RowBlock (dicts só na emissão)."""
+    for headers, columns in iter_csv_batches(stream, sep, encoding, chunk_rows):
+        yield RowBlock(headers, columns)
+
+
+def _read(stream: IO[bytes], head: bytes, sep: str, encoding: str, chunk_rows: int) -> Iterator[Batch]:
+    if pa is not None:
+        return _read_arrow(stream, head, sep, encoding)
+    if pd is not None:
+        return _read_pandas(stream, sep, encoding, chunk_rows)
+    return _read_stdlib(stream, sep, encoding)
+
+
+def _header_names(head: bytes, sep: str, encoding: str) -> List[str]:
+    text = head.decode(encoding, errors="ignore").lstrip("\ufeff")
+    line = next((ln for ln in text.splitlines() if ln.strip()), "")
+    return next(csv.reader([line], delimiter=sep), [])
+
+
+def _read_arrow(stream: IO[bytes], head: bytes, sep: str, encoding: str) -> Iterator[Batch]:
+    names = _header_names(head, sep, encoding)
+    reader = pacsv.open_csv(
+        stream,
+        read_options=pacsv.ReadOptions(block_size=BLOCK_BYTES,
+                                       encoding="utf8" if encoding.startswith("utf-8") else encoding),
+        parse_options=pacsv.ParseOptions(delimiter=sep, newlines_in_values=True,
+                                         invalid_row_handler=lambda row: "skip"),
+        convert_options=pacsv.ConvertOptions(column_types={n: pa.string() for n in names},
+                                             strings_can_be_null=False, quoted_strings_can_be_null=False),
+    )
+    headers = [n.strip() for n in reader.schema.names]
+    for batch in reader:
+        if batch.num_rows:
+            yield headers, [pc.utf8_trim_whitespace(col) for col in batch.columns]
+
+
+def _read_pandas(stream: IO[bytes], sep: str, encoding: str, chunk_rows: int) -> Iterator[Batch]:
+    reader = pd.read_csv(stream, sep=sep, encoding=encoding, dtype=str, na_filter=False,
+                         skip_blank_lines=True, on_bad_lines="skip", chunksize=chunk_rows, engine="c")
+    with reader:
+        for chunk in reader:
+            # aqui linhas curtas não são distinguíveis: completam com ""
+            if len(chunk):
+                yield ([str(c).strip() for c in chunk.columns],
+                       [chunk[c].str.strip().tolist() for c in chunk.columns])
+
+
+def _read_stdlib(stream: IO[bytes], sep: str, encoding: str) -> Iterator[Batch]:
+    text = io.TextIOWrapper(stream, encoding=encoding, newline="")
     try:
-        df = pd.read_csv(BytesIO(payload), encoding=encoding, **opts) if header else pd.read_csv(BytesIO(payload), encoding=encoding, header=None, **opts)
-    except Exception:
-        # fallback para latin1
-        df = pd.read_csv(BytesIO(payload), encoding="latin1", **opts) if header else pd.read_csv(BytesIO(payload), encoding="latin1", header=None, **opts)
-    return df.fillna("").to_dict(orient="records")
\ No newline at end of file
+        # linhas vazias viram [] no csv.reader; só espaços caem no filtro de largura
+        rows = filter(None, csv.reader(text, delimiter=sep))
+        headers = [h.strip() for h in next(rows, [])]
+        width = len(headers)
+        while True:
+            raw = list(itertools.islice(rows, CHUNK_ROWS))
+            if not raw:
+                return
+            block = [row for row in raw if len(row) == width]
+            if block:
+                yield headers, [[v.strip() for v in col] for col in zip(*block)]
+    finally:
+        text.detach()
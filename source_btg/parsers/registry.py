@@ -0,0 +1,107 @@
+import codecs
+import json
+from typing import IO, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from ..utils import dot_get
+from .block import RowBlock
+from .csv_parser import CHUNK_ROWS, SNIFF_BYTES, iter_csv_row_blocks, sniff_csv, sniff_encoding
+from .xml_parser import iter_xml_records
+
+# parser(stream, options) -> blocos; options: record_path, encoding, delimiter, chunk_rows
+Parser = Callable[[IO[bytes], Mapping], Iterator[RowBlock]]
+Sniffer = Callable[[bytes], bool]
+
+_PARSERS: Dict[str, Parser] = {}
+_SNIFFERS: List[Tuple[str, Sniffer]] = []
+DEFAULT_FORMAT = "text"
+
+
+def register_parser(name: str, sniff: Optional[Sniffer] = None) -> Callable[[Parser], Parser]:
+    """
+    Registra o parser de um formato (`format` no ENDPOINT_CONFIGS).
+    Com `sniff`, o formato também é detectado pelos primeiros bytes, na ordem de registro.
+    """
+
+    def decorator(fn: Parser) -> Parser:
+        _PARSERS[name] = fn
+        if sniff is not None:
+            _SNIFFERS[:] = [(n, s) for n, s in _SNIFFERS if n != name] + [(name, sniff)]
+        return fn
+
+    return decorator
+
+
+def get_parser(name: str) -> Parser:
+    try:
+        return _PARSERS[name]
+    except KeyError:
+        raise ValueError(f"formato de payload desconhecido: {name!r} (registrados: {sorted(_PARSERS)})")
+
+
+def first_byte(head: bytes) -> bytes:
+    """Primeiro byte significativo (ignora BOM e espaços)."""
+    if head.startswith(codecs.BOM_UTF8):
+        head = head[len(codecs.BOM_UTF8):]
+    return head.lstrip()[:1]
+
+
+def sniff_format(head: bytes) -> str:
+    """Formato do payload a partir da amostra inicial (até SNIFF_BYTES)."""
+    for name, sniff in _SNIFFERS:
+        if sniff(head):
+            return name
+    return DEFAULT_FORMAT
+
+
+def _decode(data: bytes, encoding: Optional[str], errors: str = "strict") -> str:
+    """Decodifica com o encoding declarado ou detectado na amostra (utf-8, BOM ou latin-1)."""
+    return data.decode(encoding or sniff_encoding(data[:SNIFF_BYTES]), errors)
+
+
+@register_parser("xml", sniff=lambda head: first_byte(head) == b"<")
+def parse_xml_blocks(stream: IO[bytes], options: Mapping) -> Iterator[RowBlock]:
+    """Um registro por elemento em `record_path`; sem ele, o documento inteiro (nada se vazio)."""
+    record_path = options.get("record_path")
+    records = iter_xml_records(stream, record_path)
+    if not record_path:
+        records = (rec for rec in records if rec)
+    yield from RowBlock.from_records(records)
+
+
+@register_parser("json", sniff=lambda head: first_byte(head) in (b"{", b"["))
+def parse_json_blocks(stream: IO[bytes], options: Mapping) -> Iterator[RowBlock]:
+    """
+    Documento inteiro (json não tem leitura incremental aqui); `record_path` aponta a lista de registros
+    (lista = candidatos, vale o primeiro presente; nenhum presente = o documento inteiro).
+    """
+    data = json.loads(_decode(stream.read(), options.get("encoding")))
+    record_path = options.get("record_path")
+    paths = [record_path] if isinstance(record_path, str) else list(record_path or [])
+    node = next((found for found in (dot_get(data, p) for p in paths if p) if found is not None), data)
+    yield from RowBlock.from_records(node if isinstance(node, list) else [node])
+
+
+@register_parser("csv", sniff=lambda head: sniff_csv(head) is not None)
+def parse_csv_blocks(stream: IO[bytes], options: Mapping) -> Iterator[RowBlock]:
+    """Blocos colunares; separador/encoding declarados ou detectados na amostra."""
+    yield from iter_csv_row_blocks(stream, options.get("delimiter"), options.get("encoding"),
+                                       int(options.get("chunk_rows") or CHUNK_ROWS))
+
+
+@register_parser("text")
+def parse_text_blocks(stream: IO[bytes], options: Mapping) -> Iterator[RowBlock]:
+    """Texto simples: linhas com separador viram registros (CSV básico); senão um único `raw_content`."""
+    text = _decode(stream.read(), options.get("encoding"), errors="ignore").strip()
+    lines = text.split("\n") if "\n" in text else []
+    sep = "," if lines and "," in lines[0] else ";"
+    if len(lines) > 1 and ("," in text or ";" in text):
+        headers = [h.strip() for h in lines[0].split(sep)]
+        rows = []
+        for line in lines[1:]:
+            if line.strip():
+                values = [v.strip() for v in line.split(sep)]
+                if len(values) == len(headers):
+                    rows.append(dict(zip(headers, values)))
+        yield RowBlock(records=rows or [{"csv_content": text}])
+        return
+    yield RowBlock(records=[{"raw_content": text}])
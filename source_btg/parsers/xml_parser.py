@@ -1,15 +1,141 @@
-from typing import List, Mapping
-import xmltodict
-from ..utils import dot_get
-
-
-def parse_xml(payload: bytes, record_path: str | None) -> List[Mapping]:
-    doc = xmltodict.parse(payload)
-    if not record_path:
-        return [{"xml_raw": xmltodict.unparse(doc)}]
-    node = dot_get(doc, record_path)
-    if node is None:
-        return []
-    if isinstance(node, list):
-        return [x if isinstance(x, dict) else {"value": x} for x in node]
-    return [node if isinstance(node, dict) else {"value": node}]
\ No newline at end of file
+from typing import IO, Iterator, List, Optional, Sequence, Union
+
+try:  # lxml é mais rápido e aguenta árvores grandes; stdlib como fallback
+    from lxml import etree as _etree
+
+    XMLParseError = (_etree.XMLSyntaxError,)
+
+    def _iterparse(source: IO[bytes]):
+        return _etree.iterparse(source, events=("start", "end"), huge_tree=True, resolve_entities=False)
+
+except ImportError:  # pragma: no cover - depende do ambiente
+    import xml.etree.ElementTree as _etree
+
+    XMLParseError = (_etree.ParseError,)
+
+    def _iterparse(source: IO[bytes]):
+        return _etree.iterparse(source, events=("start", "end"))
+
+
+# campos de contexto (atributos/escalares dos ancestrais) levados a cada registro, por elemento
+CONTEXT_FIELDS = 64
+
+
+def _local(tag) -> str:
+    """Nome do elemento sem namespace ('{ns}Fund' -> 'Fund')."""
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def element_to_dict(element) -> dict:
+    """Converte o elemento em dict: texto em 'text', atributos no nível, filhos repetidos viram lista."""
+    result = {}
+    if element.text and element.text.strip():
+        result['text'] = element.text.strip()
+    for child in element:
+        if not isinstance(child.tag, str):  # comentários/PIs (lxml)
+            continue
+        child_data = element_to_dict(child)
+        if child.tag in result:
+            if not isinstance(result[child.tag], list):
+                result[child.tag] = [result[child.tag]]
+            result[child.tag].append(child_data)
+        else:
+            result[child.tag] = child_data
+    result.update(element.attrib)
+    return result
+
+
+def _matches(path: List[str], target: List[str]) -> bool:
+    return len(path) == len(target) and all(t == "*" or t == p for p, t in zip(path, target))
+
+
+def _on_path(path: List[str], target: List[str]) -> bool:
+    """`path` é ancestral (ou o próprio) de um elemento em `target`."""
+    return len(path) <= len(target) and all(t == "*" or t == p for p, t in zip(path, target))
+
+
+def _flat(element) -> bool:
+    """Bloco pequeno só de escalares, ex. um cabeçalho `<Header><Fund>..</Fund></Header>`."""
+    return len(element) <= CONTEXT_FIELDS and all(isinstance(c.tag, str) and len(c) == 0 for c in element)
+
+
+def _inherit(fields: dict, element) -> None:
+    """Campo herdado pelos registros seguintes: primeira ocorrência de cada nome, até CONTEXT_FIELDS."""
+    if element.tag not in fields and len(fields) < CONTEXT_FIELDS:
+        fields[element.tag] = element_to_dict(element)
+
+
+def iter_xml_records(source: IO[bytes], record_path: Union[None, str, Sequence[str]] = None) -> Iterator[dict]:
+    """
+    Parse incremental de XML.
+      - record_path (ex.: 'Report.Positions.Position', nomes sem namespace a partir da raiz; `*` casa
+        qualquer nome; lista = caminhos candidatos): emite um registro por elemento repetido e libera
+        cada um assim que é emitido. Atributos dos ancestrais e campos escalares (ou blocos pequenos
+        só de escalares, como um cabeçalho) que eles trazem antes do registro vão junto em cada
+        registro, sem sobrescrever os campos dele; o resto fora do caminho é descartado
+      - sem record_path: emite o documento inteiro como um único registro
+    Levanta XMLParseError se o documento estiver malformado.
+    """
+    paths = [record_path] if isinstance(record_path, str) else list(record_path or [])
+    targets: List[List[str]] = [p.split(".") for p in paths if p]
+    path: List[str] = []
+    stack: list = []
+    # campos herdados de cada elemento aberto fora dos registros (atributos + escalares já fechados)
+    context: List[dict] = []
+    # elemento que perdeu um filho aninhado (ou registro): não é mais um bloco só de escalares
+    nested: List[bool] = []
+    depth_in_record = 0  # > 0 enquanto estamos dentro de um registro
+
+    for event, elem in _iterparse(source):
+        if event == "start":
+            path.append(_local(elem.tag))
+            stack.append(elem)
+            if depth_in_record or any(_matches(path, t) for t in targets):
+                depth_in_record += 1
+            context.append(dict(elem.attrib) if targets and not depth_in_record else {})
+            nested.append(False)
+            continue
+
+        # event == "end"
+        is_record = depth_in_record == 1 and any(_matches(path, t) for t in targets)
+        inside = depth_in_record > 0
+        stack.pop()
+        path.pop()
+        context.pop()
+        lost_child = nested.pop()
+        parent = stack[-1] if stack else None
+
+        if is_record:
+            record = element_to_dict(elem)
+            if any(context):
+                inherited: dict = {}
+                for fields in context:
+                    inherited.update(fields)
+                record = {**inherited, **record}
+            yield record
+        if inside:
+            depth_in_record -= 1
+            if not is_record:
+                continue
+
+        if parent is None:
+            if not targets:
+                yield element_to_dict(elem)
+            continue
+        if not targets:
+            continue
+
+        # elemento fechado fora dos registros: escalares viram contexto dos próximos registros
+        if is_record:
+            nested[-1] = True
+        elif len(elem) == 0 and not lost_child:
+            _inherit(context[-1], elem)
+            if len(parent) <= CONTEXT_FIELDS:
+                continue  # fica na árvore: o pai pode ser um bloco só de escalares
+            nested[-1] = True
+        else:
+            if not lost_child and _flat(elem):
+                _inherit(context[-1], elem)
+            nested[-1] = True
+        elem.clear()
+        parent.remove(elem)
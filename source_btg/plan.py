@@ -0,0 +1,97 @@
+# source_btg/plan.py
+import argparse
+import contextlib
+import json
+import sys
+from typing import Any, Dict, List, Mapping, Optional, Set
+
+import logging
+from airbyte_cdk.models import AirbyteStateType, SyncMode
+
+log = logging.getLogger("airbyte")
+
+
+def _stream_states(state_messages: List[Any]) -> Dict[str, Mapping[str, Any]]:
+    """State por stream (formato per-stream do Airbyte) como dicts."""
+    states: Dict[str, Mapping[str, Any]] = {}
+    for message in state_messages or []:
+        if message.type == AirbyteStateType.STREAM and message.stream and message.stream.stream_state:
+            states[message.stream.stream_descriptor.name] = dict(message.stream.stream_state.__dict__)
+    return states
+
+
+def plan_sync(source, config: Mapping[str, Any], catalog=None, state_messages: Optional[List[Any]] = None,
+              sync_mode: SyncMode = SyncMode.incremental) -> Dict[str, Any]:
+    """
+    Plano da sincronização sem chamar a API de relatórios: `AsyncJobStream.plan` de cada stream
+    (só as do catalog, quando informado, com o sync_mode de cada uma) e os totais.
+    Pedidos idênticos entre categorias contam um ticket só, na primeira stream que os faz.
+    O tempo total soma as streams, que o CDK lê uma depois da outra.
+    """
+    modes = {s.stream.name: s.sync_mode for s in catalog.streams} if catalog is not None else None
+    states = _stream_states(state_messages)
+    streams = []
+    shared: Set[str] = set()
+    for stream in source.streams(json.loads(json.dumps(config))):
+        if modes is not None and stream.name not in modes:
+            continue
+        mode = modes[stream.name] if modes is not None else sync_mode
+        streams.append(stream.plan(mode, states.get(stream.name), shared))
+
+    estimates = [s["estimated_seconds"] for s in streams]
+    return {
+        "streams": streams,
+        "total": {
+            "streams": len(streams),
+            "slices": sum(s["slices"] for s in streams),
+            "tickets": sum(s["tickets"] for s in streams),
+            "cached": sum(s["cached"] for s in streams),
+            "shared": sum(s["shared"] for s in streams),
+            "resumable": sum(s["resumable"] for s in streams),
+            "estimated_seconds": None if None in estimates else round(sum(estimates), 1),
+            "streams_without_history": [s["stream"] for s in streams if s["estimated_seconds"] is None],
+        },
+    }
+
+
+@contextlib.contextmanager
+def _logs_to_stderr():
+    """Logs do CDK (handlers no stdout/PRINT_BUFFER) vão para o stderr enquanto o plano é montado."""
+    handlers = [h for name in (None, "airbyte") for h in logging.getLogger(name).handlers
+                if isinstance(h, logging.StreamHandler) and h.stream is not sys.stderr]
+    streams = [h.setStream(sys.stderr) for h in handlers]
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            yield
+    finally:
+        for handler, stream in zip(handlers, streams):
+            handler.setStream(stream)
+
+
+def run_plan(source, args: List[str]) -> int:
+    """
+    CLI `plan` (dry-run), ao lado de spec/check/discover/read:
+        main.py plan --config config.json [--catalog catalog.json] [--state state.json] [--max-tickets N]
+    Imprime o plano em JSON; com --max-tickets, sai com 2 se o total de tickets passar do limite.
+    """
+    parser = argparse.ArgumentParser(prog="plan", description="Quantos tickets a sincronização dispararia")
+    parser.add_argument("--config", required=True)
+    parser.add_argument("--catalog")
+    parser.add_argument("--state")
+    parser.add_argument("--sync-mode", choices=[m.value for m in SyncMode], default=SyncMode.incremental.value)
+    parser.add_argument("--max-tickets", type=int)
+    parsed = parser.parse_args(args)
+
+    config = source.read_config(parsed.config)
+    catalog = source.read_catalog(parsed.catalog) if parsed.catalog else None
+    state = source.read_state(parsed.state) if parsed.state else []
+    # stdout fica só com o plano
+    with _logs_to_stderr():
+        result = plan_sync(source, config, catalog, state, SyncMode(parsed.sync_mode))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+    tickets = result["total"]["tickets"]
+    if parsed.max_tickets is not None and tickets > parsed.max_tickets:
+        print(f"plan: {tickets} tickets excede o limite de {parsed.max_tickets}", file=sys.stderr)
+        return 2
+    return 0
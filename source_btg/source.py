@@ -1,15 +1,33 @@
 from airbyte_cdk.sources import AbstractSource
 from airbyte_cdk.sources.streams import Stream
-from airbyte_cdk.models import ConnectorSpecification
-from typing import Any, List, Mapping, Tuple
+from airbyte_cdk.models import AirbyteMessage, AirbyteStateMessage, ConfiguredAirbyteCatalog, ConnectorSpecification
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Set, Tuple
 
 from .streams.base_async import AsyncJobStream
 from .auth import BTGTokenProvider
 from .streams.endpoint_configs import ENDPOINT_CONFIGS
+from .streams.shared import RequestRegistry
 import logging
 
 class SourceBtg(AbstractSource):
 
+    def __init__(self):
+        super().__init__()
+        # pedidos idênticos entre categorias (streams/shared.py): um registro por sincronização
+        self.request_registry: Optional[RequestRegistry] = None
+        self._selected_streams: Optional[Set[str]] = None
+
+    def read(self, logger: logging.Logger, config: Mapping[str, Any], catalog: ConfiguredAirbyteCatalog,
+             state: Optional[List[AirbyteStateMessage]] = None) -> Iterator[AirbyteMessage]:
+        # só as streams do catalog contam como consumidoras dos pedidos compartilhados
+        self._selected_streams = {s.stream.name for s in catalog.streams}
+        try:
+            yield from super().read(logger, config, catalog, state)
+        finally:
+            self._selected_streams = None
+            if self.request_registry is not None:
+                self.request_registry.close()
+
     # ---------- SPEC ----------
     def spec(self, logger) -> ConnectorSpecification:
         return ConnectorSpecification(
@@ -119,10 +137,16 @@ class SourceBtg(AbstractSource):
 
                         "type":"string",
                         "title":"fundName - usado nas rotas carteira e taxa performance",
-                        "description": "define o nome do fundo para requisicao",
+                        "description": "define o nome do fundo para requisicao (vários separados por vírgula)",
                         "default": "RIZA MEYENII RFX FIM",
                         "examples": ["RIZA MEYENII RFX FIM"]
                     },
+                    "fund_demux": {
+                        "type": "boolean",
+                        "title": "Fund Demux",
+                        "description": "carteira/taxa performance: um ticket sem o filtro fundName para todos os fundos, com as linhas separadas por fundo localmente (_fund_name)",
+                        "default": False
+                    },
 
 
                     # === DATE RANGE ===
@@ -137,7 +161,7 @@ class SourceBtg(AbstractSource):
                         "type": "string",
                         "format": "date",
                         "title": "End Date", 
-                        "description": "End date for date-enabled endpoints",
+                        "description": "End date for date-enabled endpoints (vazio = até hoje)",
                         "examples": ["2024-01-17"]
                     },
                     "date_step_days": {
@@ -147,6 +171,27 @@ class SourceBtg(AbstractSource):
                         "default": 1,
                         "minimum": 1
                     },
+                    "lookback_days": {
+                        "type": "integer",
+                        "title": "Lookback Days",
+                        "description": "Em syncs incrementais, quantos dias antes do cursor salvo reprocessar (correções tardias)",
+                        "default": 0,
+                        "minimum": 0
+                    },
+                    "date_window_days": {
+                        "type": "integer",
+                        "title": "Date Window Days",
+                        "description": "Tamanho máximo (dias) da janela startDate/endDate dos endpoints que aceitam intervalo; 1 = um ticket por dia",
+                        "default": 31,
+                        "minimum": 1
+                    },
+                    "window_max_bytes": {
+                        "type": "integer",
+                        "title": "Window Max Bytes",
+                        "description": "Payload acima desse tamanho reduz as próximas janelas pela metade",
+                        "default": 268435456,
+                        "minimum": 1
+                    },
                     
                     # === CATEGORY (SIMPLE) ===
                     "category": {
@@ -169,6 +214,133 @@ class SourceBtg(AbstractSource):
                         "title": "Timeout Seconds",
                         "default": 300,
                         "minimum": 30
+                    },
+                    "fast_emit": {
+                        "type": "boolean",
+                        "title": "Fast Record Emission",
+                        "description": "Serializa RECORDs com orjson e escreve no stdout em blocos, com o envelope da mensagem pré-serializado por stream; saída idêntica à do CDK (main.py)",
+                        "default": True
+                    },
+                    "skip_unchanged_snapshots": {
+                        "type": "boolean",
+                        "title": "Skip Unchanged Snapshots",
+                        "description": "Rotas sem data que devolvem o cadastro inteiro (ex. cadastro_fundos): no incremental, não reemite o payload se o conteúdo for igual ao da última sincronização (fingerprint no state)",
+                        "default": True
+                    },
+                    "share_requests": {
+                        "type": "boolean",
+                        "title": "Share Identical Requests",
+                        "description": "Categorias com as mesmas credenciais pedindo o mesmo relatório (mesma rota e corpo) usam um único ticket e download; cada stream emite seus registros",
+                        "default": True
+                    },
+                    "share_spill_bytes": {
+                        "type": "integer",
+                        "title": "Shared Result Spill Bytes",
+                        "description": "Resultado compartilhado que ainda vai ser lido por outra categoria: payloads a partir deste tamanho esperam em arquivo temporário em vez de ficar em memória",
+                        "default": 1048576,
+                        "minimum": 0
+                    },
+                    "engine": {
+                        "type": "string",
+                        "title": "Execution Engine",
+                        "description": "threads: requests + poller em thread; asyncio: corrotinas sobre httpx (HTTP/2), requer httpx",
+                        "enum": ["threads", "asyncio"],
+                        "default": "threads"
+                    },
+                    "rate_limits": {
+                        "type": "object",
+                        "title": "Rate Limits",
+                        "description": "Requests/segundo por categoria e tipo de rota; ausente = sem limite até o primeiro 429. A taxa se adapta a 429/Retry-After",
+                        "properties": {
+                            "submit": {"type": "number", "minimum": 0},
+                            "poll": {"type": "number", "minimum": 0},
+                            "download": {"type": "number", "minimum": 0},
+                            "global": {"type": "number", "minimum": 0, "description": "Teto agregado de todas as categorias e rotas"},
+                            "burst": {"type": "number", "minimum": 1}
+                        }
+                    },
+                    "category_rate_limits": {
+                        "type": "object",
+                        "title": "Category Rate Limits",
+                        "description": "Sobrescreve rate_limits por categoria, ex.: {\"GESTORA\": {\"submit\": 1}}",
+                        "additionalProperties": {"type": "object"}
+                    },
+                    "connect_timeout_seconds": {
+                        "type": "integer",
+                        "title": "Connect Timeout Seconds",
+                        "description": "Timeout de conexão (o de leitura continua sendo o das requests)",
+                        "default": 10,
+                        "minimum": 1
+                    },
+                    "http_pool_size": {
+                        "type": "integer",
+                        "title": "HTTP Pool Size",
+                        "description": "Conexões keep-alive por host, compartilhadas por todas as streams e pelo token",
+                        "default": 20,
+                        "minimum": 1
+                    },
+                    "max_concurrent_tickets": {
+                        "type": "integer",
+                        "title": "Max Concurrent Tickets",
+                        "description": "Quantos slices são submetidos/pollados/baixados à frente do consumo (1 = serial). Acima de 1, os tickets já submetidos vão para o state e são retomados se a sincronização cair",
+                        "default": 1,
+                        "minimum": 1
+                    },
+                    "max_polls_per_second": {
+                        "type": "number",
+                        "title": "Max Polls Per Second",
+                        "description": "Limite agregado de consultas a /reports/Ticket no processo (vazio = sem limite)",
+                        "exclusiveMinimum": 0
+                    },
+                    "download_concurrency": {
+                        "type": "integer",
+                        "title": "Download Concurrency",
+                        "description": "Quantos arquivos de um ticket (lista `files`) são baixados em paralelo",
+                        "default": 4,
+                        "minimum": 1
+                    },
+                    "download_spill_bytes": {
+                        "type": "integer",
+                        "title": "Download Spill Bytes",
+                        "description": "Acima deste tamanho o resultado baixado é gravado em arquivo temporário em vez de ficar em memória",
+                        "default": 33554432,
+                        "minimum": 0
+                    },
+                    "spill_dir": {
+                        "type": "string",
+                        "title": "Spill Directory",
+                        "description": "Diretório dos arquivos temporários de download (padrão: diretório temporário do sistema)"
+                    },
+                    "cache_dir": {
+                        "type": "string",
+                        "title": "Payload Cache Directory",
+                        "description": "Ativa o cache em disco dos payloads por slice; re-execuções reaproveitam os arquivos sem chamar a API"
+                    },
+                    "cache_max_bytes": {
+                        "type": "integer",
+                        "title": "Payload Cache Max Bytes",
+                        "description": "Orçamento do cache; acima dele as entradas menos usadas são removidas",
+                        "default": 1073741824,
+                        "minimum": 0
+                    },
+                    "cache_ttl_seconds": {
+                        "type": "integer",
+                        "title": "Payload Cache TTL Seconds",
+                        "description": "Validade padrão das entradas do cache (endpoints podem sobrescrever)",
+                        "default": 21600,
+                        "minimum": 0
+                    },
+                    "token_cache_dir": {
+                        "type": "string",
+                        "title": "Token Cache Directory",
+                        "description": "Diretório do cache de tokens (cifrado) compartilhado entre processos do conector; requer 'cryptography'. Vazio = desligado"
+                    },
+                    "ticket_resume_max_age_seconds": {
+                        "type": "integer",
+                        "title": "Ticket Resume Max Age Seconds",
+                        "description": "Tickets pendentes no state mais antigos que isso são descartados e submetidos de novo. Só há tickets pendentes com max_concurrent_tickets > 1",
+                        "default": 21600,
+                        "minimum": 0
                     }
                 }
             }
@@ -185,7 +357,10 @@ class SourceBtg(AbstractSource):
     def _make_token_provider(self, config: Mapping[str, Any], category_name: str, category_cfg: Mapping[str, Any]) -> BTGTokenProvider:
         base_url = config["base_url"]
         creds = self._effective_auth(config, category_cfg)
-        return BTGTokenProvider({**creds, "base_url": base_url}, category_name)
+        technical = config.get("technical") or {}
+        options = {key: config.get(key) or technical.get(key)
+                   for key in ("token_cache_dir", "http_pool_size", "connect_timeout_seconds")}
+        return BTGTokenProvider({**creds, "base_url": base_url, **options}, category_name)
 
     # ---------- check ----------
     def check_connection(self, logger, config) -> Tuple[bool, Any]:
@@ -218,6 +393,7 @@ class SourceBtg(AbstractSource):
 
     def streams(self, config: Mapping[str, Any]) -> List[Stream]:
         streams: List[Stream] = []
+        registry = RequestRegistry()
         logger = logging.getLogger("airbyte")
 
         base_url = config["base_url"]
@@ -243,6 +419,9 @@ class SourceBtg(AbstractSource):
             
 
             fund_name = config.get("fund_name", "RIZA MEYENII RFX FIM")
+            # "FUNDO A, FUNDO B" → um valor por fundo (fan-out ou fund_demux)
+            if isinstance(fund_name, str) and "," in fund_name:
+                fund_name = [x.strip() for x in fund_name.split(",") if x.strip()]
 
             if config.get("enable_carteira", False):
                 endpoints_cfg["carteira"] = {
@@ -283,9 +462,6 @@ class SourceBtg(AbstractSource):
                     }
                 }
                 
-            if config.get("enable_carteira", False):
-                endpoints_cfg["carteira"] = {"enabled": True}
-                
             if config.get("enable_renda_fixa", False):
                 endpoints_cfg["renda_fixa"] = {"enabled": True}
                 
@@ -294,9 +470,6 @@ class SourceBtg(AbstractSource):
                 
             if config.get("enable_money_market", False):
                 endpoints_cfg["money_market"] = {"enabled": True}
-                
-            if config.get("enable_taxa_performance", False):
-                endpoints_cfg["taxa_performance"] = {"enabled": True}
         
         # Construir sync_schedule se não existir
         if "sync_schedule" not in config:
@@ -330,6 +503,8 @@ class SourceBtg(AbstractSource):
                 merged_params = {**defaults, **user_params}
 
                 route = self._create_route_config(endpoint_name, category_name)
+                # opções da rota que o endpoint pode sobrescrever no config
+                route.update({key: ep_cfg[key] for key in ("fund_demux", "demux", "record_path") if key in ep_cfg})
                 stream_name = f"{category_name}_{endpoint_name}"
 
                 merged_config = {
@@ -348,9 +523,15 @@ class SourceBtg(AbstractSource):
                     category=category_name,
                     endpoint=endpoint_name,
                 )
+                stream.request_registry = registry
+                if self._selected_streams is None or stream_name in self._selected_streams:
+                    registry.join(stream.share_group, stream.name)
                 streams.append(stream)
                 logger.info(f"Created stream: {stream_name}")
 
+        if self.request_registry is not None:
+            self.request_registry.close()
+        self.request_registry = registry
         logger.info(f"Created {len(streams)} streams total")
         return streams
 
@@ -379,10 +560,12 @@ class CategoryAsyncJobStream(AsyncJobStream):
     def name(self) -> str:
         return self._name
 
-    def read_records(self, stream_slice=None, **kwargs):
-        for record in super().read_records(stream_slice, **kwargs):
-            record["_category"] = self.category
-            record["_endpoint"] = self.endpoint
-            record["_source_category"] = self.category.upper()
-            record["_api_endpoint"] = self.route.get("submit_path")
-            yield record
+    def _record_metadata(self) -> dict:
+        # colunas constantes aplicadas por bloco no _emit, sem mutar cada registro
+        return {
+            **super()._record_metadata(),
+            "_category": self.category,
+            "_endpoint": self.endpoint,
+            "_source_category": self.category.upper(),
+            "_api_endpoint": self.route.get("submit_path"),
+        }
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Dict, Optional, Tuple
+
+import logging
+
+try:  # opcional: engine asyncio (config `engine: "asyncio"`)
+    import httpx
+except ImportError:  # pragma: no cover - depende do ambiente
+    httpx = None
+
+from ..http import ACCEPT_ENCODING, DEFAULT_POOL_SIZE
+
+log = logging.getLogger("airbyte")
+
+
+class AsyncEngine:
+    """
+    Event loop único do processo, numa thread daemon, para o ciclo de vida dos tickets em corrotinas:
+      - `run(coro)` agenda a corrotina e devolve um concurrent.futures.Future
+        (é a ponte com o read_records/pipeline síncronos)
+      - um httpx.AsyncClient (HTTP/2 quando disponível) por host, com pool compartilhado
+      - `throttle` limita a taxa agregada de polls, como o TicketPoller
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._clients: Dict[str, "httpx.AsyncClient"] = {}
+        self._last_poll = 0.0
+        self._poll_lock: Optional[asyncio.Lock] = None
+
+    @staticmethod
+    def available() -> bool:
+        return httpx is not None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="btg-asyncio", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def run(self, coro: Awaitable[Any]) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def client(self, base_url: str, pool_size: Optional[int], timeout: Tuple[float, float]) -> "httpx.AsyncClient":
+        """Client do host (chamar de dentro do loop)."""
+        client = self._clients.get(base_url)
+        if client is None:
+            try:
+                import h2  # noqa: F401
+                http2 = True
+            except ImportError:  # pragma: no cover - depende do ambiente
+                http2 = False
+            size = int(pool_size or DEFAULT_POOL_SIZE)
+            client = self._clients[base_url] = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),
+                timeout=httpx.Timeout(timeout[1], connect=timeout[0]),
+                headers={"Accept-Encoding": ACCEPT_ENCODING},
+            )
+            log.debug(f"aio: client {base_url} (http2={http2}, pool={size})")
+        return client
+
+    async def throttle(self, max_polls_per_second: Optional[float]) -> None:
+        if not max_polls_per_second:
+            return
+        if self._poll_lock is None:
+            self._poll_lock = asyncio.Lock()
+        async with self._poll_lock:
+            wait = self._last_poll + 1.0 / float(max_polls_per_second) - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_poll = time.time()
+
+
+def httpx_timeout(read: float, connect: float) -> "httpx.Timeout":
+    return httpx.Timeout(read, connect=connect)
+
+
+_ENGINE: Optional[AsyncEngine] = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_engine() -> AsyncEngine:
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is None:
+            if not AsyncEngine.available():
+                raise Exception("engine 'asyncio' requer o pacote httpx (pip install 'httpx[http2]')")
+            _ENGINE = AsyncEngine()
+        return _ENGINE
@@ -1,17 +1,51 @@
-import random
-import time
+import asyncio
+import hashlib
 import requests
 import json
-import itertools
-from io import BytesIO
-from zipfile import ZipFile
-from typing import Iterable, Mapping, List, Any, Optional, Union
+import os
+import random
+import threading
+import time
+from zipfile import BadZipFile, ZipFile
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import IO, Callable, Dict, Iterable, Iterator, Mapping, List, Any, Optional, Set, Tuple, Union
 from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import chain, islice, tee
 
+from airbyte_cdk.models import SyncMode
 from airbyte_cdk.sources.streams.http import HttpStream
 
+from ..http import DEFAULT_POOL_SIZE, get_session, timeouts
+from ..parsers import RowBlock, get_parser, sniff_format
+from ..parsers.csv_parser import CHUNK_ROWS as CSV_CHUNK_ROWS, SNIFF_BYTES
+from .aio import get_engine, httpx_timeout
+from .cache import DEFAULT_MAX_BYTES, PayloadCache, cache_key, get_cache
+from .payload import CHUNK_BYTES, DEFAULT_SPILL_BYTES, Payload
+from .pipeline import SlicePipeline, completed, recover, then
+from .poller import BACKOFF_FACTOR, INITIAL_DELAY, MAX_DELAY, Defer, PollResult, TicketTimeout, get_poller
+from .ratelimit import RATE_LIMIT_RETRIES, RateLimiter, get_limiter, retry_after_seconds
+from .retry import aretry_call, is_transient, retry_call
+from .shared import RequestRegistry
+from .templates import RouteTemplate
+
 import logging
 
+# janelas de endpoints `date_range`
+DEFAULT_WINDOW_DAYS = 31
+DEFAULT_WINDOW_MAX_BYTES = 256 * 1024 * 1024
+# duração média dos tickets (state `ticket_stats`) considera os últimos N
+STATS_WINDOW = 100
+# resposta JSON do ticket lida na thread do poller até este tamanho; acima (ou sem Content-Length), no pool
+STATUS_INLINE_BYTES = 64 * 1024
+# resultado compartilhado à espera de outra stream: payloads a partir deste tamanho esperam em disco
+SHARE_SPILL_BYTES = 1024 * 1024
+# colunas que mudam a cada ticket sem mudar o conteúdo: fora do fingerprint de `snapshot`
+VOLATILE_FIELDS = frozenset({"_ticket_id", "_row_number", "_file_info"})
+# campos de data procurados na linha quando a rota não define `row_date_field`
+ROW_DATE_FIELDS = ("date", "Date", "data", "Data", "referenceDate", "dataReferencia",
+                   "movementDate", "dataMovimento", "DataMovimento", "tradeDate")
+
 
 class AsyncJobStream(HttpStream):
     """
@@ -27,10 +61,62 @@ class AsyncJobStream(HttpStream):
         self._token_provider = token_provider
         self._name = route.get("name", "btg_stream")
         self.log = logging.getLogger("airbyte")
-        # Inicializar session do requests
-        self.session = requests.Session()
+        # session compartilhada por host (pool, keep-alive, compressão); ver source_btg/http.py
+        self.session = get_session(self.url_base, int(self._tech("http_pool_size", DEFAULT_POOL_SIZE)))
+        # pipeline dos slices (ver stream_slices): submete à frente conforme o read_records lê
+        self._pipeline: Optional[SlicePipeline] = None
+        self._downloads: Optional[ThreadPoolExecutor] = None
+        self._adownloads: Optional[asyncio.Semaphore] = None  # engine asyncio
+        # request_key -> {"ticket", "submitted_at"}; ver get_updated_state
+        self._pending_lock = threading.Lock()
+        self._pending: dict = {}
+        self._resumable: dict = {}
+        # ticket -> início (monotonic) dos submetidos nesta execução; duração média vai para o state
+        self._started: Dict[str, float] = {}
+        self._ticket_stats: dict = {}
+        # rotas `snapshot`: request_key -> fingerprint do conteúdo emitido (state `snapshots`)
+        self._snapshots: Dict[str, str] = {}
+        self._skip_unchanged = False
+        # data do primeiro slice que falhou nesta execução: o cursor não avança além dele
+        self._failed_from: Optional[datetime] = None
+        # tamanho atual (dias) das janelas de endpoints `date_range`; ver _adapt_window
+        self._window_days = self._max_window_days()
+        # templates do submit compilados uma vez; placeholder inválido falha aqui (ver templates.py)
+        self._template = RouteTemplate(self._name, route.get("submit_body", {}), route.get("submit_params", {}),
+                                       self._endpoint_parameters(), omit=self._demux_variables())
+        # fund_demux: variável omitida -> {valor normalizado: valor pedido}; ver _demux_batch
+        self._demux = {variable: {self._demux_key(v): v for v in values}
+                       for variable, values in self._template.omitted_parameters.items()}
+        if self.route.get("format"):
+            get_parser(self.route["format"])  # formato declarado inválido falha já na criação da stream
+        # pedidos idênticos entre categorias da mesma sincronização (ver shared.py); definido em SourceBtg.streams
+        self.request_registry: Optional[RequestRegistry] = None
         super().__init__()
 
+    def _tech(self, key: str, default: Any = None) -> Any:
+        """Lê opção técnica do config plano ou do bloco `technical`."""
+        value = self.cfg.get(key)
+        if value is None:
+            value = (self.cfg.get("technical") or {}).get(key)
+        return default if value is None else value
+
+    def _demux_variables(self) -> List[str]:
+        """Variáveis de `demux` da rota cujo filtro sai do submit (`fund_demux` da rota/endpoint ou do config)."""
+        enabled = self.route.get("fund_demux")
+        if enabled is None:
+            enabled = self._tech("fund_demux", False)
+        return list(self.route.get("demux") or {}) if enabled else []
+
+    def _max_retries(self) -> int:
+        return max(0, int(self._tech("max_retries", 3)))
+
+    def _max_in_flight(self) -> int:
+        return max(1, int(self._tech("max_concurrent_tickets", 1)))
+
+    def _max_window_days(self) -> int:
+        if not self.route.get("date_range"):
+            return 1
+        return max(1, int(self._tech("date_window_days", DEFAULT_WINDOW_DAYS)))
 
     def _timeout(self) -> int:
         return int(
@@ -43,11 +129,6 @@ class AsyncJobStream(HttpStream):
     def _max_wait(self) -> int:
         return int(self.cfg.get("max_wait_seconds") or 900)
 
-    def _uses_date(self) -> bool:
-        submit_body = self.route.get("submit_body", {})
-        submit_params = self.route.get("submit_params", {})
-        blob = json.dumps({"b": submit_body, "p": submit_params}, ensure_ascii=False).lower()
-        return ("{{date_iso}}" in blob) or ("{{date}}" in blob) or ("{{date_str}}" in blob)
     # ========== stubs obrigatórios do CDK ==========
     @property
     def url_base(self) -> str:
@@ -90,11 +171,150 @@ class AsyncJobStream(HttpStream):
         state = dict(current_stream_state or {})
         key = self.route.get("name", self._name)
         cur = latest_record.get("_dt_referencia")
-        last = state.get(key)
-        if cur and (not last or cur > last):
-            state[key] = cur
+        cur_date = self._parse_cursor(cur)
+        if "error" in latest_record:
+            # slice com erro fica para a próxima execução: nem ele nem os seguintes movem o cursor
+            if cur_date and (self._failed_from is None or cur_date < self._failed_from):
+                self._failed_from = cur_date
+        elif cur_date and (self._failed_from is None or cur_date < self._failed_from):
+            last_date = self._parse_cursor(state.get(key))
+            if not last_date or cur_date > last_date:
+                state[key] = cur
+        # tickets submetidos e ainda não consumidos: retomados na próxima execução. O CDK só grava o
+        # state no fim do slice, então isso vale no modo pipeline: no serial não há ticket à frente
+        with self._pending_lock:
+            pending = {**self._resumable, **self._pending}
+        if pending:
+            state["pending_tickets"] = pending
+        else:
+            state.pop("pending_tickets", None)
+        if self._ticket_stats:
+            state["ticket_stats"] = dict(self._ticket_stats)
+        if self._snapshots:
+            state["snapshots"] = dict(self._snapshots)
         return state
 
+    @staticmethod
+    def _parse_cursor(value: Any) -> Optional[datetime]:
+        """Cursor em dd/mm/YYYY (formato emitido) ou YYYY-MM-DD."""
+        if not isinstance(value, str):
+            return None
+        for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+            try:
+                return datetime.strptime(value[:10], fmt)
+            except ValueError:
+                continue
+        return None
+
+    def _sync_range(self, sync_mode=None, stream_state: Optional[Mapping[str, Any]] = None
+                    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        (início, fim) em YYYY-MM-DD:
+          - incremental com cursor salvo: começa no cursor menos `lookback_days` (correções tardias);
+            rotas `date_range` recuam ainda até o início da janela da grade (ver _date_windows)
+          - sem `end_date`: até hoje
+        """
+        sync_config = self.cfg.get("sync_schedule", {}) or {}
+        start_date = sync_config.get("start_date")
+        end_date = sync_config.get("end_date") or datetime.now().strftime("%Y-%m-%d")
+
+        cursor = self._parse_cursor((stream_state or {}).get(self.route.get("name", self._name)))
+        if sync_mode == SyncMode.incremental and cursor is not None:
+            resume = (cursor - timedelta(days=int(self._tech("lookback_days", 0)))).strftime("%Y-%m-%d")
+            if not start_date or resume > start_date:
+                self.log.info(f" {self._name}: incremental a partir de {resume} (cursor {cursor:%Y-%m-%d})")
+                start_date = resume
+        return start_date, end_date
+
+    # ---------- tickets pendentes (retomada após falha) ----------
+    def _load_pending(self, stream_state: Optional[Mapping[str, Any]]) -> None:
+        """Carrega do state os tickets que a execução anterior submeteu e não consumiu."""
+        max_age = float(self._tech("ticket_resume_max_age_seconds", 6 * 3600))
+        now = time.time()
+        pending = (stream_state or {}).get("pending_tickets") or {}
+        with self._pending_lock:
+            self._pending = {}
+            self._resumable = {
+                key: entry for key, entry in pending.items()
+                if isinstance(entry, Mapping) and entry.get("ticket")
+                and now - float(entry.get("submitted_at") or 0) <= max_age
+            }
+        if self._resumable:
+            self.log.info(f" {self._name}: {len(self._resumable)} ticket(s) pendente(s) para retomar")
+        self._ticket_stats = dict((stream_state or {}).get("ticket_stats") or {})
+
+    # ---------- snapshots (rotas sem data que devolvem o cadastro inteiro) ----------
+    def _load_snapshots(self, sync_mode, stream_state: Optional[Mapping[str, Any]]) -> None:
+        """Só no incremental: em full refresh (overwrite) pular a emissão apagaria os dados no destino."""
+        self._skip_unchanged = (sync_mode == SyncMode.incremental and bool(self.route.get("snapshot"))
+                                and not self._template.uses_date
+                                and bool(self._tech("skip_unchanged_snapshots", True)))
+        self._snapshots = dict((stream_state or {}).get("snapshots") or {}) if self._skip_unchanged else {}
+
+    @staticmethod
+    def _fingerprint(rows: Iterable[Mapping]) -> Optional[str]:
+        """
+        Hash do conteúdo parseado, independente da ordem das linhas e do container (ZIP, compressão):
+        soma (mod 2^128) do hash de cada linha serializada com chaves ordenadas, sem as colunas voláteis.
+        None se o resultado tem linhas de erro (não deve virar referência).
+        """
+        total = count = 0
+        for row in rows:
+            if "error" in row or "parse_error" in row:
+                return None
+            data = json.dumps({k: v for k, v in row.items() if k not in VOLATILE_FIELDS},
+                              sort_keys=True, default=str)
+            total += int.from_bytes(hashlib.blake2b(data.encode(), digest_size=16).digest(), "big")
+            count += 1
+        return f"{count}:{total % (1 << 128):032x}"
+
+    def _snapshot_fingerprint(self, slice_ctx: Mapping, result: Mapping[str, Any]) -> Optional[str]:
+        """Fingerprint das linhas do resultado (parse extra só em rotas `snapshot`); None = emitir sempre."""
+        if not self._skip_unchanged:
+            return None
+        return self._fingerprint(self._emit(result, slice_ctx))
+
+    def _emit_snapshot(self, key: str, fingerprint: str, result: Mapping[str, Any],
+                       slice_ctx: Mapping) -> Iterator[Mapping]:
+        """Emite e só então guarda o fingerprint: emissão incompleta não vira referência."""
+        self._snapshots.pop(key, None)
+        yield from self._emit(result, slice_ctx)
+        self._snapshots[key] = fingerprint
+
+    def _take_resumable(self, key: str) -> Optional[str]:
+        with self._pending_lock:
+            entry = self._resumable.pop(key, None)
+            if entry is None:
+                return None
+            self._pending[key] = entry
+            return entry["ticket"]
+
+    def _track(self, key: str, ticket: str) -> None:
+        with self._pending_lock:
+            self._pending[key] = {"ticket": ticket, "submitted_at": time.time()}
+            self._started[ticket] = time.monotonic()
+
+    def _record_duration(self, ticket: str) -> None:
+        """Média móvel (últimos STATS_WINDOW tickets) de submit -> pronto; base da estimativa do `plan`."""
+        with self._pending_lock:
+            started = self._started.pop(ticket, None)
+            if started is None:  # retomado ou do cache: não mede
+                return
+            seconds = time.monotonic() - started
+            count = min(int(self._ticket_stats.get("count") or 0) + 1, STATS_WINDOW)
+            mean = float(self._ticket_stats.get("mean_seconds") or seconds)
+            self._ticket_stats = {"count": count, "mean_seconds": round(mean + (seconds - mean) / count, 3)}
+
+    def _untrack(self, key: str) -> None:
+        with self._pending_lock:
+            self._pending.pop(key, None)
+            self._resumable.pop(key, None)
+
+    def _submit_tracked(self, slice_ctx: Mapping, key: str) -> str:
+        ticket = retry_call(lambda: self._submit(slice_ctx), "submit", self._max_retries())
+        self._track(key, ticket)
+        return ticket
+
 
     # token provider
     @property
@@ -102,8 +322,8 @@ class AsyncJobStream(HttpStream):
         return self._token_provider
 
     # ---------- headers ----------
-    def _hdr(self, kind: str) -> Mapping[str, str]:
-        token = self.tk.get()
+    def _hdr(self, kind: str, token: Optional[str] = None) -> Mapping[str, str]:
+        token = token or self.tk.get()
         base = {"Accept": "*/*"}
         if kind == "bearer":
             base["Authorization"] = f"Bearer {token}"
@@ -111,19 +331,50 @@ class AsyncJobStream(HttpStream):
             base["X-SecureConnect-Token"] = token
         return base
 
-    # ---------- utils para templates ----------
-    def expand_templates(self, template: Any, context: Mapping) -> Any:
-        """Substitui placeholders tipo {{persona}} nos templates"""
-        if isinstance(template, str):
-            for key, value in context.items():
-                template = template.replace(f"{{{{{key}}}}}", str(value))
-            return template
-        elif isinstance(template, dict):
-            return {k: self.expand_templates(v, context) for k, v in template.items()}
-        elif isinstance(template, list):
-            return [self.expand_templates(item, context) for item in template]
-        return template
+    def _limiter(self, kind: str) -> RateLimiter:
+        """Limiter de (categoria, submit/poll/download); ver `rate_limits` no config."""
+        return get_limiter(
+            self.route.get("category") or "DEFAULT",
+            kind,
+            self._tech("rate_limits") or {},
+            self._tech("category_rate_limits") or {},
+        )
 
+    def _request(self, method: str, url: str, auth: str, headers: Optional[Mapping[str, str]] = None,
+                 limit: str = "submit", **kwargs) -> requests.Response:
+        """
+        Request autenticado e limitado por taxa (`limit` = submit/poll/download):
+          - 401: invalida o token usado, renova e repete uma vez
+          - 429: reduz a taxa do limiter, respeita Retry-After e repete
+        """
+        limiter = self._limiter(limit)
+        throttled = 0
+        while True:
+            limiter.acquire()
+            r = self._send(method, url, auth, headers, **kwargs)
+            if r.status_code == 429 and throttled < RATE_LIMIT_RETRIES:
+                r.close()
+                throttled += 1
+                limiter.throttled(retry_after_seconds(r.headers.get("Retry-After")))
+                continue
+            if r.ok:
+                limiter.succeeded()
+            return r
+
+    def _send(self, method: str, url: str, auth: str, headers: Optional[Mapping[str, str]] = None,
+              **kwargs) -> requests.Response:
+        """Uma request autenticada, sem rate limit; 401 invalida o token usado, renova e repete uma vez."""
+        token = self.tk.get()
+        r = self.session.request(method, url, headers={**self._hdr(auth, token), **(headers or {})}, **kwargs)
+        if r.status_code == 401:
+            r.close()
+            self.log.info(f" 401 em {url}; renovando token e repetindo")
+            self.tk.invalidate(token)
+            token = self.tk.get()
+            r = self.session.request(method, url, headers={**self._hdr(auth, token), **(headers or {})}, **kwargs)
+        return r
+
+    # ---------- utils ----------
     def dot_get(self, data: dict, path: str, default=None):
         """Pega valor aninhado tipo 'result.ticketId'"""
         keys = path.split('.')
@@ -147,61 +398,238 @@ class AsyncJobStream(HttpStream):
             current += timedelta(days=step_days)
 
     def stream_slices(self, *, sync_mode, cursor_field=None, stream_state=None, **kwargs):
-        route_name = self.route.get("name", "")
-        endpoint = "_".join(route_name.split("_")[1:]) if "_" in route_name else route_name
+        self._load_pending(stream_state)
+        self._load_snapshots(sync_mode, stream_state)
+        self._failed_from = None
+        self._close_pipeline()
+        slices = self._generate_slices(sync_mode, stream_state)
+        if self._sharing():
+            slices = self._expecting(slices)
+        head = list(islice(slices, 2))
+        max_in_flight = self._max_in_flight()
+        if max_in_flight <= 1 or len(head) < 2:
+            # um slice só não tem o que adiantar
+            yield from chain(head, slices)
+            return
+
+        # modo pipeline: o read_records submete/polla/baixa até N slices à frente do que lê, puxando
+        # da mesma geração sob demanda (tee); esgotar os slices aqui não submete nada
+        slices, ahead = tee(chain(head, slices))
+        self._pipeline = SlicePipeline(lambda s, executor: self._start(self._slice_context(s), executor),
+                                       max_in_flight, ahead)
+        try:
+            yield from slices
+        except GeneratorExit:
+            # leitura interrompida: os slices já submetidos não vão ser lidos. Se o gerador só terminou,
+            # o pipeline fica: o CDK esgota os slices antes do read_records (itertools.tee)
+            self._close_pipeline()
+            raise
+
+    def _close_pipeline(self) -> None:
+        if self._pipeline is not None:
+            self._pipeline.close()
+            self._pipeline = None
 
-        uses_date = self._uses_date()
+    def _expecting(self, slices: Iterable[Mapping]) -> Iterator[Mapping]:
+        """Informa ao registro as chaves conforme os slices são gerados; no fim, o resto deixa de esperar por esta stream."""
+        self.request_registry.begin(self.name)
+        for slice_ in slices:
+            self.request_registry.expect(self.name, self._shared_key(self._slice_context(slice_)))
+            yield slice_
+        self.request_registry.finish(self.name)
+
+    def _generate_slices(self, sync_mode=None, stream_state: Optional[Mapping[str, Any]] = None,
+                         sync_range: Optional[Tuple[Optional[str], Optional[str]]] = None) -> Iterable[Mapping]:
+        uses_date = self._template.uses_date
         sync_config = self.cfg.get("sync_schedule", {}) or {}
-        start_date = sync_config.get("start_date")
-        end_date = sync_config.get("end_date")
+        start_date, end_date = sync_range or self._sync_range(sync_mode, stream_state)
         step = int(sync_config.get("date_step_days", 1))
 
         windows = [None]
-        if uses_date and start_date and end_date:
-            windows = [{"date_str": d.strftime("%d/%m/%Y"),
-                        "date_iso": d.strftime("%Y-%m-%d")}
-                    for d in self.daterange(start_date, end_date, step)]
-
-        endpoint_params = self.cfg.get("endpoint_params")
-        if endpoint_params is None:
-            endpoint_params = self._get_endpoint_parameters(endpoint)
-
-        combos = self._generate_param_combinations(endpoint_params)
+        if uses_date and start_date:
+            if self.route.get("date_range"):
+                windows = self._date_windows(start_date, end_date)
+            else:
+                windows = ({"date_str": d.strftime("%d/%m/%Y"),
+                            "date_iso": d.strftime("%Y-%m-%d")}
+                           for d in self.daterange(start_date, end_date, step))
 
+        # tudo sob demanda: janelas e combinações são geradas conforme o CDK consome os slices
         for w in windows:
             base_slice = w or {}
-            if combos:
-                for params in combos:
+            if self._template.parameters:
+                for params in self._template.combinations():
                     yield {**base_slice, **params}
             else:
                 yield base_slice
 
+    def plan(self, sync_mode=SyncMode.incremental, stream_state: Optional[Mapping[str, Any]] = None,
+             shared: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """
+        Dry-run de `stream_slices`: quantos tickets a sincronização dispararia, sem chamar a API.
+          - slices repetidos (mesmo pedido renderizado), em cache ou com ticket pendente não contam como novos
+          - `shared`: chaves (`_shared_key`) já contadas por streams anteriores do plano; com pedidos
+            compartilhados ligados, o pedido idêntico de outra categoria reaproveita o ticket dela, e
+            os desta stream entram no conjunto. Com `fund_demux` os fundos já saem num slice só
+          - tempo estimado: ondas de `max_concurrent_tickets` x duração média do state (`ticket_stats`),
+            nunca abaixo do que o rate limit de submit permite; None sem histórico
+        Janelas `date_range` são contadas com o tamanho atual (podem mudar durante a execução).
+        """
+        self._load_pending(stream_state)
+        start_date, end_date = self._sync_range(sync_mode, stream_state)
+        cache = self._cache()
+        sharing = shared is not None and self._sharing()
+        slices = cached = reused = resumable = 0
+        seen = set()
+        # mesma ordem da execução: cache da stream, pedido de outra stream, ticket pendente, submit
+        for slice_ in self._generate_slices(sync_mode, stream_state, (start_date, end_date)):
+            slices += 1
+            slice_ctx = self._slice_context(slice_)
+            key = self._request_key(slice_ctx)
+            if key in seen:
+                continue
+            seen.add(key)
+            if cache is not None and cache.contains(key):
+                cached += 1
+                continue
+            if sharing:
+                shared_key = self._shared_key(slice_ctx)
+                if shared_key in shared:
+                    reused += 1
+                    continue
+                shared.add(shared_key)
+            if key in self._resumable:
+                resumable += 1
 
-    def _get_endpoint_parameters(self, endpoint: str) -> dict:
-        endpoints_config = self.cfg.get("endpoints") or {}
-        endpoint_config = endpoints_config.get(endpoint) or {}
-        return endpoint_config.get("params") or {}
+        tickets = len(seen) - cached - reused - resumable
+        mean = self._ticket_stats.get("mean_seconds")
+        estimate = None
+        if mean is not None:
+            waves = -(-(tickets + resumable) // self._max_in_flight())
+            estimate = waves * float(mean)
+            rates = [b.ceiling for b in self._limiter("submit").buckets if b.ceiling]
+            if rates:
+                estimate = max(estimate, tickets / min(rates))
+        return {
+            "stream": self._name,
+            "start_date": start_date if self._template.uses_date else None,
+            "end_date": end_date if self._template.uses_date else None,
+            "combinations": self._template.combination_count(),
+            "slices": slices,
+            "unique_requests": len(seen),
+            "duplicates": slices - len(seen),
+            "cached": cached,
+            "shared": reused,
+            "resumable": resumable,
+            "tickets": tickets,
+            "max_concurrent_tickets": self._max_in_flight(),
+            "mean_ticket_seconds": mean,
+            "estimated_seconds": None if estimate is None else round(estimate, 1),
+        }
 
-    def _generate_param_combinations(self, params: dict) -> list:
-        if not params:
-            return []
-        keys = list(params.keys())
-        vals = []
-        for k in keys:
-            v = params[k]
-            if isinstance(v, list):
-                vals.append(v if v else [None])
-            else:
-                vals.append([v])
-        return [dict(zip(keys, combo)) for combo in itertools.product(*vals)]
+
+    @staticmethod
+    def _window(start: datetime, end: datetime) -> dict:
+        return {"date_str": start.strftime("%d/%m/%Y"), "date_iso": start.strftime("%Y-%m-%d"),
+                "end_date_str": end.strftime("%d/%m/%Y"), "end_date_iso": end.strftime("%Y-%m-%d")}
+
+    def _date_windows(self, start_date: str, end_date: str) -> Iterator[dict]:
+        """
+        Janelas contíguas [início, fim] numa grade fixa de `date_window_days` ancorada no `start_date` do
+        config: o incremental recua até o início da célula que contém o cursor, e cada execução repete os
+        mesmos corpos (cache e tickets pendentes casam). Janelas menores (ver _adapt_window) dividem a
+        célula a partir do início dela; o tamanho é relido a cada janela.
+        """
+        current = datetime.strptime(start_date, "%Y-%m-%d")
+        last = datetime.strptime(end_date, "%Y-%m-%d")
+        cell_days = self._max_window_days()
+        anchor = (self.cfg.get("sync_schedule", {}) or {}).get("start_date")
+        anchor = datetime.strptime(anchor, "%Y-%m-%d") if anchor else current
+        if current > anchor:
+            current = anchor + timedelta(days=(current - anchor).days // cell_days * cell_days)
+        while current <= last:
+            cell_end = anchor + timedelta(days=((current - anchor).days // cell_days + 1) * cell_days - 1)
+            window_end = min(current + timedelta(days=self._window_days - 1), cell_end, last)
+            yield self._window(current, window_end)
+            current = window_end + timedelta(days=1)
+
+    def _window_bounds(self, slice_ctx: Mapping) -> Optional[Tuple[datetime, datetime]]:
+        if not slice_ctx.get("end_date_iso") or not slice_ctx.get("date_iso"):
+            return None
+        return (datetime.strptime(slice_ctx["date_iso"], "%Y-%m-%d"),
+                datetime.strptime(slice_ctx["end_date_iso"], "%Y-%m-%d"))
+
+    def _split_window(self, slice_ctx: Mapping) -> Optional[List[dict]]:
+        """Divide a janela do slice ao meio; None se já tem um dia só."""
+        bounds = self._window_bounds(slice_ctx)
+        if bounds is None or bounds[1] <= bounds[0]:
+            return None
+        start, end = bounds
+        middle = start + timedelta(days=(end - start).days // 2)
+        return [{**slice_ctx, **self._window(start, middle), "date": start.strftime("%d/%m/%Y")},
+                {**slice_ctx, **self._window(middle + timedelta(days=1), end),
+                 "date": (middle + timedelta(days=1)).strftime("%d/%m/%Y")}]
+
+    def _adapt_window(self, slice_ctx: Mapping, result: Optional[Mapping[str, Any]]) -> None:
+        """
+        Ajusta o tamanho das próximas janelas:
+          - timeout (result None) ou payload acima de `window_max_bytes`: metade
+          - payload abaixo de 1/4 do limite: dobra (até `date_window_days`)
+        """
+        bounds = self._window_bounds(slice_ctx)
+        if bounds is None:
+            return
+        days = (bounds[1] - bounds[0]).days + 1
+        limit = int(self._tech("window_max_bytes", DEFAULT_WINDOW_MAX_BYTES))
+        size = None if result is None else self._result_size(result)
+        if size is None or size > limit:
+            new_days = max(1, days // 2)
+        elif size < limit / 4:
+            new_days = min(self._max_window_days(), max(self._window_days, days * 2))
+        else:
+            return
+        if new_days != self._window_days:
+            self.log.info(f" {self._name}: janela {self._window_days} -> {new_days} dia(s)")
+            self._window_days = new_days
+
+    @staticmethod
+    def _result_size(result: Mapping[str, Any]) -> int:
+        size = 0
+        payload = result["status"].get("payload")
+        if isinstance(payload, Payload):
+            size += payload.size
+        for file in result["files"]:
+            if file["payload"].done() and not file["payload"].cancelled() and file["payload"].exception() is None:
+                size += file["payload"].result().size
+        return size
+
+    def _endpoint_parameters(self) -> dict:
+        """Parâmetros do fan-out: `endpoint_params` (defaults + config) ou `endpoints.<endpoint>.params`."""
+        endpoint_params = self.cfg.get("endpoint_params")
+        if endpoint_params is not None:
+            return endpoint_params
+        route_name = self.route.get("name", "")
+        endpoint = "_".join(route_name.split("_")[1:]) if "_" in route_name else route_name
+        endpoint_config = (self.cfg.get("endpoints") or {}).get(endpoint) or {}
+        return endpoint_config.get("params") or {}
 
     # ---------- submit: retorna ticketId ----------
+    def _render_request(self, slice_ctx: Mapping) -> Mapping[str, Any]:
+        body, params = self._template.render(slice_ctx)
+        return {
+            "method": self.route.get("submit_method", "POST").upper(),
+            "path": self.route.get("submit_path", "/"),
+            "body": body,
+            "params": params,
+        }
+
     def _submit(self, slice_ctx: Mapping) -> str:
-        method = self.route.get("submit_method", "POST").upper()
-        path = self.route.get("submit_path", "/")
+        request = self._render_request(slice_ctx)
+        method = request["method"]
+        path = request["path"]
         auth = self.route.get("submit_auth", "bearer")
-        body = self.expand_templates(self.route.get("submit_body", {}), slice_ctx)
-        params = self.expand_templates(self.route.get("submit_params", {}), slice_ctx)
+        body = request["body"]
+        params = request["params"]
         url = self.url_base.rstrip("/") + "/" + path.lstrip("/")
 
         # Debug
@@ -211,48 +639,25 @@ class AsyncJobStream(HttpStream):
         self.log.debug(f"DEBUG slice_ctx: {slice_ctx}")
         self.log.debug(f"DEBUG auth type: {auth}")
 
-        # Pegar token fresco
-        token = self.tk.get()
-        self.log.debug(f"DEBUG token: {token[:30]}..." if token else "DEBUG token: None")
-
-        # Headers baseado no tipo de auth
-        if auth == "bearer":
-            headers = {
-                "Accept": "*/*",
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-        elif auth == "xsecure":
-            headers = {
-                "Accept": "*/*",
-                "X-SecureConnect-Token": token,
-                "Content-Type": "application/json"
-            }
-        else:
-            # Default bearer
-            headers = {
-                "Accept": "*/*", 
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-
-        self.log.debug(f" headers: {headers}")
-
-        r = self.session.request(
+        # xsecure ou bearer (default)
+        kind = "xsecure" if auth == "xsecure" else "bearer"
+        r = self._request(
             method,
             url,
+            kind,
+            headers={"Content-Type": "application/json"},
             json=body if method == "POST" else None,
             params=params if method == "GET" else None,
-            headers=headers,
-            timeout=self.cfg.get("http_timeout_seconds", 60),
+            timeout=timeouts(self.cfg),
         )
         
         self.log.debug(f" response status: {r.status_code}")
         self.log.debug(f" response: {r.text}")
         
         r.raise_for_status()
-        js = r.json()
-        
+        return self._ticket_from_json(r.json())
+
+    def _ticket_from_json(self, js: Mapping) -> str:
         # Procurar ticket ID em vários lugares possíveis
         ticket = (js.get("ticketId") or 
                  self.dot_get(js, "result.ticketId") or 
@@ -265,171 +670,274 @@ class AsyncJobStream(HttpStream):
         return str(ticket)
 
     # ---------- polling: Ticket -> XML/ZIP inline (ou JSON) ----------
-    def _wait_ticket(self, ticket_id: str) -> Mapping:
+    def _poll_once(self, ticket_id: str, limiter: RateLimiter) -> PollResult:
+        """
+        Um GET em /reports/Ticket, na thread do poller (sem dormir):
+          - status final, None se ainda processando, ou `Defer` em 429 (Retry-After vira o próximo poll)
+          - corpo grande ou sem tamanho (XML/ZIP inline, JSON com os dados) é lido no pool de download: Future
+        Outro status levanta HTTPError: 5xx conta nas `max_retries` do polling, 4xx (ticket inválido ou
+        expirado) falha o ticket já (ver _poll_failed).
+        """
         path = self.route.get("ticket_path", "/reports/Ticket")
         auth = self.route.get("ticket_auth", "xsecure")
         url = self.url_base.rstrip("/") + "/" + path.lstrip("/")
 
-        deadline = time.time() + int(self.cfg.get("polling_max_wait_seconds", 900))
-        delay = 5
+        r = self._send(
+            "GET",
+            url,
+            auth,
+            params={"ticketId": ticket_id},
+            timeout=timeouts(self.cfg),
+            stream=True,
+        )
+
+        self.log.debug(f" poll status: {r.status_code}")
+
+        if r.status_code == 429:
+            r.close()
+            retry_after = retry_after_seconds(r.headers.get("Retry-After"))
+            limiter.throttled(retry_after)
+            return Defer(retry_after or 0)
+        if r.status_code != 200:
+            r.close()
+            r.raise_for_status()
+            limiter.succeeded()
+            return None  # outro 2xx (ex. 202): ainda processando
+        limiter.succeeded()
+
+        # JSON de status ("Processando") é pequeno e fica aqui; o resto é lido em chunks fora do poller
+        ctype = (r.headers.get("Content-Type") or "").lower()
+        size = int(r.headers.get("Content-Length") or -1)
+        if "json" in ctype and 0 <= size <= STATUS_INLINE_BYTES:
+            return self._status_from_body(r.content)
+        return self._download_pool().submit(self._read_status, ctype, r)
+
+    def _read_status(self, ctype: str, response) -> Optional[Mapping]:
+        """Corpo da resposta pronta do ticket: JSON de status ou conteúdo inline (em chunks)."""
+        if "json" in ctype:
+            with response:
+                return self._status_from_body(response.content)
+        return self._status_from_payload(ctype, self._spool(response))
+
+    def _status_from_payload(self, ctype: str, payload: Payload) -> Optional[Mapping]:
+        """Resposta não-JSON do ticket já baixada: conteúdo inline ou ainda processando."""
+        payload = self._check_zip(payload)
+        head = payload.head()
+        looks_xml = head.lstrip().startswith(b"<")
+        looks_zip = head[0:2] == b"PK"
+
+        # Conteúdo inline (XML/ZIP direto)
+        if "xml" in ctype or "text/" in ctype or looks_xml or looks_zip:
+            self.log.debug(f": Got inline content ({payload.size} bytes)")
+            return {"__mode__": "inline", "payload": payload}
+        payload.close()
+        return None
+
+    def _status_from_body(self, body: bytes) -> Optional[Mapping]:
+        """Resposta JSON do ticket: status final (inline/download/json) ou None se ainda processando."""
+        if body.lstrip().startswith(b"<") or body[0:2] == b"PK":
+            self.log.debug(f": Got inline content ({len(body)} bytes)")
+            return {"__mode__": "inline", "payload": Payload.from_bytes(body)}
+
+        # Resposta JSON
+        try:
+            js = json.loads(body)
+            self.log.debug(f" Got JSON response: {js}")
+
+            # Verificar se ainda está processando
+            result = js.get("result", "")
+            if result in ["Processando", "Processing", "In Progress", "PROCESSING", "PENDING", "Aguardando processamento"]:
+                self.log.debug(f" Still processing ({result})... waiting")
+                self.log.info(f" TICKET Still processing ({result})... waiting")
+
+            else:
+                # Job completou
+
+                # Se tem arquivos para download
+                if js.get("files"):
+                    self.log.debug(f" Found files for download: {js.get('files')}")
+                    return {"__mode__": "download", "json": js}
 
+                # Se o result contém dados diretos
+                result_field = self.route.get("ticket_result_field", "result")
+                ready = self.dot_get(js, result_field) if result_field else js
+
+                if ready and ready not in ["Processando", "Processing", "In Progress", "PROCESSING", "PENDING", "Aguardando processamento"]:
+                    # Se o result é XML como string
+                    if isinstance(ready, str) and ready.lstrip().startswith("<"):
+                        return {"__mode__": "inline", "payload": Payload.from_bytes(ready.encode("utf-8"))}
+                    # Retorna os dados JSON
+                    return {"__mode__": "json", "json": js}
+
+            # Se chegou aqui, ainda processando ou sem dados válidos
+
+        except Exception as e:
+            self.log.debug(f": Error parsing JSON: {e}")
+
+        return None
+
+    def _watch_ticket(self, ticket_id: str) -> Future:
+        """Entrega o ticket ao poller compartilhado; o Future resolve com o status final."""
         self.log.debug(f" _wait_ticket: polling {ticket_id}")
+        poller = get_poller(self._tech("max_polls_per_second"))
+        limiter = self._limiter("poll")
+        failures = [0]
+        reserved = [False]
 
-        while True:
-            r = self.session.get(
-                url,
-                params={"ticketId": ticket_id},
-                headers=self._hdr(auth),
-                timeout=self.cfg.get("http_timeout_seconds", 60),
-            )
-            
-            self.log.debug(f" poll status: {r.status_code}")
-            
-            ctype = (r.headers.get("Content-Type") or "").lower()
-            body = r.content
-
-            if r.status_code == 200:
-                looks_xml = body.lstrip().startswith(b"<")
-                looks_zip = len(body) >= 2 and body[0:2] == b"PK"
-
-                # Conteúdo inline (XML/ZIP direto)
-                if "xml" in ctype or "text/" in ctype or looks_xml or looks_zip:
-                    self.log.debug(f": Got inline content ({len(body)} bytes)")
-                    return {"__mode__": "inline", "payload": body}
-
-                # Resposta JSON
-                if "json" in ctype:
-                    try:
-                        js = r.json()
-                        self.log.debug(f" Got JSON response: {js}")
-                        
-                        # Verificar se ainda está processando
-                        result = js.get("result", "")
-                        if result in ["Processando", "Processing", "In Progress", "PROCESSING", "PENDING", "Aguardando processamento"]:
-                            self.log.debug(f" Still processing ({result})... waiting")
-                            self.log.info(f" TICKET Still processing ({result})... waiting")
-
-                            # Continuar o loop
-                        else:
-                            # Job completou
-                            
-                            # Se tem arquivos para download
-                            if js.get("files"):
-                                self.log.debug(f" Found files for download: {js.get('files')}")
-                                return {"__mode__": "download", "json": js}
-                            
-                            # Se o result contém dados diretos
-                            result_field = self.route.get("ticket_result_field", "result")
-                            ready = self.dot_get(js, result_field) if result_field else js
-                            
-                            if ready and ready not in ["Processando", "Processing", "In Progress", "PROCESSING", "PENDING", "Aguardando processamento"]:
-                                # Se o result é XML como string
-                                if isinstance(ready, str) and ready.lstrip().startswith("<"):
-                                    return {"__mode__": "inline", "payload": ready.encode("utf-8")}
-                                # Retorna os dados JSON
-                                return {"__mode__": "json", "json": js}
-                                
-                        # Se chegou aqui, ainda processando ou sem dados válidos
-                        
-                    except Exception as e:
-                        self.log.debug(f": Error parsing JSON: {e}")
-                        pass
-
-            # Timeout check
-            if time.time() > deadline:
-                raise Exception(f"Timeout aguardando ticket {ticket_id}")
+        def poll_once() -> PollResult:
+            # vez no rate limit reservada uma vez; a espera volta para o poller como próximo horário
+            if not reserved[0]:
+                wait = limiter.reserve()
+                if wait > 0:
+                    reserved[0] = True
+                    return Defer(wait)
+            reserved[0] = False
+            try:
+                status = self._poll_once(ticket_id, limiter)
+            except Exception as e:
+                return self._poll_failed(ticket_id, e, failures)
+            if isinstance(status, Future):
+                return recover(status, lambda e: self._poll_failed(ticket_id, e, failures))
+            return status
+
+        return poller.watch(ticket_id, poll_once, max_wait=int(self.cfg.get("polling_max_wait_seconds", 900)))
 
-            self.log.debug(f": Waiting {delay}s...")
-            time.sleep(delay + random.random() * 2)
-            delay = min(delay * 1.5, 45)
+    def _poll_failed(self, ticket_id: str, error: Exception, failures: List[int]) -> None:
+        """
+        Erro transitório no polling conta como "ainda processando" (o backoff do poller espaça
+        as tentativas), até `max_retries` falhas seguidas; permanente ou além disso, propaga.
+        """
+        if not is_transient(error) or failures[0] >= self._max_retries():
+            raise error
+        failures[0] += 1
+        self.log.warning(f" poll {ticket_id}: erro transitório ({error}); tentativa {failures[0]}/{self._max_retries()}")
+        return None
+
+    def _wait_ticket(self, ticket_id: str) -> Mapping:
+        return self._watch_ticket(ticket_id).result()
 
     # ---------- download (quando JSON traz URL) ----------
-    def _download(self, url_or_path: str) -> bytes:
+    def _spool(self, response) -> Payload:
+        """Lê a resposta em chunks; acima de `download_spill_bytes` o conteúdo vai para disco."""
+        with response:
+            return Payload.from_chunks(
+                response.iter_content(chunk_size=CHUNK_BYTES),
+                spill_bytes=int(self._tech("download_spill_bytes", DEFAULT_SPILL_BYTES)),
+                spill_dir=self._tech("spill_dir"),
+            )
+
+    def _download(self, url_or_path: str) -> Payload:
         auth = self.route.get("download_auth", "xsecure")
         url = (url_or_path if url_or_path.startswith(("http://", "https://")) 
                else self.url_base.rstrip("/") + "/" + url_or_path.lstrip("/"))
         
         self.log.debug(f": Downloading from {url}")
-        r = self.session.get(
+        r = self._request(
+            "GET",
             url,
-            headers=self._hdr(auth),
-            timeout=max(120, self.cfg.get("http_timeout_seconds", 60)),
+            auth,
+            limit="download",
+            timeout=timeouts(self.cfg, read=max(120, self.cfg.get("http_timeout_seconds", 60))),
+            stream=True,
         )
+        if not r.ok:
+            r.close()
         r.raise_for_status()
-        return r.content
-
-    # ---------- unzip se necessário ----------
-    def _unzip_if_needed(self, raw: bytes) -> bytes:
-        if len(raw) >= 2 and raw[0:2] == b"PK":
-            self.log.debug(f": Unzipping content ({len(raw)} bytes)")
-            with ZipFile(BytesIO(raw)) as zf:
-                first = zf.namelist()[0]
-                self.log.debug(f": Extracting {first}")
-                return zf.read(first)
-        return raw
+        return self._check_zip(self._spool(r))
+
+    def _check_zip(self, payload: Payload) -> Payload:
+        """ZIP sem diretório central (corpo truncado) levanta BadZipFile, que é transitório."""
+        if payload.head(2) == b"PK":
+            try:
+                with payload.open() as stream:
+                    ZipFile(stream).close()
+            except BadZipFile:
+                payload.close()
+                raise
+        return payload
+
+    # ---------- unzip (streaming, todos os membros) ----------
+    def _iter_members(self, payload: Payload) -> Iterator[Tuple[Optional[str], IO[bytes]]]:
+        """(nome do membro, stream) para cada arquivo do ZIP; sem ZIP, (None, payload)."""
+        with payload.open() as stream:
+            if self._head(stream, 2) == b"PK":
+                self.log.debug(f": Unzipping content ({payload.size} bytes)")
+                with ZipFile(stream) as zf:
+                    for info in zf.infolist():
+                        if info.is_dir():
+                            continue
+                        self.log.debug(f": Extracting {info.filename}")
+                        # descompressão sob demanda: o parser lê o membro aos poucos
+                        with zf.open(info) as member:
+                            yield info.filename, member
+                return
+            yield None, stream
+
+    def _parse_payload(self, payload: Payload) -> Iterable[RowBlock]:
+        """Blocos de todos os membros do payload, com a coluna `_zip_member` quando vierem de ZIP."""
+        for member, stream in self._iter_members(payload):
+            for batch in self._parse(stream):
+                yield batch if member is None else batch.with_constants(_zip_member=member)
 
     # ---------- parse melhorado ----------
-    def _parse(self, payload: bytes) -> List[Mapping]:
-        """Parse melhorado com suporte para XML, CSV e JSON"""
+    @staticmethod
+    def _head(stream: IO[bytes], size: int = 1024) -> bytes:
+        """Primeiros bytes do stream sem consumi-los."""
+        if hasattr(stream, "peek"):
+            return stream.peek(size)[:size]
+        pos = stream.tell()
+        head = stream.read(size)
+        stream.seek(pos)
+        return head
+
+    @staticmethod
+    def _read_all(stream: IO[bytes]) -> str:
+        """Conteúdo bruto para registros de fallback (só usado quando o parse falha)."""
+        if stream.seekable():
+            stream.seek(0)
+            return stream.read().decode('utf-8', errors='ignore')
+        return ""
+
+    def _parse_options(self) -> dict:
+        """Formato, encoding, separador e record_path declarados no ENDPOINT_CONFIGS (ver parsers.registry)."""
+        return {
+            "format": self.route.get("format"),
+            "encoding": self.route.get("encoding"),
+            "delimiter": self.route.get("delimiter"),
+            "record_path": self.route.get("record_path"),
+            "chunk_rows": int(self._tech("csv_chunk_rows", CSV_CHUNK_ROWS)),
+        }
+
+    def _parse(self, stream: IO[bytes], options: Optional[Mapping] = None) -> Iterable[RowBlock]:
+        """Parse pelo registro de parsers: formato declarado na rota ou detectado nos primeiros bytes."""
+        options = options or self._parse_options()
+        fmt = options["format"] or sniff_format(self._head(stream, SNIFF_BYTES))
+        emitted = False
         try:
-            text = payload.decode('utf-8')
-            text_stripped = text.strip()
-            
-            # JSON
-            if text_stripped.startswith('{') or text_stripped.startswith('['):
-                data = json.loads(text_stripped)
-                if isinstance(data, list):
-                    return data
-                return [data]
-            
-            # XML (básico)
-            if text_stripped.startswith('<'):
-                # Parse XML simples - você pode melhorar com xml.etree
-                import xml.etree.ElementTree as ET
-                try:
-                    root = ET.fromstring(text_stripped)
-                    # Converte XML em dict básico
-                    def xml_to_dict(element):
-                        result = {}
-                        if element.text and element.text.strip():
-                            result['text'] = element.text.strip()
-                        for child in element:
-                            child_data = xml_to_dict(child)
-                            if child.tag in result:
-                                if not isinstance(result[child.tag], list):
-                                    result[child.tag] = [result[child.tag]]
-                                result[child.tag].append(child_data)
-                            else:
-                                result[child.tag] = child_data
-                        result.update(element.attrib)
-                        return result
-                    
-                    parsed = xml_to_dict(root)
-                    return [parsed] if parsed else [{"xml_content": text_stripped}]
-                except ET.ParseError:
-                    return [{"xml_content": text_stripped}]
-            
-            # CSV (básico)
-            if '\n' in text_stripped and (',' in text_stripped or ';' in text_stripped):
-                lines = text_stripped.split('\n')
-                if len(lines) > 1:
-                    # Detectar separador
-                    sep = ',' if ',' in lines[0] else ';'
-                    headers = [h.strip() for h in lines[0].split(sep)]
-                    rows = []
-                    for line in lines[1:]:
-                        if line.strip():
-                            values = [v.strip() for v in line.split(sep)]
-                            if len(values) == len(headers):
-                                rows.append(dict(zip(headers, values)))
-                    return rows if rows else [{"csv_content": text_stripped}]
-            
-            # Texto simples
-            return [{"raw_content": text_stripped}]
-            
+            for batch in get_parser(fmt)(stream, options):
+                emitted = True
+                yield batch
         except Exception as e:
-            self.log.debug(f": Parse error: {e}")
-            return [{"raw_content": payload.decode('utf-8', errors='ignore'), "parse_error": str(e)}]
+            self.log.debug(f": Parse error ({fmt}): {e}")
+            if emitted:
+                yield RowBlock(records=[{"parse_error": str(e)}])
+            elif fmt == "xml":
+                yield RowBlock(records=[{"xml_content": self._read_all(stream).strip()}])
+            else:
+                yield RowBlock(records=[{"raw_content": self._read_all(stream), "parse_error": str(e)}])
+            return
+
+        # nada emitido: conteúdo bruto em vez de perder o payload
+        if not emitted and fmt == "xml" and options["record_path"] and stream.seekable():
+            # nenhum elemento nos caminhos de `record_path`: o documento inteiro, como sem ele
+            self.log.warning(f" {self._name}: record_path {options['record_path']} não encontrado no XML; "
+                             f"emitindo o documento inteiro")
+            stream.seek(0)
+            yield from self._parse(stream, {**options, "format": "xml", "record_path": None})
+        elif not emitted and fmt == "xml":
+            yield RowBlock(records=[{"xml_content": self._read_all(stream).strip()}])
+        elif not emitted and fmt == "csv":
+            yield RowBlock(records=[{"csv_content": self._read_all(stream).strip()}])
 
     def get_json_schema(self):
         # Schema mínimo + metacampos; permite colunas extras do payload
@@ -445,7 +953,9 @@ class AsyncJobStream(HttpStream):
                 "_endpoint": {"type": ["string", "null"]},
                 "_source_category": {"type": ["string", "null"]},
                 "_api_endpoint": {"type": ["string", "null"]},
+                **{f"_{variable}": {"type": ["string", "null"]} for variable in self.route.get("demux") or {}},
                 "_file_info": {"type": ["object", "null"]},
+                "_zip_member": {"type": ["string", "null"]},
                 "_source_json": {"type": ["object", "null"]},
                 "error": {"type": ["string", "null"]},
                 "message": {"type": ["string", "null"]},
@@ -458,156 +968,622 @@ class AsyncJobStream(HttpStream):
         }
 
     # ---------- loop principal ----------
-    def read_records(self, stream_slice: Mapping = None, **kwargs) -> Iterable[Mapping]:
-        self.log.debug(f" read_records: ENTRADA")
-        self.log.debug(f"read_records: stream_slice = {stream_slice}")
-        self.log.debug(f" read_records: type(stream_slice) = {type(stream_slice)}")
-        self.log.debug(f" read_records: kwargs = {kwargs}")
-        
+    def _slice_context(self, stream_slice: Optional[Mapping]) -> dict:
         slice_ = stream_slice or {}
         slice_ctx = {
             "date": slice_.get("date_str"),
             "date_str": slice_.get("date_str"),
             "date_iso": slice_.get("date_iso"),
         }
-        
+
         # Adicionar todos os parâmetros extras do slice
         for key, value in slice_.items():
             if key not in [ "date_str", "date_iso"]:
                 slice_ctx[key] = value
-        
-        self.log.debug(f" read_records: slice_ctx final = {slice_ctx}")
+        return slice_ctx
+
+    # ---------- cache de payloads ----------
+    def _cache(self) -> Optional[PayloadCache]:
+        cache_dir = self._tech("cache_dir")
+        if not cache_dir:
+            return None
+        return get_cache(cache_dir, int(self._tech("cache_max_bytes", DEFAULT_MAX_BYTES)))
+
+    def _request_key(self, slice_ctx: Mapping) -> str:
+        """Identidade do pedido (rota + corpo/params expandidos): chave do cache e dos tickets pendentes."""
+        request = self._render_request(slice_ctx)
+        return cache_key(self._name, request["method"], request["path"], request["body"], request["params"])
+
+    def _slice_last_date(self, slice_ctx: Mapping) -> Optional[str]:
+        return slice_ctx.get("end_date_iso") or slice_ctx.get("date_iso")
+
+    def _cache_ttl(self, slice_ctx: Mapping) -> Optional[float]:
+        """None = nunca expira (datas passadas de endpoints com `immutable_history`)."""
+        last_date = self._slice_last_date(slice_ctx)
+        if self.route.get("immutable_history") and last_date and last_date < datetime.now().strftime("%Y-%m-%d"):
+            return None
+        return float(self.route.get("cache_ttl_seconds") or self._tech("cache_ttl_seconds", 6 * 3600))
+
+    def _cache_lookup(self, slice_ctx: Mapping) -> Optional[Mapping[str, Any]]:
+        cache = self._cache()
+        if cache is None:
+            return None
+        manifest = cache.get(self._request_key(slice_ctx))
+        if manifest is None:
+            return None
+
+        self.log.info(f" cache hit {self._name} {slice_ctx.get('date_iso') or ''} (ticket {manifest['ticket']})")
+        status: dict = {"__mode__": manifest["mode"]}
+        if manifest.get("json") is not None:
+            status["json"] = manifest["json"]
+        if manifest.get("blob"):
+            status["payload"] = Payload.from_file(os.path.join(manifest["dir"], manifest["blob"]))
+        files = []
+        for file in manifest.get("files", []):
+            future: Future = Future()
+            future.set_result(Payload.from_file(os.path.join(manifest["dir"], file["blob"])))
+            files.append({"file_info": file["file_info"], "file_meta": file["file_meta"], "payload": future})
+        return {"ticket": manifest["ticket"], "status": status, "files": files, "cached": True}
+
+    def _cache_store(self, slice_ctx: Mapping, result: Mapping[str, Any]) -> None:
+        """Guarda o resultado completo (sem downloads com erro) depois de emitido."""
+        cache = self._cache()
+        status = result["status"]
+        if cache is None or result.get("cached") or status.get("__mode__") not in ("inline", "download", "json"):
+            return
+        if any(f["payload"].exception() is not None for f in result["files"]):
+            return
 
+        manifest: dict = {"ticket": result["ticket"], "mode": status["__mode__"], "json": status.get("json"), "files": []}
+        streams = {}
         try:
-            # 1. Submit job
-            ticket = self._submit(slice_ctx)
-            self.log.debug(f": Got ticket {ticket}")
-            
-            # 2. Wait for completion
-            status = self._wait_ticket(ticket)
-            self.log.debug(f": Ticket ready, mode: {status.get('__mode__')}")
-            
-            row_idx = 0
-
-            # 3. Process result
-            if status.get("__mode__") == "inline":
-                # Conteúdo direto (XML/ZIP)
-                payload = self._unzip_if_needed(status["payload"])
-                rows = self._parse(payload)
-                
-                for rec in rows:
-                    yield {
-                        **(rec if isinstance(rec, dict) else {"value": rec}),
-                        "_route": self._name,
-                        "_dt_referencia": slice_ctx["date"],
-                        "_ticket_id": ticket,
-                        "_row_number": row_idx,
-                    }
+            if isinstance(status.get("payload"), Payload):
+                manifest["blob"] = "payload.bin"
+                streams["payload.bin"] = status["payload"].open()
+            for idx, file in enumerate(result["files"]):
+                name = f"{idx}.bin"
+                manifest["files"].append({"file_info": file["file_info"], "file_meta": file["file_meta"], "blob": name})
+                streams[name] = file["payload"].result().open()
+            cache.put(self._request_key(slice_ctx), manifest, streams, self._cache_ttl(slice_ctx))
+        except Exception as e:
+            self.log.warning(f" cache: falha ao gravar {self._name}: {e}")
+        finally:
+            for stream in streams.values():
+                stream.close()
+
+    @property
+    def share_group(self) -> tuple:
+        """Streams do mesmo grupo (host, credenciais e rota) fazem pedidos idênticos para o mesmo corpo."""
+        auth = self.cfg.get("category_auth") or {}
+        return (self.url_base, getattr(self._token_provider, "auth_url", None), auth.get("client_id"),
+                self.route.get("submit_method", "POST").upper(), self.route.get("submit_path", "/"))
+
+    def _sharing(self) -> bool:
+        return (self.request_registry is not None and bool(self._tech("share_requests", True))
+                and self.request_registry.consumers(self.share_group) > 1)
+
+    def _shared_key(self, slice_ctx: Mapping) -> str:
+        request = self._render_request(slice_ctx)
+        return cache_key(repr(self.share_group), request["method"], request["path"], request["body"], request["params"])
+
+    def _share(self, slice_ctx: Mapping, start: Callable[[], Future]) -> Future:
+        """Pedido idêntico já feito por outra stream (outra categoria) nesta sincronização? reaproveita o Future."""
+        if not self._sharing():
+            return start()
+        future, shared = self.request_registry.share(self._shared_key(slice_ctx), self.share_group, self.name,
+                                                     start, self._release, self._park)
+        if shared:
+            self.log.info(f" {self._name}: pedido idêntico ao de outra stream, reaproveitando o ticket "
+                          f"{slice_ctx.get('date_iso') or ''}")
+        return future
+
+    def _done_with(self, slice_ctx: Mapping, result: Mapping[str, Any]) -> None:
+        """Resultado emitido: libera os payloads, ou avisa o registro se outras streams ainda vão consumi-lo."""
+        if (result.get("cached") or not self._sharing()
+                or not self.request_registry.done(self._shared_key(slice_ctx), self.name)):
+            self._release(result)
+
+    def _park(self, result: Mapping[str, Any]) -> None:
+        """Resultado à espera de outra stream: payloads acima de `share_spill_bytes` esperam em disco."""
+        limit = int(self._tech("share_spill_bytes", SHARE_SPILL_BYTES))
+        payloads = [result["status"].get("payload")]
+        payloads += [f["payload"].result() for f in result["files"]
+                     if f["payload"].done() and not f["payload"].cancelled() and f["payload"].exception() is None]
+        for payload in payloads:
+            if isinstance(payload, Payload) and payload.size >= limit:
+                payload.spill()
+
+    def _execute(self, slice_ctx: Mapping) -> Mapping[str, Any]:
+        """Submit + polling + download, bloqueando a thread atual. Não faz parse."""
+        cached = self._cache_lookup(slice_ctx)
+        if cached is not None:
+            return cached
+        return self._share(slice_ctx, lambda: completed(self._run, slice_ctx)).result()
+
+    def _run(self, slice_ctx: Mapping) -> Mapping[str, Any]:
+        key = self._request_key(slice_ctx)
+        if self._use_asyncio():
+            return get_engine().run(self._alifecycle(slice_ctx, key)).result()
+
+        resumed = self._take_resumable(key)
+        if resumed is not None:
+            try:
+                self.log.info(f" {self._name}: retomando ticket {resumed}")
+                return self._collect(resumed, self._wait_ticket(resumed))
+            except Exception as e:
+                self.log.warning(f" ticket retomado {resumed} falhou ({e}); submetendo novamente")
+
+        # 1. Submit job
+        ticket = self._submit_tracked(slice_ctx, key)
+        self.log.debug(f": Got ticket {ticket}")
+
+        # 2. Wait for completion
+        status = self._wait_ticket(ticket)
+        return self._collect(ticket, status)
+
+    def _start(self, slice_ctx: Mapping, executor: Executor) -> Future:
+        """Versão encadeada de `_execute` para o pipeline: nenhuma thread fica parada no polling."""
+        cached = self._cache_lookup(slice_ctx)
+        if cached is not None:
+            done: Future = Future()
+            done.set_result(cached)
+            return done
+        return self._share(slice_ctx, lambda: self._launch(slice_ctx, executor))
+
+    def _launch(self, slice_ctx: Mapping, executor: Executor) -> Future:
+        key = self._request_key(slice_ctx)
+        if self._use_asyncio():
+            return get_engine().run(self._alifecycle(slice_ctx, key))
+
+        def _fresh(_=None) -> Future:
+            submitted = executor.submit(self._submit_tracked, slice_ctx, key)
+            return then(
+                submitted,
+                lambda ticket: then(self._watch_ticket(ticket), lambda status: self._collect(ticket, status), executor),
+            )
+
+        resumed = self._take_resumable(key)
+        if resumed is None:
+            return _fresh()
+
+        self.log.info(f" {self._name}: retomando ticket {resumed}")
+        collected = then(self._watch_ticket(resumed), lambda status: self._collect(resumed, status), executor)
+        return recover(collected, _fresh)
+
+    def _download_pool(self) -> ThreadPoolExecutor:
+        """Pool da stream para baixar os `files` de um ticket em paralelo."""
+        if self._downloads is None:
+            self._downloads = ThreadPoolExecutor(
+                max_workers=max(1, int(self._tech("download_concurrency", 4))),
+                thread_name_prefix="btg-download",
+            )
+        return self._downloads
+
+    def _collect(self, ticket: str, status: Mapping, download: Optional[Callable[[str], Future]] = None
+                 ) -> Mapping[str, Any]:
+        """Dispara o download dos arquivos listados no ticket (modo download); o parse espera cada um na ordem."""
+        download = download or (lambda url: self._download_pool().submit(
+            retry_call, lambda: self._download(url), "download", self._max_retries()))
+        self.log.debug(f": Ticket ready, mode: {status.get('__mode__')}")
+        self._record_duration(ticket)
+        files = []
+        if status.get("__mode__") == "download":
+            for file_info in status["json"].get("files", []):
+                # file_info pode ser string (URL) ou dict
+                if isinstance(file_info, str):
+                    url = file_info
+                    file_meta = {"url": url}
+                elif isinstance(file_info, dict):
+                    url = file_info.get("url") or file_info.get("path") or file_info.get("link")
+                    file_meta = file_info
+                else:
+                    continue
+
+                if not url:
+                    continue
+
+                files.append({"file_info": file_info, "file_meta": file_meta,
+                              "payload": download(url)})
+
+        return {"ticket": ticket, "status": status, "files": files}
+
+    # ---------- engine asyncio (config `engine: "asyncio"`) ----------
+    def _use_asyncio(self) -> bool:
+        return self._tech("engine", "threads") == "asyncio"
+
+    def _aclient(self):
+        return get_engine().client(self.url_base, int(self._tech("http_pool_size", DEFAULT_POOL_SIZE)), timeouts(self.cfg))
+
+    async def _arequest(self, method: str, url: str, auth: str, headers: Optional[Mapping[str, str]] = None,
+                        timeout: Optional[Tuple[float, float]] = None, limit: str = "submit", **kwargs):
+        """`_request` em corrotina. A resposta vem em streaming: quem chama lê e fecha (aclose)."""
+        client = self._aclient()
+        connect, read = timeout or timeouts(self.cfg)
+        limiter = self._limiter(limit)
+        renewed = False
+        throttled = 0
+        while True:
+            await limiter.aacquire()
+            token = await self.tk.aget()
+            request = client.build_request(
+                method, url, headers={**self._hdr(auth, token), **(headers or {})},
+                timeout=httpx_timeout(read, connect), **kwargs,
+            )
+            r = await client.send(request, stream=True)
+            if r.status_code == 401 and not renewed:
+                await r.aclose()
+                self.log.info(f" 401 em {url}; renovando token e repetindo")
+                await asyncio.get_running_loop().run_in_executor(None, self.tk.invalidate, token)
+                renewed = True
+                continue
+            if r.status_code == 429 and throttled < RATE_LIMIT_RETRIES:
+                await r.aclose()
+                throttled += 1
+                limiter.throttled(retry_after_seconds(r.headers.get("Retry-After")))
+                continue
+            if r.is_success:
+                limiter.succeeded()
+            return r
+
+    async def _aspool(self, response) -> Payload:
+        """`_spool` em corrotina."""
+        payload = Payload(int(self._tech("download_spill_bytes", DEFAULT_SPILL_BYTES)), self._tech("spill_dir"))
+        try:
+            async for chunk in response.aiter_bytes(CHUNK_BYTES):
+                payload.write(chunk)
+        except BaseException:
+            payload.close()
+            raise
+        finally:
+            await response.aclose()
+        return payload
+
+    async def _asubmit(self, slice_ctx: Mapping) -> str:
+        request = self._render_request(slice_ctx)
+        method = request["method"]
+        url = self.url_base.rstrip("/") + "/" + request["path"].lstrip("/")
+        kind = "xsecure" if self.route.get("submit_auth", "bearer") == "xsecure" else "bearer"
+        self.log.debug(f"DEBUG _asubmit: {method} {url} body={request['body']}")
+        r = await self._arequest(
+            method,
+            url,
+            kind,
+            headers={"Content-Type": "application/json"},
+            json=request["body"] if method == "POST" else None,
+            params=request["params"] if method == "GET" else None,
+        )
+        try:
+            await r.aread()
+        finally:
+            await r.aclose()
+        r.raise_for_status()
+        return self._ticket_from_json(r.json())
+
+    async def _apoll_once(self, ticket_id: str) -> Optional[Mapping]:
+        """`_poll_once` em corrotina."""
+        path = self.route.get("ticket_path", "/reports/Ticket")
+        auth = self.route.get("ticket_auth", "xsecure")
+        url = self.url_base.rstrip("/") + "/" + path.lstrip("/")
+
+        r = await self._arequest("GET", url, auth, params={"ticketId": ticket_id}, limit="poll")
+        if r.status_code != 200:
+            await r.aclose()
+            r.raise_for_status()
+            return None  # outro 2xx (ex. 202): ainda processando
+
+        ctype = (r.headers.get("Content-Type") or "").lower()
+        if "json" not in ctype:
+            return self._status_from_payload(ctype, await self._aspool(r))
+        try:
+            body = await r.aread()
+        finally:
+            await r.aclose()
+        return self._status_from_body(body)
+
+    async def _await_ticket(self, ticket_id: str) -> Mapping:
+        """Polling com o mesmo backoff do TicketPoller, sem ocupar thread."""
+        engine = get_engine()
+        deadline = time.time() + int(self.cfg.get("polling_max_wait_seconds", 900))
+        delay = INITIAL_DELAY
+        failures = [0]
+        while True:
+            await engine.throttle(self._tech("max_polls_per_second"))
+            try:
+                status = await self._apoll_once(ticket_id)
+            except Exception as e:
+                status = self._poll_failed(ticket_id, e, failures)
+            if status is not None:
+                return status
+            if time.time() > deadline:
+                raise TicketTimeout(f"Timeout aguardando ticket {ticket_id}")
+            self.log.debug(f": ticket {ticket_id} waiting {delay}s...")
+            await asyncio.sleep(delay + random.random() * 2)
+            delay = min(delay * BACKOFF_FACTOR, MAX_DELAY)
+
+    async def _adownload(self, url_or_path: str) -> Payload:
+        """`_download` em corrotina; no máximo `download_concurrency` por stream ao mesmo tempo."""
+        if self._adownloads is None:
+            self._adownloads = asyncio.Semaphore(max(1, int(self._tech("download_concurrency", 4))))
+        auth = self.route.get("download_auth", "xsecure")
+        url = (url_or_path if url_or_path.startswith(("http://", "https://"))
+               else self.url_base.rstrip("/") + "/" + url_or_path.lstrip("/"))
+        async with self._adownloads:
+            self.log.debug(f": Downloading from {url}")
+            r = await self._arequest(
+                "GET", url, auth, limit="download",
+                timeout=timeouts(self.cfg, read=max(120, self.cfg.get("http_timeout_seconds", 60))),
+            )
+            if r.is_error:
+                await r.aclose()
+                r.raise_for_status()
+            return self._check_zip(await self._aspool(r))
+
+    async def _alifecycle(self, slice_ctx: Mapping, key: str) -> Mapping[str, Any]:
+        """Submit + polling + downloads do slice como corrotina; mesmo resultado de `_execute`."""
+        download = lambda url: get_engine().run(  # noqa: E731
+            aretry_call(lambda: self._adownload(url), "download", self._max_retries()))
+        resumed = self._take_resumable(key)
+        if resumed is not None:
+            try:
+                self.log.info(f" {self._name}: retomando ticket {resumed}")
+                return self._collect(resumed, await self._await_ticket(resumed), download)
+            except Exception as e:
+                self.log.warning(f" ticket retomado {resumed} falhou ({e}); submetendo novamente")
+
+        ticket = await aretry_call(lambda: self._asubmit(slice_ctx), "submit", self._max_retries())
+        self._track(key, ticket)
+        self.log.debug(f": Got ticket {ticket}")
+        return self._collect(ticket, await self._await_ticket(ticket), download)
+
+    @staticmethod
+    def _release(result: Mapping[str, Any]) -> None:
+        """Libera memória/arquivos temporários dos payloads já emitidos."""
+        payload = result["status"].get("payload")
+        if isinstance(payload, Payload):
+            payload.close()
+        for file in result["files"]:
+            # downloads ainda em andamento são fechados quando terminarem
+            file["payload"].cancel()
+            file["payload"].add_done_callback(
+                lambda f: f.result().close() if not f.cancelled() and f.exception() is None else None
+            )
+
+    def _record_metadata(self) -> dict:
+        """Colunas constantes de todos os registros da stream (subclasses acrescentam as suas)."""
+        return {"_route": self._name}
+
+    def _meta_record(self, rec: Mapping, slice_ctx: Mapping, ticket: str, row_idx: int) -> dict:
+        """Registro avulso (erro/aviso) com os mesmos metadados das linhas."""
+        return {
+            **rec,
+            **self._record_metadata(),
+            "_dt_referencia": slice_ctx.get("date"),
+            "_ticket_id": ticket,
+            "_row_number": row_idx,
+        }
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _date_value(value: str) -> Optional[str]:
+        """Data ISO, dd/mm/YYYY ou YYYYMMDD em dd/mm/YYYY (None se não for data)."""
+        value = value.strip()
+        for fmt, size in (("%Y-%m-%d", 10), ("%d/%m/%Y", 10), ("%Y%m%d", 8)):
+            try:
+                return datetime.strptime(value[:size], fmt).strftime("%d/%m/%Y")
+            except ValueError:
+                continue
+        return None
+
+    def _row_date_fields(self) -> List[str]:
+        return [self.route["row_date_field"]] if self.route.get("row_date_field") else list(ROW_DATE_FIELDS)
+
+    def _row_date(self, rec: Mapping, slice_ctx: Mapping) -> Optional[str]:
+        """
+        `_dt_referencia` (dd/mm/YYYY) da linha. Em janelas de vários dias usa a data
+        da própria linha (`row_date_field` ou campos usuais); sem ela, o fim da janela.
+        """
+        if not slice_ctx.get("end_date_str"):
+            return slice_ctx["date"]
+        for field in self._row_date_fields():
+            value = self.dot_get(rec, field) if "." in field else rec.get(field)
+            if isinstance(value, dict):
+                value = value.get("text")
+            if isinstance(value, str) and self._date_value(value):
+                return self._date_value(value)
+        return slice_ctx["end_date_str"]
+
+    def _row_dates(self, batch: RowBlock, slice_ctx: Mapping) -> Any:
+        """`_row_date` do bloco inteiro: valor constante ou lista por linha (colunar quando possível)."""
+        if not slice_ctx.get("end_date_str"):
+            return slice_ctx["date"]
+        if batch.records is not None:
+            return [self._row_date(rec, slice_ctx) for rec in batch.records]
+        columns = [c for c in map(batch.column, self._row_date_fields()) if c is not None]
+        fallback = slice_ctx["end_date_str"]
+        if not columns:
+            return fallback
+        parse = self._date_value
+        return [
+            next((d for d in (parse(v) if isinstance(v, str) else None for v in values) if d), fallback)
+            for values in zip(*columns)
+        ]
+
+    @staticmethod
+    def _demux_key(value: Any) -> str:
+        return str(value).strip().casefold()
+
+    def _field_values(self, batch: RowBlock, field: str) -> Optional[list]:
+        """Valores de `field` no bloco (caminho com ponto nos registros XML/JSON); None se o campo não existe."""
+        if "." in field and batch.records is not None:
+            values = [self.dot_get(rec, field) for rec in batch.records]
+            if all(v is None for v in values):
+                return None
+        else:
+            values = batch.column(field)
+            if values is None:
+                return None
+        return [v.get("text") if isinstance(v, dict) else v for v in values]
+
+    def _demux_batch(self, batch: RowBlock) -> RowBlock:
+        """
+        `fund_demux`: o submit saiu sem o filtro (ex. fundName) e o payload traz todos os fundos.
+        Ficam só as linhas dos valores pedidos, com a coluna `_<variável>` dos slices por fundo (ex. `_fund_name`).
+        Sem nenhum dos campos nas linhas o slice falha: emitir tudo traria fundos que não foram pedidos.
+        """
+        for variable, wanted in self._demux.items():
+            fields = self.route["demux"][variable]
+            values = next((v for v in (self._field_values(batch, f) for f in fields) if v is not None), None)
+            if values is None:
+                raise ValueError(f"fund_demux: nenhum dos campos {fields} nas linhas de {self._name} para separar "
+                                 f"por {variable}; ajuste `demux`/`record_path` do endpoint ou desligue fund_demux")
+            keys = [None if v is None else wanted.get(self._demux_key(v)) for v in values]
+            indices = [i for i, key in enumerate(keys) if key is not None]
+            if len(indices) < len(keys):
+                batch = batch.take(indices)
+                keys = [keys[i] for i in indices]
+            batch = batch.with_column(f"_{variable}", keys)
+        return batch
+
+    def _stamp(self, batch: RowBlock, slice_ctx: Mapping, ticket: str, row_idx: int, **constants) -> RowBlock:
+        """Metadados do bloco como colunas: constantes, chave `demux`, `_dt_referencia` e faixa de `_row_number`."""
+        if self._demux:
+            batch = self._demux_batch(batch)
+        dates = self._row_dates(batch, slice_ctx)
+        # rota com `demux` fatiada por valor (fan-out): a chave vem do slice
+        keys = {f"_{v}": slice_ctx.get(v) for v in self.route.get("demux") or {} if v not in self._demux}
+        batch = batch.with_constants(**self._record_metadata(), _ticket_id=ticket, **keys, **constants).numbered(row_idx)
+        if isinstance(dates, list):
+            return batch.with_column("_dt_referencia", dates)
+        return batch.with_constants(_dt_referencia=dates)
+
+    def _emit(self, result: Mapping[str, Any], slice_ctx: Mapping) -> Iterable[Mapping]:
+        """Parse do resultado de `_execute` em registros (sempre na thread do read_records); dicts montados só aqui."""
+        ticket = result["ticket"]
+        status = result["status"]
+        row_idx = 0
+
+        if status.get("__mode__") == "inline":
+            # Conteúdo direto (XML/ZIP)
+            for batch in self._parse_payload(status["payload"]):
+                batch = self._stamp(batch, slice_ctx, ticket, row_idx)
+                yield from batch.rows()
+                row_idx += len(batch)
+
+        elif status.get("__mode__") == "download":
+            # JSON com arquivos para download
+            for file in result["files"]:
+                file_info = file["file_info"]
+                try:
+                    for batch in self._parse_payload(file["payload"].result()):
+                        batch = self._stamp(batch, slice_ctx, ticket, row_idx, _file_info=file["file_meta"])
+                        yield from batch.rows()
+                        row_idx += len(batch)
+
+                except Exception as e:
+                    self.log.error(f"ERROR downloading file {file_info}: {e}")
+                    yield self._meta_record(
+                        {"error": f"Download failed: {e}", "file_info": file_info}, slice_ctx, ticket, row_idx
+                    )
                     row_idx += 1
-                    
-            elif status.get("__mode__") == "download":
-                # JSON com arquivos para download
-                json_data = status["json"]
-                files = json_data.get("files", [])
-                
-                for file_info in files:
-                    try:
-                        # file_info pode ser string (URL) ou dict
-                        if isinstance(file_info, str):
-                            url = file_info
-                            file_meta = {"url": url}
-                        elif isinstance(file_info, dict):
-                            url = file_info.get("url") or file_info.get("path") or file_info.get("link")
-                            file_meta = file_info
-                        else:
-                            continue
-                            
-                        if not url:
-                            continue
-                            
-                        payload = self._download(url)
-                        payload = self._unzip_if_needed(payload)
-                        rows = self._parse(payload)
-                        
-                        for rec in rows:
-                            yield {
-                                **(rec if isinstance(rec, dict) else {"value": rec}),
-                                "_route": self._name,
-                                "_dt_referencia": slice_ctx["date"],
-                                "_ticket_id": ticket,
-                                "_row_number": row_idx,
-                                "_file_info": file_meta,
-                            }
-                            row_idx += 1
-                            
-                    except Exception as e:
-                        self.log.error(f"ERROR downloading file {file_info}: {e}")
-                        yield {
-                            "error": f"Download failed: {e}",
-                            "file_info": file_info,
-                            "_route": self._name,
-                            "_dt_referencia": slice_ctx["date"],
-                            "_ticket_id": ticket,
-                            "_row_number": row_idx,
-                        }
-                        row_idx += 1
-                        
-            elif status.get("__mode__") == "json":
-                # Dados JSON diretos
-                json_data = status["json"]
-                result_field = self.route.get("ticket_result_field", "result")
-                result_data = self.dot_get(json_data, result_field) if result_field else json_data
-                
-                if result_data and result_data not in ["Processando", "Processing", "In Progress", "PROCESSING", "PENDING", "Aguardando processamento"]:
-                    # Se result_data é uma lista
-                    if isinstance(result_data, list):
-                        rows = result_data
-                    elif isinstance(result_data, dict):
-                        rows = [result_data]
-                    else:
-                        rows = [{"value": result_data}]
-                        
-                    for rec in rows:
-                        yield {
-                            **(rec if isinstance(rec, dict) else {"value": rec}),
-                            "_route": self._name,
-                            "_dt_referencia": slice_ctx["date"],
-                            "_ticket_id": ticket,
-                            "_row_number": row_idx,
-                            #"_source_json": json_data,
-                        }
-                        row_idx += 1
+
+        elif status.get("__mode__") == "json":
+            # Dados JSON diretos
+            json_data = status["json"]
+            result_field = self.route.get("ticket_result_field", "result")
+            result_data = self.dot_get(json_data, result_field) if result_field else json_data
+
+            if result_data and result_data not in ["Processando", "Processing", "In Progress", "PROCESSING", "PENDING", "Aguardando processamento"]:
+                # Se result_data é uma lista
+                if isinstance(result_data, list):
+                    rows = result_data
+                elif isinstance(result_data, dict):
+                    rows = [result_data]
                 else:
-                    yield {
-                        "message": f"No processable data found in JSON response",
-                        #"json_response": json_data,
-                        "_route": self._name,
-                        "_dt_referencia": slice_ctx["date"],
-                        "_ticket_id": ticket,
-                        "_row_number": 0,
-                    }
+                    rows = [{"value": result_data}]
+
+                # cópia: o JSON do status pode ir para o cache
+                rows = (dict(rec) if isinstance(rec, dict) else rec for rec in rows)
+                for batch in RowBlock.from_records(rows):
+                    batch = self._stamp(batch, slice_ctx, ticket, row_idx)
+                    yield from batch.rows()
+                    row_idx += len(batch)
+            else:
+                yield self._meta_record(
+                    {"message": f"No processable data found in JSON response"}, slice_ctx, ticket, 0
+                )
+        else:
+            # Modo desconhecido
+            yield self._meta_record(
+                {"error": f"Unknown response mode: {status.get('__mode__')}", "status": status}, slice_ctx, ticket, 0
+            )
+
+    def _read_window(self, slice_ctx: Mapping, future: Optional[Future] = None) -> Iterable[Mapping]:
+        """Resultado do slice em registros; em timeout, a janela (date_range) é dividida ao meio e refeita."""
+        key = self._request_key(slice_ctx)
+        try:
+            # ticket consumido só sai do state com a emissão completa (se a leitura parar antes, o
+            # checkpoint ainda o tem para retomar), mas antes do último registro: o state do fim do
+            # slice é o calculado nele
+            records = iter(self._read_result(slice_ctx, key, future))
+            last = next(records, None)
+            for record in records:
+                yield last
+                last = record
+            self._untrack(key)
+            if last is not None:
+                yield last
+        finally:
+            # perdido (erro/leitura interrompida): não deve mais ser retomado
+            self._untrack(key)
+
+    def _read_result(self, slice_ctx: Mapping, key: str, future: Optional[Future]) -> Iterable[Mapping]:
+        result = None
+        try:
+            result = future.result() if future is not None else self._execute(slice_ctx)
+        except TicketTimeout:
+            self._untrack(key)
+            halves = self._split_window(slice_ctx)
+            if halves is None:
+                raise
+
+        if result is None:
+            self._adapt_window(slice_ctx, None)
+            self.log.warning(f" {self._name}: timeout em {slice_ctx['date_iso']}..{slice_ctx['end_date_iso']}, dividindo a janela")
+            for half in halves:
+                yield from self._read_window(half)
+            return
+
+        try:
+            fingerprint = self._snapshot_fingerprint(slice_ctx, result)
+            if fingerprint is None:
+                yield from self._emit(result, slice_ctx)
+            elif self._snapshots.get(key) == fingerprint:
+                self.log.info(f" {self._name}: conteúdo igual ao da última sincronização, nada a emitir")
             else:
-                # Modo desconhecido
-                yield {
-                    "error": f"Unknown response mode: {status.get('__mode__')}",
-                    "status": status,
-                    "_route": self._name,
-                    "_dt_referencia": slice_ctx["date"],
-                    "_ticket_id": ticket,
-                    "_row_number": 0,
-                }
-                
+                yield from self._emit_snapshot(key, fingerprint, result, slice_ctx)
+            self._adapt_window(slice_ctx, result)
+            self._cache_store(slice_ctx, result)
+        finally:
+            self._done_with(slice_ctx, result)
+
+    def read_records(self, stream_slice: Mapping = None, **kwargs) -> Iterable[Mapping]:
+        self.log.debug(f" read_records: ENTRADA")
+        self.log.debug(f"read_records: stream_slice = {stream_slice}")
+        self.log.debug(f" read_records: type(stream_slice) = {type(stream_slice)}")
+        self.log.debug(f" read_records: kwargs = {kwargs}")
+
+        slice_ctx = self._slice_context(stream_slice)
+        self.log.debug(f" read_records: slice_ctx final = {slice_ctx}")
+
+        try:
+            # slice já submetido pelo pipeline? senão executa em linha
+            future = self._pipeline.take(stream_slice) if self._pipeline is not None else None
+            yield from self._read_window(slice_ctx, future)
+
         except Exception as e:
             self.log.error(f" in read_records: {e}")
             # Yield erro como record para debug
-            yield {
-                "error": str(e),
-                "slice_ctx": slice_ctx,
-                "_route": self._name,
-                "_dt_referencia": slice_ctx.get("date"),
-                "_ticket_id": "error",
-                "_row_number": 0,
-            }
+            yield self._meta_record({"error": str(e), "slice_ctx": slice_ctx}, slice_ctx, "error", 0)
 
 
 # Alias para compatibilidade
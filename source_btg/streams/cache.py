@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import logging
+
+log = logging.getLogger("airbyte")
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+MANIFEST = "manifest.json"
+
+
+def cache_key(route_name: str, method: str, path: str, body: Any, params: Any) -> str:
+    """Chave estável do pedido: rota + corpo/params já expandidos."""
+    blob = json.dumps({"r": route_name, "m": method, "p": path, "b": body, "q": params},
+                      sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class PayloadCache:
+    """
+    Cache em disco dos payloads brutos (ainda comprimidos) de cada ticket:
+      <dir>/<chave>/manifest.json  -> ticket, modo, metadados dos arquivos, validade
+      <dir>/<chave>/<n>.bin        -> conteúdo como veio da API
+    Entradas expiram por TTL (None = nunca) e são removidas por LRU acima de `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _manifest(self, entry: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """(manifest válido ou None, entrada expirada/incompleta); só lê o disco."""
+        try:
+            with open(os.path.join(entry, MANIFEST), "r", encoding="utf-8") as fh:
+                manifest = json.load(fh)
+        except (OSError, ValueError):
+            return None, False
+
+        expires_at = manifest.get("expires_at")
+        if expires_at is not None and time.time() > expires_at:
+            return None, True
+
+        blobs = [manifest.get("blob")] + [f.get("blob") for f in manifest.get("files", [])]
+        if any(b and not os.path.exists(os.path.join(entry, b)) for b in blobs):
+            return None, True
+        return manifest, False
+
+    def contains(self, key: str) -> bool:
+        """Há entrada válida? Não conta como uso no LRU nem remove entradas expiradas (ex. `plan`)."""
+        return self._manifest(self._entry_dir(key))[0] is not None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Manifest da entrada válida (com caminhos absolutos dos blobs) ou None."""
+        entry = self._entry_dir(key)
+        manifest, stale = self._manifest(entry)
+        if stale:
+            self._remove(entry)
+        if manifest is None:
+            return None
+
+        # LRU: o mtime do manifest marca o último uso
+        try:
+            os.utime(os.path.join(entry, MANIFEST))
+        except OSError:
+            pass
+        manifest["dir"] = entry
+        return manifest
+
+    def put(self, key: str, manifest: Mapping[str, Any], blobs: Mapping[str, Any],
+            ttl_seconds: Optional[float]) -> None:
+        """Grava a entrada de forma atômica. `blobs` mapeia nome -> stream binário a copiar."""
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.directory)
+        try:
+            size = 0
+            for name, stream in blobs.items():
+                with open(os.path.join(tmp, name), "wb") as out:
+                    shutil.copyfileobj(stream, out, 1024 * 1024)
+                    size += out.tell()
+            data = {
+                **manifest,
+                "size": size,
+                "created_at": time.time(),
+                "expires_at": None if ttl_seconds is None else time.time() + ttl_seconds,
+            }
+            with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as fh:
+                json.dump(data, fh, ensure_ascii=False, default=str)
+
+            entry = self._entry_dir(key)
+            self._remove(entry)
+            try:
+                os.replace(tmp, entry)
+            except OSError:
+                # outro processo gravou a mesma chave ao mesmo tempo
+                self._remove(tmp)
+        except Exception:
+            self._remove(tmp)
+            raise
+        self._evict()
+
+    def _remove(self, path: str) -> None:
+        shutil.rmtree(path, ignore_errors=True)
+
+    def _evict(self) -> None:
+        """Remove expirados e, se passar do orçamento, os menos usados."""
+        with self._lock:
+            entries: List[tuple] = []
+            total = 0
+            now = time.time()
+            for name in os.listdir(self.directory):
+                if name.startswith(".tmp-"):
+                    continue
+                manifest_path = os.path.join(self.directory, name, MANIFEST)
+                try:
+                    with open(manifest_path, "r", encoding="utf-8") as fh:
+                        meta = json.load(fh)
+                    used_at = os.path.getmtime(manifest_path)
+                except (OSError, ValueError):
+                    continue
+                if meta.get("expires_at") is not None and now > meta["expires_at"]:
+                    self._remove(os.path.join(self.directory, name))
+                    continue
+                size = int(meta.get("size") or 0)
+                entries.append((used_at, size, name))
+                total += size
+
+            entries.sort()
+            while total > self.max_bytes and entries:
+                _, size, name = entries.pop(0)
+                log.debug(f": cache LRU removendo {name} ({size} bytes)")
+                self._remove(os.path.join(self.directory, name))
+                total -= size
+
+
+_CACHES: Dict[str, PayloadCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_cache(directory: str, max_bytes: int = DEFAULT_MAX_BYTES) -> PayloadCache:
+    """Uma instância por diretório no processo (compartilha o lock de eviction)."""
+    directory = os.path.abspath(directory)
+    with _CACHES_LOCK:
+        cache = _CACHES.get(directory)
+        if cache is None:
+            cache = _CACHES[directory] = PayloadCache(directory, max_bytes)
+        cache.max_bytes = int(max_bytes)
+        return cache
@@ -1,8 +1,30 @@
+# Chaves opcionais por endpoint (além de submit_*/parameters):
+#   format: "xml" | "json" | "csv" | "text" (parsers.registry); sem ele, detectado pelos primeiros bytes.
+#   encoding: encoding do payload de texto (CSV/JSON/texto); sem ele, utf-8 (com/sem BOM) ou latin-1.
+#   delimiter: separador do CSV; sem ele, detectado na amostra.
+#   record_path: caminho do elemento repetido no XML (ex.: "Report.Positions.Position"; `*` casa
+#                qualquer nome), ou da lista de registros no JSON; cada ocorrência vira um registro.
+#                Lista = caminhos candidatos. Sem ele, ou se nenhum caminho aparece no payload, o
+#                documento inteiro é um registro. Atributos e campos escalares dos ancestrais (ex.
+#                cabeçalho com o fundo) vão junto em cada registro; o resto fora do caminho é
+#                descartado, então só declare caminhos conferidos num payload real. Nenhum endpoint
+#                declara ainda; o config define por endpoint (`endpoints.<nome>.record_path`).
+#   cache_ttl_seconds: validade do payload no cache em disco (padrão: config `cache_ttl_seconds`).
+#   immutable_history: datas passadas nunca mudam; no cache essas entradas não expiram.
+#   date_range: aceita startDate/endDate; os slices viram janelas de vários dias
+#               ({{date_iso}} .. {{end_date_iso}}), com tamanho adaptativo.
+#   row_date_field: campo de data de cada linha, usado em `_dt_referencia` nas janelas.
+#   snapshot: a rota devolve o cadastro inteiro (sem data); no incremental, o fingerprint do conteúdo
+#             fica no state e um payload igual ao da sincronização anterior não é emitido de novo.
+#   demux: {variável: [campos da linha]}; com `fund_demux` (config ou endpoint), o campo do filtro
+#          (ex. "fundName": "{{fund_name}}") sai do submit, vai um ticket para todos os valores e as
+#          linhas são separadas localmente pelo primeiro campo encontrado, com a coluna `_<variável>`.
 ENDPOINT_CONFIGS = {
     "cadastro_fundos": {
         "submit_path": "/reports/Fund",
         "submit_method": "POST",
         "submit_auth": "xsecure",
+        "snapshot": True,
         "submit_body": {
             "contract":{
                 
@@ -26,10 +48,12 @@ ENDPOINT_CONFIGS = {
         "submit_path": "/reports/Cash/FundAccountStatement",
         "submit_auth": "xsecure",
         "submit_method": "POST", 
+        "immutable_history": True,
+        "date_range": True,
         "submit_body": {
             "contract": {
                 "startDate": "{{date_iso}}",
-                "endDate": "{{date_iso}}"
+                "endDate": "{{end_date_iso}}"
             }
         }
     },
@@ -38,10 +62,12 @@ ENDPOINT_CONFIGS = {
         "submit_path": "/reports/Cash/Cashflow",
         "submit_auth": "xsecure",
         "submit_method": "POST",
+        "immutable_history": True,
+        "date_range": True,
         "submit_body": {
             "contract": {
                 "startDate": "{{date_iso}}",
-                "endDate": "{{date_iso}}"
+                "endDate": "{{end_date_iso}}"
             }
         }
     },
@@ -61,10 +87,11 @@ ENDPOINT_CONFIGS = {
         "submit_path": "/reports/RTA/FundFlow",
         "submit_method": "POST",
         "submit_auth": "xsecure",
+        "date_range": True,
         "submit_body": {                      
                 "contract": {
                     "startDate": "{{date_iso}}",
-                    "endDate": "{{date_iso}}"
+                    "endDate": "{{end_date_iso}}"
                 }
             } 
         
@@ -74,10 +101,11 @@ ENDPOINT_CONFIGS = {
         "submit_path": "/reports/RTA/ConsultTrade",
         "submit_method": "POST",
         "submit_auth": "xsecure",
+        "date_range": True,
         "submit_body": {
                     "contract": {
                         "startDate": "{{date_iso}}",
-                        "endDate": "{{date_iso}}",
+                        "endDate": "{{end_date_iso}}",
                         "consultType": "{{consult_type}}",
                         "status": "{{status}}"
                     }
@@ -97,6 +125,9 @@ ENDPOINT_CONFIGS = {
                 "fundName": "{{fund_name}}"
             }
         },
+        "demux": {
+            "fund_name": ["fundName", "FundName", "Fund", "Fundo", "NomeFundo"]
+        },
         "parameters": {
             "report_types": [1, 2, 3, 4, 5],
             "fund_names": ["RIZA STATHEROS FIC FIM CP", "BTG ABSOLUTO FIC FIM"]
@@ -111,6 +142,9 @@ ENDPOINT_CONFIGS = {
                 "queryDate": "{{date_iso}}",
                 "fundName": "{{fund_name}}"
             }
+        },
+        "demux": {
+            "fund_name": ["fundName", "FundName", "Fund", "Fundo", "NomeFundo"]
         }
     }
 }
\ No newline at end of file
@@ -0,0 +1,164 @@
+import io
+import mmap
+import os
+import tempfile
+from typing import IO, Iterable, Optional
+
+import logging
+
+log = logging.getLogger("airbyte")
+
+DEFAULT_SPILL_BYTES = 32 * 1024 * 1024
+CHUNK_BYTES = 1024 * 1024
+
+
+class _MemoryReader(io.RawIOBase):
+    """Leitor seekable sobre um memoryview (bytes em memória ou mmap), sem cópia."""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = min(len(b), len(self._view) - self._pos)
+        if n <= 0:
+            return 0
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = len(self._view) + offset
+        self._pos = max(0, self._pos)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self) -> None:
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+class Payload:
+    """
+    Conteúdo de um resultado (inline ou download):
+      - até `spill_bytes` fica em memória
+      - acima disso é gravado em arquivo temporário e lido pelo parser via mmap
+    `open()` devolve um stream binário seekable (com peek) que não copia o conteúdo.
+    """
+
+    def __init__(self, spill_bytes: int = DEFAULT_SPILL_BYTES, spill_dir: Optional[str] = None):
+        self._spill_bytes = spill_bytes
+        self._spill_dir = spill_dir
+        self._buffer: Optional[bytearray] = bytearray()
+        self._file: Optional[IO[bytes]] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._readers: list = []
+        self.size = 0
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Payload":
+        payload = cls(spill_bytes=len(data) + 1)
+        payload.write(data)
+        return payload
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[bytes], spill_bytes: int = DEFAULT_SPILL_BYTES,
+                    spill_dir: Optional[str] = None) -> "Payload":
+        payload = cls(spill_bytes, spill_dir)
+        try:
+            for chunk in chunks:
+                if chunk:
+                    payload.write(chunk)
+        except BaseException:
+            payload.close()
+            raise
+        return payload
+
+    @classmethod
+    def from_file(cls, path: str) -> "Payload":
+        """Payload sobre um arquivo existente (ex.: cache), lido via mmap; o arquivo não é apagado."""
+        payload = cls(spill_bytes=0)
+        payload._file = open(path, "rb")
+        payload._buffer = None
+        payload.size = os.path.getsize(path)
+        return payload
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def write(self, chunk: bytes) -> None:
+        if self._file is None and self.size + len(chunk) > self._spill_bytes:
+            log.debug(f": payload > {self._spill_bytes} bytes, gravando em disco")
+            self._file = tempfile.TemporaryFile(prefix="btg-payload-", dir=self._spill_dir)
+            self._file.write(self._buffer)
+            self._buffer = None
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer += chunk
+        self.size += len(chunk)
+
+    def spill(self) -> None:
+        """Move para disco o conteúdo em memória (payload que vai esperar outro consumidor)."""
+        if self._file is not None or self.size == 0:
+            return
+        for reader in self._readers:
+            reader.close()
+        self._readers = []
+        self._file = tempfile.TemporaryFile(prefix="btg-payload-", dir=self._spill_dir)
+        self._file.write(self._buffer)
+        self._buffer = None
+
+    def _view(self) -> memoryview:
+        if self._file is None:
+            return memoryview(self._buffer)
+        if self._mmap is None:
+            self._file.flush()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def head(self, size: int = 1024) -> bytes:
+        if self.size == 0:
+            return b""
+        with self._view() as view:
+            return bytes(view[:size])
+
+    def open(self) -> io.BufferedReader:
+        if self.size == 0:
+            return io.BufferedReader(io.BytesIO(b""))
+        reader = _MemoryReader(self._view())
+        self._readers.append(reader)
+        return io.BufferedReader(reader)
+
+    def read(self) -> bytes:
+        """Cópia integral do conteúdo (para payloads pequenos/fallbacks)."""
+        with self.open() as stream:
+            return stream.read()
+
+    def close(self) -> None:
+        for reader in self._readers:
+            reader.close()
+        self._readers = []
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._buffer = bytearray()
+        self.size = 0
@@ -0,0 +1,178 @@
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Iterable, Iterator, Mapping, Optional, Set, Tuple
+
+import logging
+
+log = logging.getLogger("airbyte")
+
+
+def _settle(out: Future, value: Any = None, exc: Optional[BaseException] = None) -> None:
+    if out.done():
+        return
+    if exc is not None:
+        out.set_exception(exc)
+    else:
+        out.set_result(value)
+
+
+def then(future: Future, fn: Callable[[Any], Any], executor: Optional[Executor] = None) -> Future:
+    """
+    Encadeia `fn(resultado)` ao término de `future` (no executor, se dado, senão no callback).
+    Se `fn` devolver outro Future, o resultado final é o dele. Erros/cancelamento propagam.
+    """
+    out: Future = Future()
+
+    def _run(value: Any) -> None:
+        if out.done():
+            return
+        try:
+            res = fn(value)
+        except BaseException as e:
+            _settle(out, exc=e)
+            return
+        if isinstance(res, Future):
+            res.add_done_callback(lambda f: _settle(out, None, f.exception()) if f.exception() is not None
+                                  else _settle(out, f.result()))
+        else:
+            _settle(out, res)
+
+    def _done(f: Future) -> None:
+        if f.cancelled():
+            out.cancel()
+            return
+        if f.exception() is not None:
+            _settle(out, exc=f.exception())
+            return
+        if executor is None:
+            _run(f.result())
+            return
+        try:
+            executor.submit(_run, f.result())
+        except RuntimeError as e:
+            # executor já encerrado (pipeline finalizado)
+            _settle(out, exc=e)
+
+    future.add_done_callback(_done)
+    return out
+
+
+def recover(future: Future, fn: Callable[[BaseException], Any]) -> Future:
+    """Se `future` falhar, o resultado passa a ser `fn(erro)` (valor ou outro Future)."""
+    out: Future = Future()
+
+    def _done(f: Future) -> None:
+        if f.cancelled():
+            out.cancel()
+            return
+        if f.exception() is None:
+            _settle(out, f.result())
+            return
+        try:
+            res = fn(f.exception())
+        except BaseException as e:
+            _settle(out, exc=e)
+            return
+        if isinstance(res, Future):
+            res.add_done_callback(lambda r: _settle(out, None, r.exception()) if r.exception() is not None
+                                  else _settle(out, r.result()))
+        else:
+            _settle(out, res)
+
+    future.add_done_callback(_done)
+    return out
+
+
+def completed(fn: Callable[..., Any], *args: Any) -> Future:
+    """Future já resolvido com `fn(*args)` (ou com o erro), executado na thread atual."""
+    out: Future = Future()
+    try:
+        out.set_result(fn(*args))
+    except BaseException as e:
+        out.set_exception(e)
+    return out
+
+
+class SlicePipeline:
+    """
+    Executa o ciclo de vida dos tickets à frente do consumo, puxado por quem lê os resultados:
+      - `take(slice)` devolve o Future do slice e completa a fila até `max_in_flight` slices
+        submetidos/em polling/baixando; nada é submetido fora de `take`, então o limite vale mesmo
+        que os slices sejam gerados (ou esgotados pelo CDK) bem antes da leitura
+      - a fila de futures é limitada, então a memória não cresce com o backfill
+      - os slices são entregues na mesma ordem em que foram gerados
+    `start(slice, executor)` devolve o Future do resultado; as etapas bloqueantes
+    (submit/download) rodam no executor e o polling fica com o TicketPoller.
+    """
+
+    def __init__(self, start: Callable[[Mapping, Executor], Future], max_in_flight: int,
+                 slices: Iterable[Mapping]):
+        self._start = start
+        self._max_in_flight = max(1, int(max_in_flight))
+        self._slices: Optional[Iterator[Mapping]] = iter(slices)
+        self._queue: Deque[Tuple[Mapping, Future]] = deque()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # futures ainda em andamento; o executor só encerra depois deles (o slice entregue ainda é lido)
+        self._lock = threading.Lock()
+        self._running: Set[Future] = set()
+        self._closed = False
+
+    def take(self, slice_: Optional[Mapping]) -> Optional[Future]:
+        """Future do slice se ele for o próximo da fila (o CDK pode acrescentar chaves ao slice)."""
+        self._fill()
+        if not self._queue:
+            return None
+        head, future = self._queue[0]
+        given = slice_ or {}
+        if not all(k in given and given[k] == v for k, v in head.items()):
+            log.debug(f"pipeline: slice fora de ordem, executando em linha ({given})")
+            return None
+        self._queue.popleft()
+        # repõe a fila antes de devolver o slice, para manter N tickets em andamento
+        self._fill()
+        if not self._queue and self._slices is None:
+            self.close()
+        return future
+
+    def _fill(self) -> None:
+        while self._slices is not None and len(self._queue) < self._max_in_flight:
+            nxt = next(self._slices, None)
+            if nxt is None:
+                self._slices = None
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_in_flight, thread_name_prefix="btg-ticket")
+            try:
+                future = self._start(nxt, self._executor)
+            except Exception as e:
+                # erro do slice (ex. template) fica no future dele: o read_records o transforma em registro
+                future = Future()
+                future.set_exception(e)
+            with self._lock:
+                self._running.add(future)
+            future.add_done_callback(self._finished)
+            self._queue.append((nxt, future))
+
+    def _finished(self, future: Future) -> None:
+        with self._lock:
+            self._running.discard(future)
+            last = self._closed and not self._running
+        if last:
+            self._shutdown()
+
+    def _shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def close(self) -> None:
+        """Fim da leitura: slices na fila não vão ser lidos; o executor encerra quando o último terminar."""
+        self._slices = None
+        while self._queue:
+            _, future = self._queue.popleft()
+            future.cancel()
+        with self._lock:
+            self._closed = True
+            idle = not self._running
+        if idle:
+            self._shutdown()
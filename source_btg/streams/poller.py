@@ -0,0 +1,167 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Mapping, Optional, Tuple, Union
+
+import logging
+
+log = logging.getLogger("airbyte")
+
+# backoff por ticket (mesmos valores do antigo loop do _wait_ticket)
+INITIAL_DELAY = 5
+MAX_DELAY = 45
+BACKOFF_FACTOR = 1.5
+
+
+class TicketTimeout(Exception):
+    """O ticket não ficou pronto dentro de `max_wait`."""
+
+
+class Defer:
+    """Resposta de `poll_once` sem consultar o ticket (rate limit, 429): tentar de novo em `seconds`."""
+    __slots__ = ("seconds",)
+
+    def __init__(self, seconds: float):
+        self.seconds = max(0.0, float(seconds))
+
+
+# status final, None (ainda processando), Defer, ou Future de um desses (corpo lido fora do poller)
+PollResult = Union[Optional[Mapping], Defer, Future]
+
+
+class _Watch:
+    __slots__ = ("ticket_id", "poll_once", "deadline", "delay", "future")
+
+    def __init__(self, ticket_id: str, poll_once: Callable[[], PollResult], deadline: float):
+        self.ticket_id = ticket_id
+        self.poll_once = poll_once
+        self.deadline = deadline
+        self.delay = INITIAL_DELAY
+        self.future: Future = Future()
+
+
+class TicketPoller:
+    """
+    Poller único do processo para todos os tickets em aberto (todas as streams e categorias).
+      - uma thread acorda pela fila de prioridade de próximos polls
+      - cada ticket mantém seu próprio backoff (5s -> x1.5 -> 45s, com jitter)
+      - `max_polls_per_second` limita a taxa agregada de GET /reports/Ticket
+    A thread só consulta o status: `poll_once` não dorme (espera de rate limit/429 volta como `Defer`
+    e vira o horário do próximo poll) e o corpo grande (XML/ZIP inline) é lido em outro executor,
+    devolvido como Future. O ticket concluído é entregue pelo Future devolvido em `watch`.
+    """
+
+    def __init__(self, max_polls_per_second: Optional[float] = None):
+        self._heap: List[Tuple[float, int, _Watch]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._last_poll = 0.0
+        self._min_interval = 0.0
+        self.set_rate(max_polls_per_second)
+
+    def set_rate(self, max_polls_per_second: Optional[float]) -> None:
+        with self._cond:
+            self._min_interval = 1.0 / float(max_polls_per_second) if max_polls_per_second else 0.0
+            self._cond.notify()
+
+    def watch(self, ticket_id: str, poll_once: Callable[[], PollResult], max_wait: float) -> Future:
+        """Agenda o ticket; `poll_once` devolve o status final, None se ainda processando, ou `Defer`."""
+        entry = _Watch(ticket_id, poll_once, time.time() + max_wait)
+        self._push(time.time(), entry)
+        return entry.future
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def _push(self, when: float, entry: _Watch) -> None:
+        with self._cond:
+            heapq.heappush(self._heap, (when, next(self._seq), entry))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="btg-ticket-poller", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _next_due(self) -> _Watch:
+        with self._cond:
+            while True:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                now = time.time()
+                due_at = max(self._heap[0][0], self._last_poll + self._min_interval)
+                if due_at > now:
+                    self._cond.wait(due_at - now)
+                    continue
+                _, _, entry = heapq.heappop(self._heap)
+                self._last_poll = now
+                return entry
+
+    def _run(self) -> None:
+        while True:
+            entry = self._next_due()
+            if entry.future.cancelled():
+                continue
+            try:
+                status = entry.poll_once()
+            except Exception as e:
+                self._fail(entry, e)
+                continue
+            if isinstance(status, Future):
+                status.add_done_callback(lambda f, entry=entry: self._settle(entry, f))
+            else:
+                self._handle(entry, status)
+
+    def _settle(self, entry: _Watch, result: Future) -> None:
+        """Corpo lido fora do poller: segue como o retorno de `poll_once`."""
+        if result.cancelled():
+            entry.future.cancel()
+        elif result.exception() is not None:
+            self._fail(entry, result.exception())
+        else:
+            self._handle(entry, result.result())
+
+    @staticmethod
+    def _fail(entry: _Watch, error: BaseException) -> None:
+        if not entry.future.done():
+            entry.future.set_exception(error)
+
+    def _handle(self, entry: _Watch, status: Union[Optional[Mapping], Defer]) -> None:
+        if entry.future.done():
+            return
+        if status is not None and not isinstance(status, Defer):
+            log.debug(f" poller: ticket {entry.ticket_id} pronto")
+            entry.future.set_result(status)
+            return
+
+        if time.time() > entry.deadline:
+            entry.future.set_exception(TicketTimeout(f"Timeout aguardando ticket {entry.ticket_id}"))
+            return
+
+        if isinstance(status, Defer):
+            # ticket não consultado: nova tentativa no prazo pedido, sem avançar o backoff
+            self._push(time.time() + status.seconds, entry)
+            return
+
+        log.debug(f": ticket {entry.ticket_id} waiting {entry.delay}s...")
+        self._push(time.time() + entry.delay + random.random() * 2, entry)
+        entry.delay = min(entry.delay * BACKOFF_FACTOR, MAX_DELAY)
+
+
+_POLLER: Optional[TicketPoller] = None
+_POLLER_LOCK = threading.Lock()
+
+
+def get_poller(max_polls_per_second: Optional[float] = None) -> TicketPoller:
+    """Poller compartilhado do processo; a última taxa configurada vale para todos."""
+    global _POLLER
+    with _POLLER_LOCK:
+        if _POLLER is None:
+            _POLLER = TicketPoller(max_polls_per_second)
+        elif max_polls_per_second is not None:
+            _POLLER.set_rate(max_polls_per_second)
+        return _POLLER
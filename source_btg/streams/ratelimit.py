@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import logging
+
+log = logging.getLogger("airbyte")
+
+# tipos de rota limitados separadamente
+KINDS = ("submit", "poll", "download")
+# AIMD: 429 multiplica a taxa por DECREASE; cada sucesso soma INCREASE da taxa configurada
+DECREASE = 0.5
+INCREASE = 0.02
+MIN_RATE = 0.05
+# quantas vezes a mesma request é repetida após 429
+RATE_LIMIT_RETRIES = 5
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Retry-After em segundos ou data HTTP."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket com taxa adaptativa:
+      - `rate` None = sem limite até o primeiro 429 (aí parte da metade da taxa observada)
+      - 429 reduz a taxa (x0.5) e, com Retry-After, bloqueia o bucket até o prazo
+      - cada sucesso devolve um pouco da taxa, até o teto configurado
+    `reserve()` reserva a vez e devolve quanto esperar; serve a threads e corrotinas.
+    """
+
+    def __init__(self, name: str, rate: Optional[float] = None, burst: Optional[float] = None):
+        self.name = name
+        self.ceiling = float(rate) if rate else None
+        self.rate = self.ceiling
+        self.burst = float(burst or max(1.0, self.ceiling or 1.0))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._recent: deque = deque(maxlen=50)
+        self._lock = threading.Lock()
+
+    def configure(self, rate: Optional[float], burst: Optional[float] = None) -> None:
+        with self._lock:
+            ceiling = float(rate) if rate else None
+            if ceiling != self.ceiling:
+                self.ceiling = ceiling
+                self.rate = ceiling if self.rate is None or ceiling is None else min(self.rate, ceiling)
+            self.burst = float(burst or max(1.0, self.ceiling or 1.0))
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._recent.append(now)
+            wait = max(0.0, self._blocked_until - now)
+            if self.rate is None:
+                return wait
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def throttled(self, retry_after: Optional[float]) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+            if self.rate is None:
+                span = now - self._recent[0] if len(self._recent) > 1 else 0.0
+                observed = len(self._recent) / span if span > 0 else 1.0
+                self.rate = max(MIN_RATE, observed * DECREASE)
+                self._tokens = 0.0
+                self._updated = now
+            else:
+                self.rate = max(MIN_RATE, self.rate * DECREASE)
+            log.info(f" rate limit {self.name}: 429 -> {self.rate:.2f} req/s"
+                     + (f", pausa {retry_after:.0f}s" if retry_after else ""))
+
+    def succeeded(self) -> None:
+        with self._lock:
+            if self.rate is None:
+                return
+            self.rate += (self.ceiling or self.rate) * INCREASE
+            if self.ceiling is not None:
+                self.rate = min(self.rate, self.ceiling)
+
+
+class RateLimiter:
+    """Conjunto de buckets que uma request precisa atravessar (categoria+tipo e global)."""
+
+    def __init__(self, buckets: List[TokenBucket]):
+        self.buckets = buckets
+
+    def reserve(self) -> float:
+        """Reserva a vez em todos os buckets; devolve quanto esperar antes da request (não dorme)."""
+        return max([b.reserve() for b in self.buckets] or [0.0])
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def throttled(self, retry_after: Optional[float]) -> None:
+        for bucket in self.buckets:
+            bucket.throttled(retry_after)
+
+    def succeeded(self) -> None:
+        for bucket in self.buckets:
+            bucket.succeeded()
+
+
+_BUCKETS: Dict[Tuple[str, str], TokenBucket] = {}
+_LOCK = threading.Lock()
+
+
+def _bucket(scope: str, kind: str, rate: Optional[float], burst: Optional[float]) -> TokenBucket:
+    with _LOCK:
+        bucket = _BUCKETS.get((scope, kind))
+        if bucket is None:
+            bucket = _BUCKETS[(scope, kind)] = TokenBucket(f"{scope}/{kind}", rate, burst)
+        else:
+            bucket.configure(rate, burst)
+        return bucket
+
+
+def get_limiter(category: str, kind: str, limits: Mapping, category_limits: Mapping) -> RateLimiter:
+    """
+    Limiter do processo para (categoria, tipo de rota):
+      limits = {"submit": 2, "poll": 10, "download": 4, "global": 20, "burst": 5}
+      category_limits = {"GESTORA": {"submit": 1}}  (sobrescreve por categoria)
+    Taxas em requests/segundo; ausente = sem limite até o primeiro 429.
+    """
+    merged = {**(limits or {}), **((category_limits or {}).get(category) or {})}
+    burst = merged.get("burst")
+    buckets = [_bucket(category, kind, merged.get(kind), burst)]
+    if (limits or {}).get("global"):
+        buckets.append(_bucket("*", "global", limits["global"], burst))
+    return RateLimiter(buckets)
@@ -0,0 +1,81 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+from zipfile import BadZipFile
+
+import logging
+import requests
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - depende do ambiente
+    httpx = None
+
+log = logging.getLogger("airbyte")
+
+T = TypeVar("T")
+
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+# status HTTP que valem nova tentativa (429 que sobrou do rate limiter também)
+TRANSIENT_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+def _status(exc: BaseException):
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """
+    Transitório: 5xx/408/429, conexão resetada, timeout, corpo truncado (ZIP inválido).
+    Permanente: demais 4xx (erro de contrato) e qualquer outra exceção.
+    """
+    if isinstance(exc, BadZipFile):
+        return True
+    if isinstance(exc, requests.HTTPError):
+        return _status(exc) in TRANSIENT_STATUS
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)):
+        return True
+    if httpx is not None:
+        if isinstance(exc, httpx.HTTPStatusError):
+            return _status(exc) in TRANSIENT_STATUS
+        if isinstance(exc, httpx.TransportError):
+            return True
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+
+def backoff(attempt: int) -> float:
+    """Exponencial com full jitter: uniforme em [0, min(MAX_DELAY, BASE_DELAY * 2^attempt)]."""
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * (2 ** attempt)))
+
+
+def retry_call(fn: Callable[[], T], stage: str, max_retries: int) -> T:
+    """Executa `fn` repetindo só erros transitórios, até `max_retries` vezes."""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_transient(e):
+                raise
+            delay = backoff(attempt)
+            attempt += 1
+            log.warning(f" {stage}: erro transitório ({e}); tentativa {attempt}/{max_retries} em {delay:.1f}s")
+            time.sleep(delay)
+
+
+async def aretry_call(fn: Callable[[], Awaitable[Any]], stage: str, max_retries: int) -> Any:
+    """`retry_call` para corrotinas."""
+    attempt = 0
+    while True:
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_transient(e):
+                raise
+            delay = backoff(attempt)
+            attempt += 1
+            log.warning(f" {stage}: erro transitório ({e}); tentativa {attempt}/{max_retries} em {delay:.1f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,150 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Set, Tuple
+
+import logging
+
+log = logging.getLogger("airbyte")
+
+
+def _failed(future: Future) -> bool:
+    return future.done() and (future.cancelled() or future.exception() is not None)
+
+
+class _Entry:
+    __slots__ = ("future", "pending", "release", "park")
+
+    def __init__(self, future: Future, pending: Set[str], release: Callable[[Any], None],
+                 park: Callable[[Any], None]):
+        self.future = future
+        self.pending = pending
+        self.release = release
+        self.park = park
+
+
+class RequestRegistry:
+    """
+    Pedidos idênticos entre streams da mesma sincronização (ex. `cadastro_fundos` em várias categorias
+    com as mesmas credenciais): um ticket e um download; cada stream emite os seus registros.
+      - `join(group, consumer)`: stream selecionada que consome os pedidos do grupo (credenciais + rota)
+      - `begin(consumer)` / `expect(consumer, key)` / `finish(consumer)`: chaves que a stream vai pedir,
+        informadas conforme os slices dela são gerados; ao fim da geração, resultados que ela não
+        pediu deixam de esperar por ela
+      - `share(key, ...)`: o primeiro pedido da chave dispara `start()`, os seguintes recebem o mesmo Future
+      - `done(key, consumer)`: a stream terminou de emitir o resultado; enquanto outra ainda vai consumi-lo,
+        `park` tira os payloads grandes da memória; o último consumidor libera tudo
+    O que sobrar (stream que não chegou a pedir a chave) é liberado em `close()`, no fim do read.
+    Pedido que falhou ou foi cancelado não é reaproveitado: a próxima stream submete de novo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._members: Dict[Hashable, Set[str]] = {}
+        # chaves informadas por stream; `_open`: a geração dos slices ainda não terminou
+        self._plans: Dict[str, Set[str]] = {}
+        self._open: Set[str] = set()
+        self._entries: Dict[str, _Entry] = {}
+
+    def join(self, group: Hashable, consumer: str) -> None:
+        with self._lock:
+            self._members.setdefault(group, set()).add(consumer)
+
+    def consumers(self, group: Hashable) -> int:
+        return len(self._members.get(group, ()))
+
+    def begin(self, consumer: str) -> None:
+        """A stream começou a gerar os slices: até `finish`, qualquer chave ainda pode ser pedida por ela."""
+        with self._lock:
+            self._plans[consumer] = set()
+            self._open.add(consumer)
+
+    def expect(self, consumer: str, key: str) -> None:
+        with self._lock:
+            self._plans.setdefault(consumer, set()).add(key)
+
+    def finish(self, consumer: str) -> None:
+        """Slices da stream todos gerados: resultados fora das chaves dela são liberados se ninguém mais espera."""
+        released: List[_Entry] = []
+        with self._lock:
+            self._open.discard(consumer)
+            keys = self._plans.setdefault(consumer, set())
+            for key, entry in list(self._entries.items()):
+                if key in keys or consumer not in entry.pending:
+                    continue
+                entry.pending.discard(consumer)
+                if not entry.pending:
+                    del self._entries[key]
+                    released.append(entry)
+        if released:
+            log.debug(f" pedidos compartilhados: {consumer} não usa {len(released)} resultado(s), liberando")
+        for entry in released:
+            self._release(entry)
+
+    def _expected(self, key: str, group: Hashable) -> Set[str]:
+        """Streams do grupo que ainda podem pedir a chave (sem plano ou com a geração em curso = talvez)."""
+        return {c for c in self._members.get(group, ())
+                if c not in self._plans or c in self._open or key in self._plans[c]}
+
+    def share(self, key: str, group: Hashable, consumer: str, start: Callable[[], Future],
+              release: Callable[[Any], None], park: Callable[[Any], None]) -> Tuple[Future, bool]:
+        """(future, reaproveitado): reaproveitado=True quando o pedido já foi feito por outra stream."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not _failed(entry.future):
+                entry.pending.add(consumer)
+                return entry.future, True
+            out: Future = Future()
+            self._entries[key] = _Entry(out, self._expected(key, group) | {consumer}, release, park)
+        try:
+            started = start()
+        except BaseException as e:
+            out.set_exception(e)
+        else:
+            started.add_done_callback(lambda f: self._settle(out, f, release))
+        return out, False
+
+    @staticmethod
+    def _settle(out: Future, future: Future, release: Callable[[Any], None]) -> None:
+        if out.done():
+            # pedido cancelado (fim do pipeline) antes do resultado chegar: ninguém vai consumir
+            if not _failed(future):
+                release(future.result())
+            return
+        if future.cancelled():
+            out.cancel()
+        elif future.exception() is not None:
+            out.set_exception(future.exception())
+        else:
+            out.set_result(future.result())
+
+    def done(self, key: str, consumer: str) -> bool:
+        """Consumo de uma stream; True se o registro cuida dos payloads (False: chave desconhecida)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            entry.pending.discard(consumer)
+            last = not entry.pending
+            if last:
+                del self._entries[key]
+        if last:
+            self._release(entry)
+        elif entry.future.done() and not _failed(entry.future):
+            entry.park(entry.future.result())
+        return True
+
+    @staticmethod
+    def _release(entry: _Entry) -> None:
+        if entry.future.done() and not _failed(entry.future):
+            entry.release(entry.future.result())
+
+    def close(self) -> None:
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), {}
+        if entries:
+            log.debug(f" pedidos compartilhados: liberando {len(entries)} resultado(s) não consumidos")
+        for entry in entries:
+            if not entry.future.done():
+                entry.future.add_done_callback(lambda f, entry=entry: self._release(entry))
+            else:
+                self._release(entry)
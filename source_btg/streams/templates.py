@@ -0,0 +1,158 @@
+import itertools
+import math
+import re
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+import logging
+
+log = logging.getLogger("airbyte")
+
+# {{nome}}: mesmo formato aceito pelo ENDPOINT_CONFIGS desde sempre (sem espaços)
+PLACEHOLDER = re.compile(r"\{\{(\w+)\}\}")
+# variáveis que vêm do slice (datas/janelas); as demais vêm dos parâmetros do endpoint
+SLICE_VARIABLES = frozenset({"date", "date_str", "date_iso", "end_date_str", "end_date_iso"})
+DATE_VARIABLES = frozenset({"date", "date_str", "date_iso"})
+
+
+class TemplateError(ValueError):
+    """Template de rota com placeholder desconhecido ou sem valor."""
+
+
+# renderer compilado de um nó do template: contexto do slice -> valor
+Render = Callable[[Mapping], Any]
+
+
+class _Compiler:
+    """
+    Compila o template em renderers aninhados: partes literais e placeholders separadas uma vez,
+    e o render do slice só preenche os campos (sem percorrer a árvore nem procurar placeholders).
+    Campos cujo valor é só um placeholder de `omit` (ex. `"fundName": "{{fund_name}}"`) saem do template.
+    """
+
+    def __init__(self, omit: FrozenSet[str] = frozenset()):
+        self.placeholders: Set[str] = set()
+        self.omit = omit
+        self.omitted: Set[str] = set()
+
+    def _omitted(self, value: Any) -> bool:
+        match = PLACEHOLDER.fullmatch(value) if isinstance(value, str) else None
+        if match is None or match.group(1) not in self.omit:
+            return False
+        self.omitted.add(match.group(1))
+        return True
+
+    def build(self, node: Any) -> Render:
+        if isinstance(node, str):
+            return self._string(node)
+        if isinstance(node, dict):
+            items = [(k, self.build(v)) for k, v in node.items() if not self._omitted(v)]
+            return lambda c: {k: render(c) for k, render in items}
+        if isinstance(node, list):
+            renders = [self.build(v) for v in node]
+            return lambda c: [render(c) for render in renders]
+        return lambda c: node
+
+    def _string(self, text: str) -> Render:
+        parts = PLACEHOLDER.split(text)
+        if len(parts) == 1:
+            return lambda c: text
+        # partes ímpares são os nomes dos placeholders
+        fields = parts[1::2]
+        self.placeholders.update(fields)
+        if parts == ["", fields[0], ""]:
+            field = fields[0]
+            return lambda c: str(c[field])
+        pieces = [(part, bool(i % 2)) for i, part in enumerate(parts) if part]
+        return lambda c: "".join(str(c[part]) if is_field else part for part, is_field in pieces)
+
+
+def _compile(template: Any, omit: FrozenSet[str] = frozenset()) -> Tuple[Render, Set[str], Set[str]]:
+    compiler = _Compiler(omit)
+    return compiler.build(template), compiler.placeholders, compiler.omitted
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == []
+
+
+def _unique(value: Any) -> List[Any]:
+    """Valores de um parâmetro (escalar vira lista de um), sem repetidos."""
+    unique: List[Any] = []
+    for v in (value if isinstance(value, list) else [value]):
+        if v not in unique:
+            unique.append(v)
+    return unique
+
+
+class RouteTemplate:
+    """
+    `submit_body`/`submit_params` de uma rota compilados uma vez (em `streams()`):
+      - cada template vira um renderer pré-compilado que monta o corpo do slice, sem percorrer a árvore
+      - `placeholders`: variáveis usadas; `uses_date` diz se a rota é fatiada por data
+      - `parameters`: parâmetros do endpoint que alimentam o fan-out, já ligados aos placeholders
+        (lista no plural, ex. `fund_names`, vale para `{{fund_name}}` quando o singular não foi dado;
+        parâmetros que nenhum template usa saem do fan-out, pois só repetiriam o mesmo pedido)
+      - `omit`: variáveis cujo campo sai do pedido (filtro omitido, ex. `fund_name` com `fund_demux`);
+        o parâmetro não entra no fan-out e seus valores ficam em `omitted_parameters`
+    Placeholder desconhecido ou parâmetro sem valor levantam TemplateError já na compilação.
+    """
+
+    def __init__(self, name: str, body: Any, params: Any, parameters: Optional[Mapping[str, Any]] = None,
+                 omit: Iterable[str] = ()):
+        self.name = name
+        omit = frozenset(omit)
+        self._body, body_vars, body_omitted = _compile(body if body is not None else {}, omit)
+        self._params, params_vars, params_omitted = _compile(params if params is not None else {}, omit)
+        self.placeholders = frozenset(body_vars | params_vars)
+        self.omitted = frozenset(body_omitted | params_omitted)
+        invalid = sorted((omit - self.omitted) | (omit & self.placeholders))
+        if invalid:
+            raise TemplateError(f"template {self.name}: só é possível omitir campos cujo valor é o placeholder "
+                                f"inteiro: {', '.join(invalid)}")
+        self.uses_date = bool(self.placeholders & DATE_VARIABLES)
+        bound = self._bind(dict(parameters or {}))
+        self.parameters = {k: v for k, v in bound.items() if k not in self.omitted}
+        self.omitted_parameters = {k: _unique(v) for k, v in bound.items() if k in self.omitted}
+
+    def _bind(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        variables = self.placeholders | self.omitted
+        bound: Dict[str, Any] = {}
+        for key, value in parameters.items():
+            target = key
+            if key not in variables and key.endswith("s") and key[:-1] in variables:
+                target = key[:-1]
+                if target in parameters:
+                    log.debug(f"template {self.name}: '{key}' ignorado, '{target}' foi informado")
+                    continue
+            if target not in variables:
+                log.warning(f"template {self.name}: parâmetro '{key}' não é usado no template, ignorado")
+                continue
+            bound[target] = value
+
+        unknown = sorted(variables - SLICE_VARIABLES - set(bound))
+        if unknown:
+            raise TemplateError(f"template {self.name}: placeholder(s) sem parâmetro: {', '.join(unknown)}")
+        empty = sorted(k for k, v in bound.items() if _is_empty(v))
+        if empty:
+            raise TemplateError(f"template {self.name}: parâmetro(s) sem valor: {', '.join(empty)}")
+        return bound
+
+    def render(self, context: Mapping[str, Any]) -> Tuple[Any, Any]:
+        """(body, params) do slice; KeyError vira TemplateError com o placeholder que faltou."""
+        try:
+            return self._body(context), self._params(context)
+        except KeyError as e:
+            raise TemplateError(f"template {self.name}: slice sem valor para {{{{{e.args[0]}}}}}") from None
+
+    def _values(self) -> List[List[Any]]:
+        return [_unique(value) for value in self.parameters.values()]
+
+    def combinations(self) -> Iterator[Dict[str, Any]]:
+        """Produto cartesiano dos parâmetros, gerado sob demanda (vazio se a rota não tem parâmetros)."""
+        if not self.parameters:
+            return iter(())
+        keys = list(self.parameters)
+        return (dict(zip(keys, combo)) for combo in itertools.product(*self._values()))
+
+    def combination_count(self) -> int:
+        return math.prod(len(v) for v in self._values()) if self.parameters else 0
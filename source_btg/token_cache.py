@@ -0,0 +1,118 @@
+# source_btg/token_cache.py
+import base64
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+
+import logging
+
+try:  # opcional: sem cryptography o cache fica desligado (token nunca vai em texto puro para o disco)
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # pragma: no cover - depende do ambiente
+    Fernet = None
+    InvalidToken = Exception
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+log = logging.getLogger("airbyte")
+
+
+class TokenCache:
+    """
+    Cache de tokens em disco compartilhado entre processos do conector (spec/check/discover/read):
+      - um arquivo por auth_url + client_id, cifrado com chave derivada do client_secret
+      - `locked()` serializa a renovação entre processos (flock), então só um faz o round trip
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    @staticmethod
+    def available() -> bool:
+        return Fernet is not None
+
+    def _path(self, auth_url: str, client_id: str) -> str:
+        name = hashlib.sha256(f"{auth_url}\n{client_id}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.token")
+
+    @staticmethod
+    def _fernet(auth_url: str, client_secret: str):
+        key = hashlib.sha256(f"{auth_url}\n{client_secret}".encode("utf-8")).digest()
+        return Fernet(base64.urlsafe_b64encode(key))
+
+    @contextlib.contextmanager
+    def locked(self, auth_url: str, client_id: str) -> Iterator[None]:
+        """Lock exclusivo por credencial; sem fcntl vira no-op."""
+        if fcntl is None:
+            yield
+            return
+        with open(self._path(auth_url, client_id) + ".lock", "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def load(self, auth_url: str, client_id: str, client_secret: str) -> Optional[Tuple[str, float]]:
+        """(token, expires_at) gravado por qualquer processo, ou None."""
+        try:
+            with open(self._path(auth_url, client_id), "rb") as fh:
+                blob = fh.read()
+            data = json.loads(self._fernet(auth_url, client_secret).decrypt(blob))
+            return data["access_token"], float(data["expires_at"])
+        except FileNotFoundError:
+            return None
+        except (InvalidToken, OSError, ValueError, KeyError) as e:
+            log.debug(f"token cache ilegível, ignorando: {e}")
+            return None
+
+    def store(self, auth_url: str, client_id: str, client_secret: str, token: str, expires_at: float) -> None:
+        blob = self._fernet(auth_url, client_secret).encrypt(
+            json.dumps({"access_token": token, "expires_at": expires_at}).encode("utf-8")
+        )
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(blob)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self._path(auth_url, client_id))
+        except OSError as e:
+            log.warning(f"token cache: falha ao gravar: {e}")
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+
+    def clear(self, auth_url: str, client_id: str, client_secret: str, token: Optional[str] = None) -> None:
+        """Remove o token salvo (só se ainda for `token`, quando informado)."""
+        if token is not None:
+            cached = self.load(auth_url, client_id, client_secret)
+            if cached is not None and cached[0] != token:
+                return
+        with contextlib.suppress(OSError):
+            os.remove(self._path(auth_url, client_id))
+
+
+_CACHES: Dict[str, TokenCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_token_cache(directory: Optional[str]) -> Optional[TokenCache]:
+    """Instância por diretório; None se desligado ou sem `cryptography` instalado."""
+    if not directory:
+        return None
+    if not TokenCache.available():
+        log.warning("token_cache_dir configurado mas 'cryptography' não está instalado; cache de token desligado")
+        return None
+    directory = os.path.abspath(directory)
+    with _CACHES_LOCK:
+        cache = _CACHES.get(directory)
+        if cache is None:
+            cache = _CACHES[directory] = TokenCache(directory)
+        return cache
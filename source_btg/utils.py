@@ -26,19 +26,3 @@ def dot_get(obj: Any, path: str, default=None):
             return default
         cur = cur[part]
     return cur
-
-
-
-def expand_templates(data: Any, ctx: dict):
-    """Expande placeholders {chave} recursivamente em dict/list/str."""
-
-    if isinstance(data, dict):
-        return {k: expand_templates(v, ctx) for k, v in data.items()}
-    if isinstance(data, list):
-        return [expand_templates(v, ctx) for v in data]
-    if isinstance(data, str):
-        try:
-            return data.format(**ctx)
-        except Exception:
-            return data
-    return data
\ No newline at end of file
@@ -0,0 +1,179 @@
+import json
+import logging
+import threading
+import types
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from airbyte_cdk.models import (
+    AirbyteMessage,
+    AirbyteStateMessageSerializer,
+    ConfiguredAirbyteCatalog,
+    ConfiguredAirbyteStream,
+    DestinationSyncMode,
+    SyncMode,
+    Type,
+)
+
+from source_btg import SourceBtg
+from source_btg.streams import base_async, poller
+
+XML = b"""<?xml version="1.0" encoding="utf-8"?>
+<Report><Positions>
+<Position><Asset>PETR4</Asset><Qty>10</Qty></Position>
+<Position><Asset>VALE3</Asset><Qty>20</Qty></Position>
+</Positions></Report>"""
+
+# (status, corpo, content-type) ou (status, corpo, content-type, headers)
+Response = Tuple
+
+
+class FakeBTG:
+    """
+    API do BTG em memória: token, submit (um ticket por POST) e polling.
+      - `results[path]`: função (ticket) -> Response do GET /reports/Ticket pronto; padrão: XML
+      - `submit_errors[path]`: função (corpo) -> status HTTP de erro do submit, ou None
+      - `polls_pending`: quantos polls cada ticket responde "Processando" antes de ficar pronto
+      - `files[nome]`: corpo de GET /files/<nome>, ou função () -> Response; padrão: XML
+    `requests` guarda (método, path, corpo/query) de tudo que chegou, exceto o token.
+    """
+
+    def __init__(self):
+        self.results: Dict[str, Callable[[dict], Response]] = {}
+        self.submit_errors: Dict[str, Callable[[dict], Optional[int]]] = {}
+        self.files: Dict[str, Union[bytes, Callable[[], Response]]] = {}
+        self.polls_pending = 0
+        self.tickets: Dict[str, dict] = {}
+        self.requests: List[Tuple[str, str, str]] = []
+        self.lock = threading.Lock()
+        self.url = ""
+
+    def submits(self, path: Optional[str] = None) -> List[dict]:
+        """Corpos dos submits (POST) recebidos, na ordem."""
+        return [json.loads(body or "{}") for method, p, body in self.requests
+                if method == "POST" and (path is None or p == path)]
+
+    def polls(self) -> int:
+        return sum(1 for method, p, _ in self.requests if method == "GET" and p == "/reports/Ticket")
+
+
+def _handler(api: FakeBTG):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: Any, ctype: str = "application/json", headers: Optional[dict] = None):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            path = urlparse(self.path).path
+            if path == "/connect/token":
+                return self._send(200, {"access_token": uuid.uuid4().hex, "expires_in": 3600})
+            body = json.loads(raw or b"{}")
+            with api.lock:
+                api.requests.append(("POST", path, raw.decode()))
+            error = api.submit_errors.get(path, lambda _: None)(body)
+            if error:
+                return self._send(error, {"error": f"HTTP {error}"})
+            ticket = uuid.uuid4().hex
+            with api.lock:
+                api.tickets[ticket] = {"path": path, "body": body, "polls": 0}
+            return self._send(200, {"ticketId": ticket})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            with api.lock:
+                api.requests.append(("GET", url.path, url.query))
+            if url.path == "/reports/Ticket":
+                ticket = api.tickets.get(parse_qs(url.query)["ticketId"][0])
+                if ticket is None:
+                    return self._send(404, {"error": "ticket desconhecido"})
+                ticket["polls"] += 1
+                if ticket["polls"] <= api.polls_pending:
+                    return self._send(200, {"result": "Processando"})
+                result = api.results.get(ticket["path"])
+                return self._send(*(result(ticket) if result else (200, XML, "application/xml")))
+            if url.path.startswith("/files/"):
+                body = api.files.get(url.path.rsplit("/", 1)[-1], XML)
+                return self._send(*(body() if callable(body) else (200, body, "application/octet-stream")))
+            return self._send(404, {})
+
+    return Handler
+
+
+@pytest.fixture
+def btg_api():
+    api = FakeBTG()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(api))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield api
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fast_polls(monkeypatch):
+    """Backoff do polling em centésimos de segundo, sem jitter (poller e engine asyncio)."""
+    for module in (poller, base_async):
+        monkeypatch.setattr(module, "INITIAL_DELAY", 0.05)
+        monkeypatch.setattr(module, "random", types.SimpleNamespace(random=lambda: 0.0))
+
+
+@pytest.fixture
+def make_config(btg_api):
+    def make(**options) -> dict:
+        config = {
+            "base_url": btg_api.url,
+            "auth": {"client_id": "client", "client_secret": "secret"},
+            "categories": {"CAT1": {"enabled": True}},
+            "enable_cadastro_fundos": False,
+            "enable_fluxo_caixa": True,
+            "start_date": "2024-01-01",
+            "end_date": "2024-01-03",
+        }
+        config.update(options)
+        return config
+
+    return make
+
+
+def read_messages(config: dict, state: Optional[list] = None, streams: Optional[List[str]] = None,
+                  sync_mode: SyncMode = SyncMode.incremental) -> Iterator[AirbyteMessage]:
+    """`SourceBtg.read` como o CDK faz num sync (gerador: fechar no meio simula a queda do processo)."""
+    source = SourceBtg()
+    catalog = ConfiguredAirbyteCatalog(streams=[
+        ConfiguredAirbyteStream(stream=s.as_airbyte_stream(), sync_mode=sync_mode,
+                                destination_sync_mode=DestinationSyncMode.append)
+        for s in source.streams(json.loads(json.dumps(config))) if streams is None or s.name in streams
+    ])
+    return source.read(logging.getLogger("airbyte"), config, catalog, state)
+
+
+def read(config: dict, state: Optional[list] = None, streams: Optional[List[str]] = None,
+         sync_mode: SyncMode = SyncMode.incremental) -> Tuple[List[dict], List[dict]]:
+    """Sync completo: (dados dos RECORDs, states por stream em dict)."""
+    messages = list(read_messages(config, state, streams, sync_mode))
+    records = [m.record.data for m in messages if m.type == Type.RECORD]
+    states = [AirbyteStateMessageSerializer.dump(m.state) for m in messages if m.type == Type.STATE]
+    return records, states
+
+
+def last_state(states: List[dict]) -> list:
+    """State final de cada stream, no formato que o próximo sync recebe."""
+    latest = {s["stream"]["stream_descriptor"]["name"]: s for s in states}
+    return [AirbyteStateMessageSerializer.load(s) for s in latest.values()]
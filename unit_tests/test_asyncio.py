@@ -0,0 +1,57 @@
+import pytest
+
+from source_btg.streams import retry
+from conftest import XML, read
+
+pytest.importorskip("httpx")
+
+def _config(make_config, **options):
+    endpoints = {"renda_fixa": {"record_path": "Report.Positions.Position"}}
+    return make_config(**{"endpoints": endpoints, "engine": "asyncio", **options})
+
+
+def _rows(records):
+    return sorted((r["_dt_referencia"], r["Asset"]["text"]) for r in records)
+
+
+def test_asyncio_engine_emits_the_same_records(btg_api, make_config):
+    threaded, _ = read(_config(make_config, engine="threads"))
+    btg_api.requests.clear()
+
+    records, _ = read(_config(make_config, max_concurrent_tickets=3))
+
+    assert len(btg_api.submits("/reports/FixedIncome")) == 3
+    assert records and not any("error" in r for r in records)
+    assert _rows(records) == _rows(threaded)
+
+
+def test_asyncio_engine_polls_until_ready(btg_api, make_config, fast_polls):
+    btg_api.polls_pending = 2
+
+    records, _ = read(_config(make_config, end_date="2024-01-01"))
+
+    assert btg_api.polls() == 3
+    assert records and not any("error" in r for r in records)
+
+
+def test_asyncio_engine_repeats_after_401(btg_api, make_config):
+    failed = []
+    btg_api.submit_errors["/reports/FixedIncome"] = lambda body: None if failed else failed.append(body) or 401
+
+    records, _ = read(_config(make_config, end_date="2024-01-01"))
+
+    assert len(btg_api.submits("/reports/FixedIncome")) == 2
+    assert records and not any("error" in r for r in records)
+
+
+def test_asyncio_engine_retries_the_download(btg_api, make_config, monkeypatch):
+    monkeypatch.setattr(retry, "backoff", lambda attempt: 0)
+    btg_api.results["/reports/FixedIncome"] = lambda ticket: (200, {"files": ["/files/r.xml"]}, "application/json")
+    served = []
+    btg_api.files["r.xml"] = lambda: served.append(1) or (
+        (503, {"error": "HTTP 503"}, "application/json") if len(served) == 1 else (200, XML, "application/xml"))
+
+    records, _ = read(_config(make_config, end_date="2024-01-01", max_retries=2))
+
+    assert len(served) == 2 and len(btg_api.submits()) == 1
+    assert records and not any("error" in r for r in records)
@@ -0,0 +1,99 @@
+import threading
+import time
+
+from source_btg.auth import BTGTokenProvider
+from conftest import read
+
+
+def _provider(tokens, started=None, proceed=None):
+    """Provider sem rede: cada renovação devolve o próximo token de `tokens`."""
+    provider = BTGTokenProvider({"client_id": "client", "client_secret": "secret",
+                                 "auth_url": "http://127.0.0.1:1/connect/token"}, "CAT1")
+    fetched = []
+
+    def fetch():
+        if started is not None:
+            started.set()
+        if proceed is not None:
+            proceed.wait(5)
+        fetched.append(tokens[len(fetched)])
+        return fetched[-1], time.time() + 3600 + len(fetched)
+
+    provider._fetch_token = fetch
+    return provider, fetched
+
+
+def test_concurrent_get_refreshes_once():
+    proceed = threading.Event()
+    provider, fetched = _provider(["t1", "t2"], proceed=proceed)
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(provider.get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    proceed.set()
+    for t in threads:
+        t.join()
+
+    assert fetched == ["t1"] and got == ["t1"] * 8
+    provider.invalidate()
+
+
+def test_invalidate_only_drops_the_token_that_failed():
+    provider, fetched = _provider(["t1", "t2"])
+    assert provider.get() == "t1"
+
+    # 401 de uma request feita com um token que outra thread já trocou: nada a fazer
+    provider.invalidate("t0")
+    assert provider.get() == "t1" and fetched == ["t1"]
+
+    provider.invalidate("t1")
+    assert provider.get() == "t2"
+    provider.invalidate()
+
+
+def test_background_renewal_fetches_outside_the_lock():
+    provider, _ = _provider(["t1"])
+    assert provider.get() == "t1"
+    started, proceed = threading.Event(), threading.Event()
+    provider._fetch_token = _provider(["t2"], started, proceed)[0]._fetch_token
+
+    renewal = threading.Thread(target=provider._renew_in_background)
+    renewal.start()
+    assert started.wait(5)
+    # renovação em curso: o lock está livre e o get segue com o token atual
+    assert provider._lock.acquire(timeout=1)
+    provider._lock.release()
+    assert provider.get() == "t1"
+
+    proceed.set()
+    renewal.join(5)
+    assert provider.get() == "t2"
+    provider.invalidate()
+
+
+def test_background_renewal_keeps_a_newer_token():
+    provider, _ = _provider(["t1"])
+    assert provider.get() == "t1"
+    provider._fetch_token = lambda: ("velho", time.time() + 60)
+
+    provider._renew_in_background()
+
+    assert provider.get() == "t1"
+    provider.invalidate()
+
+
+def test_401_invalidates_the_token_and_repeats_once(btg_api, make_config):
+    failed = []
+
+    def unauthorized_once(body):
+        if not failed:
+            failed.append(body)
+            return 401
+        return None
+
+    btg_api.submit_errors["/reports/Cash/Cashflow"] = unauthorized_once
+
+    records, _ = read(make_config(end_date="2024-01-01"))
+
+    assert len(btg_api.submits()) == 2
+    assert records and not any("error" in r for r in records)
@@ -0,0 +1,26 @@
+import os
+
+from airbyte_cdk.models import SyncMode
+
+from source_btg import SourceBtg
+from conftest import read
+
+
+def _manifests(directory):
+    return [os.path.join(root, name) for root, _, files in os.walk(directory)
+            for name in files if name == "manifest.json"]
+
+
+def test_plan_does_not_touch_cache_entries(btg_api, make_config, tmp_path):
+    config = make_config(cache_dir=str(tmp_path), enable_fluxo_caixa=False, enable_renda_fixa=True)
+    read(config)
+    manifests = _manifests(tmp_path)
+    assert len(manifests) == 3
+    for path in manifests:
+        os.utime(path, (1_000_000, 1_000_000))
+
+    stream = next(s for s in SourceBtg().streams(config) if s.name == "CAT1_renda_fixa")
+    plan = stream.plan(SyncMode.full_refresh)
+
+    assert plan["cached"] == 3 and plan["tickets"] == 0
+    assert [os.path.getmtime(p) for p in manifests] == [1_000_000] * 3
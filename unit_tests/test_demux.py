@@ -0,0 +1,66 @@
+from source_btg import SourceBtg
+from source_btg.plan import plan_sync
+from conftest import read
+
+PORTFOLIO = b"""<Report><Positions>
+<Position><FundName>FUNDO A</FundName><Asset>PETR4</Asset></Position>
+<Position><FundName>FUNDO B</FundName><Asset>VALE3</Asset></Position>
+<Position><FundName>FUNDO C</FundName><Asset>ITUB4</Asset></Position>
+</Positions></Report>"""
+
+
+def _config(make_config, **endpoint):
+    carteira = {"params": {"report_type": 3, "fund_name": ["Fundo A", "FUNDO B"]}, "fund_demux": True,
+                "record_path": "Report.Positions.Position", **endpoint}
+    return make_config(end_date="2024-01-01", endpoints={"carteira": carteira})
+
+
+def test_one_ticket_split_into_the_requested_funds(btg_api, make_config):
+    btg_api.results["/reports/Portfolio"] = lambda ticket: (200, PORTFOLIO, "application/xml")
+
+    records, _ = read(_config(make_config))
+
+    submits = btg_api.submits("/reports/Portfolio")
+    assert len(submits) == 1 and "fundName" not in submits[0]["contract"]
+    assert [(r["_fund_name"], r["Asset"]["text"]) for r in records] == [("Fundo A", "PETR4"), ("FUNDO B", "VALE3")]
+
+
+def test_payload_without_the_fund_field_fails_the_slice(btg_api, make_config):
+    btg_api.results["/reports/Portfolio"] = lambda ticket: (200, PORTFOLIO.replace(b"FundName", b"Other"),
+                                                           "application/xml")
+
+    records, states = read(_config(make_config))
+
+    assert len(records) == 1 and "fund_demux" in records[0]["error"]
+    assert states[-1]["stream"]["stream_state"].get("CAT1_carteira") is None
+
+
+def test_csv_payload_is_filtered_by_column(btg_api, make_config):
+    # bloco colunar: filtro por índice, comparação sem caixa e sem espaços, linhas sem fundo descartadas
+    csv = b"fundName,Asset\n fundo a ,PETR4\nFUNDO C,ITUB4\n,BBAS3\nFUNDO B,VALE3\n"
+    btg_api.results["/reports/Portfolio"] = lambda ticket: (200, csv, "text/csv")
+
+    records, _ = read(_config(make_config, record_path=None))
+
+    assert [(r["_fund_name"], r["Asset"]) for r in records] == [("Fundo A", "PETR4"), ("FUNDO B", "VALE3")]
+    assert [r["_row_number"] for r in records] == [0, 1]
+
+
+def test_without_fund_demux_each_fund_is_its_own_ticket(btg_api, make_config):
+    btg_api.results["/reports/Portfolio"] = lambda ticket: (200, PORTFOLIO, "application/xml")
+
+    records, _ = read(_config(make_config, fund_demux=False))
+
+    assert sorted(s["contract"]["fundName"] for s in btg_api.submits("/reports/Portfolio")) == ["FUNDO B", "Fundo A"]
+    # sem demux local o payload de cada ticket é emitido inteiro, com o fundo do slice
+    assert sorted({r["_fund_name"] for r in records}) == ["FUNDO B", "Fundo A"]
+    assert len(records) == 2 * 3
+
+
+def test_plan_counts_one_ticket_for_the_demuxed_funds(btg_api, make_config):
+    merged = plan_sync(SourceBtg(), _config(make_config))
+    per_fund = plan_sync(SourceBtg(), _config(make_config, fund_demux=False))
+
+    assert (merged["total"]["slices"], merged["total"]["tickets"]) == (1, 1)
+    assert (per_fund["total"]["slices"], per_fund["total"]["tickets"]) == (2, 2)
+    assert not btg_api.submits()
@@ -0,0 +1,51 @@
+import io
+import json
+
+from airbyte_cdk.entrypoint import AirbyteEntrypoint
+from airbyte_cdk.models import AirbyteMessage, AirbyteRecordMessage, Type
+
+from source_btg.emit import RecordWriter
+from conftest import read
+
+
+def _message(data: dict, stream: str = "CAT1_fluxo_caixa", namespace=None) -> AirbyteMessage:
+    return AirbyteMessage(type=Type.RECORD, record=AirbyteRecordMessage(
+        stream=stream, data=data, emitted_at=1704204000000, namespace=namespace))
+
+
+def _fast(messages) -> bytes:
+    out = io.BytesIO()
+    writer = RecordWriter(write=out.write, block_bytes=256)
+    for message in messages:
+        writer.record(message)
+    writer.flush()
+    return out.getvalue()
+
+
+def _cdk(messages) -> bytes:
+    return b"".join(AirbyteEntrypoint.airbyte_message_to_string(m).encode() + b"\n" for m in messages)
+
+
+def test_fast_emit_matches_cdk_output_for_synced_records(make_config):
+    records, _ = read(make_config())
+    assert records and any(r.get("_file_info", "absent") is None or "_category" in r for r in records)
+
+    messages = [_message(dict(r)) for r in records]
+    assert _fast(messages) == _cdk(messages)
+
+
+def test_fast_emit_drops_top_level_nulls_like_cdk():
+    messages = [_message({"a": None, "b": {"c": None, "d": [None, 1]}, "_dt_referencia": None, "e": "é"}),
+                _message({"x": 1}, namespace="ns")]
+
+    assert _fast(messages) == _cdk(messages)
+    assert b'"_dt_referencia"' not in _fast(messages)
+
+
+def test_fast_emit_falls_back_to_cdk_keeping_every_key():
+    data = {"big": 2 ** 70, "_route": "CAT1_fluxo_caixa", "_category": "CAT1"}
+
+    line = _fast([_message(dict(data))])
+
+    assert line == _cdk([_message(dict(data))])
+    assert json.loads(line)["record"]["data"] == data
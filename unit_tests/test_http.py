@@ -0,0 +1,24 @@
+from source_btg.http import get_session
+
+
+def test_growing_the_pool_closes_the_replaced_adapter(btg_api):
+    session = get_session(btg_api.url, 2)
+    session.get(btg_api.url + "/files/a.xml").close()
+    old = session.get_adapter(btg_api.url + "/files")
+    assert len(old.poolmanager.pools) == 1
+
+    assert get_session(btg_api.url, 4) is session
+    new = session.get_adapter(btg_api.url + "/files")
+
+    assert new is not old
+    assert len(old.poolmanager.pools) == 0
+    assert session.get(btg_api.url + "/files/a.xml").status_code == 200
+
+
+def test_same_or_smaller_pool_keeps_the_adapter(btg_api):
+    session = get_session(btg_api.url, 3)
+    adapter = session.get_adapter(btg_api.url + "/files")
+
+    get_session(btg_api.url, 2)
+
+    assert session.get_adapter(btg_api.url + "/files") is adapter
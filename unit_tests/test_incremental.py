@@ -0,0 +1,98 @@
+from conftest import XML, last_state, read
+
+STREAM = "CAT1_renda_fixa"
+
+
+def _daily(make_config, **options):
+    return make_config(enable_fluxo_caixa=False, enable_renda_fixa=True, **options)
+
+
+def _dates(btg_api):
+    return [body["contract"]["date"] for body in btg_api.submits("/reports/FixedIncome")]
+
+
+def _failing(date):
+    return lambda body: 400 if body["contract"]["date"] == date else None
+
+
+def test_failed_slice_does_not_advance_cursor(btg_api, make_config):
+    btg_api.submit_errors["/reports/FixedIncome"] = _failing("2024-01-02")
+
+    records, states = read(_daily(make_config))
+
+    assert any("error" in r and r["_dt_referencia"] == "02/01/2024" for r in records)
+    assert any("error" not in r and r["_dt_referencia"] == "03/01/2024" for r in records)
+    assert states[-1]["stream"]["stream_state"][STREAM] == "01/01/2024"
+
+
+def test_next_sync_retries_failed_slice(btg_api, make_config):
+    btg_api.submit_errors["/reports/FixedIncome"] = _failing("2024-01-02")
+    _, states = read(_daily(make_config))
+    btg_api.submit_errors.clear()
+    btg_api.requests.clear()
+
+    records, states = read(_daily(make_config), state=last_state(states))
+
+    assert "2024-01-02" in _dates(btg_api)
+    assert not any("error" in r for r in records)
+    assert states[-1]["stream"]["stream_state"][STREAM] == "03/01/2024"
+
+
+def test_failed_slice_in_pipeline_mode(btg_api, make_config):
+    btg_api.submit_errors["/reports/FixedIncome"] = _failing("2024-01-02")
+
+    _, states = read(_daily(make_config, max_concurrent_tickets=3))
+
+    assert states[-1]["stream"]["stream_state"][STREAM] == "01/01/2024"
+
+
+def _windows(btg_api):
+    return [(b["contract"]["startDate"], b["contract"]["endDate"]) for b in btg_api.submits("/reports/Cash/Cashflow")]
+
+
+def test_resumed_windows_stay_on_the_start_date_grid(btg_api, make_config, tmp_path):
+    config = make_config(end_date="2024-01-10", date_window_days=4, cache_dir=str(tmp_path))
+    _, states = read(config)
+    assert _windows(btg_api) == [("2024-01-01", "2024-01-04"), ("2024-01-05", "2024-01-08"),
+                                 ("2024-01-09", "2024-01-10")]
+    btg_api.requests.clear()
+
+    states[-1]["stream"]["stream_state"]["CAT1_fluxo_caixa"] = "06/01/2024"
+    records, _ = read(config, state=last_state(states))
+
+    # recua para a janela 05..08 da grade: mesmos corpos, servidos pelo cache
+    assert _windows(btg_api) == []
+    assert sorted({r["_dt_referencia"] for r in records}) == ["08/01/2024", "10/01/2024"]
+
+
+def _days(ticket):
+    contract = ticket["body"]["contract"]
+    return int(contract["endDate"][-2:]) - int(contract["startDate"][-2:]) + 1
+
+
+def test_window_that_times_out_is_split_in_half(btg_api, make_config, fast_polls):
+    # janelas de mais de 2 dias nunca ficam prontas
+    btg_api.results["/reports/Cash/Cashflow"] = lambda ticket: (
+        (200, {"result": "Processando"}, "application/json") if _days(ticket) > 2 else (200, XML, "application/xml"))
+
+    records, _ = read(make_config(end_date="2024-01-04", date_window_days=4, polling_max_wait_seconds=1))
+
+    assert _windows(btg_api) == [("2024-01-01", "2024-01-04"), ("2024-01-01", "2024-01-02"),
+                                 ("2024-01-03", "2024-01-04")]
+    assert records and not any("error" in r for r in records)
+
+
+def test_window_size_follows_the_payload_size(btg_api, make_config):
+    big = XML + b"<!--" + b"x" * 1500 + b"-->"
+    btg_api.results["/reports/Cash/Cashflow"] = lambda ticket: (
+        200, big if ticket["body"]["contract"]["startDate"] in ("2024-01-01", "2024-01-05") else XML,
+        "application/xml")
+
+    records, _ = read(make_config(end_date="2024-01-16", date_window_days=4, window_max_bytes=1000))
+
+    # as 2 primeiras janelas são geradas antes de qualquer resultado (o CDK olha 2 slices à frente);
+    # grandes demais: metade (09..10); pequeno: volta a 4 dias, sem sair da célula 09..12
+    assert _windows(btg_api) == [("2024-01-01", "2024-01-04"), ("2024-01-05", "2024-01-08"),
+                                 ("2024-01-09", "2024-01-10"), ("2024-01-11", "2024-01-12"),
+                                 ("2024-01-13", "2024-01-16")]
+    assert records and not any("error" in r for r in records)
@@ -0,0 +1,119 @@
+import io
+
+import pytest
+
+from source_btg.parsers import RowBlock, csv_parser, iter_csv_records, iter_xml_records
+from source_btg.parsers.csv_parser import SNIFF_BYTES
+from conftest import XML, read
+
+CASHFLOW = b"""<?xml version="1.0" encoding="utf-8"?>
+<Report><Header><Fund>FUNDO A</Fund></Header><Cashflows>
+<Cashflow><Date>2024-01-01</Date><Value>1.5</Value></Cashflow>
+<Cashflow><Date>2024-01-02</Date><Value>2.5</Value></Cashflow>
+<Cashflow><Date>2024-01-03</Date><Value>3.5</Value></Cashflow>
+</Cashflows></Report>"""
+
+
+def test_record_path_candidates_with_wildcards():
+    records = list(iter_xml_records(io.BytesIO(XML), ["*.Missing.Row", "*.*.Position"]))
+
+    assert [r["Asset"]["text"] for r in records] == ["PETR4", "VALE3"]
+
+
+def _cashflow(make_config, record_path):
+    return make_config(end_date="2024-01-01", endpoints={"fluxo_caixa": {"record_path": record_path}})
+
+
+def test_records_keep_the_ancestor_header_fields():
+    xml = b"""<Report date="2024-01-01"><FundName>FUNDO A</FundName><Header><Cnpj>1</Cnpj></Header>
+    <Positions><Position><Asset>PETR4</Asset></Position><Position><Asset>VALE3</Asset></Position></Positions>
+    </Report>"""
+
+    records = list(iter_xml_records(io.BytesIO(xml), "Report.Positions.Position"))
+
+    assert [r["Asset"]["text"] for r in records] == ["PETR4", "VALE3"]
+    assert all(r["FundName"] == {"text": "FUNDO A"} and r["Header"] == {"Cnpj": {"text": "1"}}
+               and r["date"] == "2024-01-01" for r in records)
+
+
+def test_endpoint_record_path_emits_one_row_per_element(btg_api, make_config):
+    btg_api.results["/reports/Cash/Cashflow"] = lambda ticket: (200, CASHFLOW, "application/xml")
+
+    records, _ = read(_cashflow(make_config, ["*.*.Cashflow"]))
+
+    assert [r["Value"]["text"] for r in records] == ["1.5", "2.5", "3.5"]
+    assert [r["_dt_referencia"] for r in records] == ["01/01/2024", "02/01/2024", "03/01/2024"]
+    assert all(r["Header"] == {"Fund": {"text": "FUNDO A"}} for r in records)
+
+
+def test_endpoints_parse_the_whole_document_by_default(btg_api, make_config):
+    btg_api.results["/reports/Cash/Cashflow"] = lambda ticket: (200, CASHFLOW, "application/xml")
+
+    records, _ = read(make_config(end_date="2024-01-01"))
+
+    assert len(records) == 1
+    assert records[0]["Header"]["Fund"]["text"] == "FUNDO A"
+
+
+def test_unmatched_record_path_keeps_whole_document(btg_api, make_config):
+    records, _ = read(_cashflow(make_config, ["*.*.Cashflow"]))
+
+    assert len(records) == 1
+    assert [p["Asset"]["text"] for p in records[0]["Positions"]["Position"]] == ["PETR4", "VALE3"]
+
+
+def test_row_block_rows_do_not_mutate_the_parsed_records():
+    parsed = [{"Fund": "A"}, {"Fund": "B"}]
+    block = RowBlock(records=parsed).with_constants(_ticket_id="T1").numbered(0)
+
+    rows = list(block.rows())
+
+    assert rows == [{"Fund": "A", "_ticket_id": "T1", "_row_number": 0},
+                    {"Fund": "B", "_ticket_id": "T1", "_row_number": 1}]
+    assert parsed == [{"Fund": "A"}, {"Fund": "B"}]
+    assert all(row is not rec for row, rec in zip(rows, parsed))
+
+
+@pytest.fixture(params=["pyarrow", "pandas", "stdlib"])
+def csv_engine(request, monkeypatch):
+    """Mesmos testes em cada engine de CSV (desligando os preferidos)."""
+    if request.param == "pyarrow" and csv_parser.pa is None:
+        pytest.skip("pyarrow não instalado")
+    if request.param == "pandas":
+        if csv_parser.pd is None:
+            pytest.skip("pandas não instalado")
+        monkeypatch.setattr(csv_parser, "pa", None)
+    if request.param == "stdlib":
+        monkeypatch.setattr(csv_parser, "pa", None)
+        monkeypatch.setattr(csv_parser, "pd", None)
+    return request.param
+
+
+def test_csv_latin1_with_semicolon_is_detected(csv_engine):
+    data = "Fundo;Valor\nAção;1,5\nPrevidência;2,5\n".encode("latin-1")
+
+    rows = list(iter_csv_records(io.BytesIO(data)))
+
+    assert rows == [{"Fundo": "Ação", "Valor": "1,5"}, {"Fundo": "Previdência", "Valor": "2,5"}]
+
+
+def test_csv_falls_back_to_latin1_after_the_sample(csv_engine):
+    # amostra toda em ASCII (parece utf-8); o primeiro byte latin-1 só aparece depois dela
+    lines = [f"FUNDO {i:06d};{i}" for i in range(SNIFF_BYTES // 10)]
+    data = ("Fundo;Valor\n" + "\n".join(lines) + "\nAção;-1\n").encode("latin-1")
+
+    rows = list(iter_csv_records(io.BytesIO(data), chunk_rows=1000))
+
+    assert len(rows) == len(lines) + 1
+    assert rows[0] == {"Fundo": "FUNDO 000000", "Valor": "0"}
+    assert rows[-1] == {"Fundo": "Ação", "Valor": "-1"}
+    assert len({r["Fundo"] for r in rows}) == len(rows)
+
+
+def test_csv_payload_from_the_api(btg_api, make_config, csv_engine):
+    data = "Data;Fundo;Valor\n01/01/2024;Ação;1,5\n".encode("latin-1")
+    btg_api.results["/reports/Cash/Cashflow"] = lambda ticket: (200, data, "text/csv")
+
+    records, _ = read(make_config(end_date="2024-01-01"))
+
+    assert [(r["Fundo"], r["Valor"]) for r in records] == [("Ação", "1,5")]
@@ -0,0 +1,58 @@
+from airbyte_cdk.models import SyncMode
+
+from source_btg import SourceBtg
+from conftest import read
+
+
+def _stream(config, name):
+    return next(s for s in SourceBtg().streams(config) if s.name == name)
+
+
+def test_single_slice_stream_submits_once(btg_api, make_config):
+    config = make_config(enable_fluxo_caixa=False, enable_cadastro_fundos=True, max_concurrent_tickets=4)
+
+    records, _ = read(config)
+
+    assert len(btg_api.submits("/reports/Fund")) == 1
+    assert records and not any("error" in r for r in records)
+
+
+def test_pipeline_submits_each_slice_once(btg_api, make_config):
+    config = make_config(enable_fluxo_caixa=False, enable_renda_fixa=True, max_concurrent_tickets=2,
+                         end_date="2024-01-05")
+
+    records, _ = read(config)
+
+    dates = [body["contract"]["date"] for body in btg_api.submits("/reports/FixedIncome")]
+    assert sorted(dates) == ["2024-01-0%d" % d for d in range(1, 6)]
+    assert not any("error" in r for r in records)
+
+
+def test_slices_drained_before_read_keep_their_tickets(btg_api, make_config):
+    config = make_config(enable_fluxo_caixa=False, enable_renda_fixa=True, max_concurrent_tickets=3)
+    stream = _stream(config, "CAT1_renda_fixa")
+
+    # o CDK pode esgotar o gerador de slices antes de ler (itertools.tee)
+    slices = list(stream.stream_slices(sync_mode=SyncMode.full_refresh))
+    records = [r for s in slices for r in stream.read_records(sync_mode=SyncMode.full_refresh, stream_slice=s)]
+
+    assert len(btg_api.submits("/reports/FixedIncome")) == len(slices) == 3
+    assert records and not any("error" in r for r in records)
+
+
+def test_submission_is_driven_by_read_records(btg_api, make_config):
+    config = make_config(enable_fluxo_caixa=False, enable_renda_fixa=True, max_concurrent_tickets=2,
+                         end_date="2024-01-05")
+    stream = _stream(config, "CAT1_renda_fixa")
+
+    # esgotar os slices não submete nada: o pipeline só anda quando o read_records lê
+    slices = list(stream.stream_slices(sync_mode=SyncMode.full_refresh))
+    assert len(slices) == 5 and not btg_api.submits("/reports/FixedIncome")
+
+    first = list(stream.read_records(sync_mode=SyncMode.full_refresh, stream_slice=slices[0]))
+    # o slice lido + até 2 à frente
+    assert first and len(btg_api.submits("/reports/FixedIncome")) <= 3
+
+    for s in slices[1:]:
+        list(stream.read_records(sync_mode=SyncMode.full_refresh, stream_slice=s))
+    assert len(btg_api.submits("/reports/FixedIncome")) == 5
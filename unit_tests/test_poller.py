@@ -0,0 +1,42 @@
+import time
+from concurrent.futures import Future
+
+from source_btg.streams.poller import Defer, TicketPoller
+from conftest import XML, read
+
+
+def test_poller_keeps_polling_while_a_body_is_read_elsewhere():
+    poller = TicketPoller()
+    body: Future = Future()
+    slow = poller.watch("slow", lambda: body, max_wait=30)
+    fast = poller.watch("fast", lambda: {"__mode__": "json"}, max_wait=30)
+
+    assert fast.result(timeout=2) == {"__mode__": "json"}
+    assert not slow.done()
+    body.set_result({"__mode__": "inline"})
+    assert slow.result(timeout=2) == {"__mode__": "inline"}
+
+
+def test_defer_reschedules_without_backoff():
+    poller = TicketPoller()
+    answers = iter([Defer(0.2), Defer(0.2), {"__mode__": "json"}])
+    started = time.monotonic()
+
+    assert poller.watch("t", lambda: next(answers), max_wait=30).result(timeout=5) == {"__mode__": "json"}
+    assert 0.4 <= time.monotonic() - started < 3
+
+
+def test_retry_after_on_poll_becomes_next_poll_time(btg_api, make_config):
+    def result(ticket):
+        if ticket["polls"] == 1:
+            return 429, b"{}", "application/json", {"Retry-After": "1"}
+        return 200, XML, "application/xml"
+
+    btg_api.results["/reports/Cash/Cashflow"] = result
+    started = time.monotonic()
+
+    records, _ = read(make_config())
+
+    assert records and not any("error" in r for r in records)
+    assert btg_api.polls() == 2
+    assert 1 <= time.monotonic() - started < 5
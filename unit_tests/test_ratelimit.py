@@ -0,0 +1,105 @@
+import time
+from email.utils import formatdate
+
+import pytest
+
+from source_btg import SourceBtg
+from source_btg.streams import ratelimit
+from source_btg.streams.poller import Defer
+from source_btg.streams.ratelimit import DECREASE, INCREASE, TokenBucket, get_limiter, retry_after_seconds
+from conftest import XML
+
+
+@pytest.fixture(autouse=True)
+def fresh_buckets(monkeypatch):
+    # buckets são do processo: cada teste começa sem taxa aprendida
+    monkeypatch.setattr(ratelimit, "_BUCKETS", {})
+
+
+def test_reserve_spends_the_burst_then_spaces_requests():
+    bucket = TokenBucket("t", rate=2, burst=1)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5, abs=0.05)
+
+
+def test_acquire_sleeps_the_reserved_wait(monkeypatch):
+    slept = []
+    monkeypatch.setattr(ratelimit.time, "sleep", slept.append)
+    limiter = get_limiter("CAT1", "submit", {"submit": 4, "burst": 1}, {})
+
+    limiter.acquire()
+    limiter.acquire()
+
+    assert len(slept) == 1 and slept[0] == pytest.approx(0.25, abs=0.05)
+
+
+def test_429_halves_the_configured_rate_and_success_recovers_it():
+    bucket = TokenBucket("t", rate=4)
+
+    bucket.throttled(None)
+    assert bucket.rate == 4 * DECREASE
+    bucket.succeeded()
+    assert bucket.rate == pytest.approx(4 * DECREASE + 4 * INCREASE)
+
+
+def test_429_with_retry_after_blocks_the_bucket():
+    bucket = TokenBucket("t", rate=10)
+
+    bucket.throttled(3)
+
+    assert bucket.rate == 10 * DECREASE
+    assert bucket.reserve() == pytest.approx(3, abs=0.1)
+
+
+def test_unlimited_bucket_starts_at_half_the_observed_rate(monkeypatch):
+    clock = iter([i / 10 for i in range(20)])  # uma request a cada 0.1s
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: next(clock))
+    bucket = TokenBucket("t")
+    for _ in range(10):
+        assert bucket.reserve() == 0
+
+    bucket.throttled(None)
+
+    # 10 requests em 1s (da primeira até o 429) -> metade da taxa observada
+    assert bucket.rate == pytest.approx(10 * DECREASE)
+
+
+def test_retry_after_in_seconds_or_http_date():
+    assert retry_after_seconds("7") == 7
+    assert retry_after_seconds(None) is None and retry_after_seconds("soon") is None
+    assert 0 < retry_after_seconds(formatdate(timeval=time.time() + 60, usegmt=True)) <= 60
+
+
+def test_global_bucket_is_shared_across_categories():
+    limits = {"submit": 5, "global": 8}
+    first = get_limiter("CAT1", "submit", limits, {"CAT2": {"submit": 1}})
+    second = get_limiter("CAT2", "submit", limits, {"CAT2": {"submit": 1}})
+
+    assert [b.name for b in first.buckets] == ["CAT1/submit", "*/global"]
+    assert first.buckets[1] is second.buckets[1]
+    assert (first.buckets[0].ceiling, second.buckets[0].ceiling) == (5, 1)
+
+    second.throttled(None)
+    assert first.buckets[1].rate == 8 * DECREASE and first.buckets[0].rate == 5
+
+
+def test_poll_429_defers_and_halves_the_poll_rate(btg_api, make_config):
+    btg_api.results["/reports/Fund"] = lambda ticket: (
+        (429, {"error": "slow down"}, "application/json", {"Retry-After": "2"}) if ticket["polls"] == 1
+        else (200, XML, "application/xml"))
+    config = make_config(enable_fluxo_caixa=False, enable_cadastro_fundos=True, rate_limits={"poll": 4})
+    stream = next(iter(SourceBtg().streams(config)))
+    ticket = stream._submit(stream._slice_context({}))
+    limiter = stream._limiter("poll")
+
+    deferred = stream._poll_once(ticket, limiter)
+
+    assert isinstance(deferred, Defer) and deferred.seconds == 2
+    assert limiter.buckets[0].rate == 4 * DECREASE
+
+    status = stream._poll_once(ticket, limiter)
+    if not isinstance(status, dict):
+        status = status.result(timeout=10)
+    assert status is not None
+    assert limiter.buckets[0].rate == pytest.approx(4 * DECREASE + 4 * INCREASE)
@@ -0,0 +1,41 @@
+from airbyte_cdk.models import AirbyteStateMessageSerializer, Type
+
+from conftest import read, read_messages
+
+STREAM = "CAT1_renda_fixa"
+
+
+def _config(make_config):
+    return make_config(enable_fluxo_caixa=False, enable_renda_fixa=True, max_concurrent_tickets=2)
+
+
+def _interrupted_state(config):
+    """Sincronização que cai logo depois do primeiro checkpoint (fim do primeiro slice)."""
+    messages = read_messages(config)
+    try:
+        return next(m.state for m in messages if m.type == Type.STATE)
+    finally:
+        messages.close()
+
+
+def test_checkpoint_keeps_tickets_submitted_ahead(btg_api, make_config):
+    state = _interrupted_state(_config(make_config))
+
+    pending = AirbyteStateMessageSerializer.dump(state)["stream"]["stream_state"]["pending_tickets"]
+    assert len(pending) >= 1
+    assert set(btg_api.tickets) >= {entry["ticket"] for entry in pending.values()}
+
+
+def test_interrupted_sync_resumes_pending_tickets(btg_api, make_config):
+    state = _interrupted_state(_config(make_config))
+    pending = AirbyteStateMessageSerializer.dump(state)["stream"]["stream_state"]["pending_tickets"]
+    resumed = {entry["ticket"] for entry in pending.values()}
+    submitted = len(btg_api.submits())
+
+    records, states = read(_config(make_config), state=[state])
+
+    ticket_ids = {r["_ticket_id"] for r in records}
+    assert resumed <= ticket_ids
+    # só os slices sem ticket pendente são submetidos de novo
+    assert len(btg_api.submits()) - submitted == 3 - len(resumed & ticket_ids)
+    assert "pending_tickets" not in states[-1]["stream"]["stream_state"]
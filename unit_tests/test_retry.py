@@ -0,0 +1,137 @@
+import io
+from zipfile import BadZipFile, ZipFile
+
+import pytest
+import requests
+
+from source_btg.streams import retry
+from source_btg.streams.retry import is_transient, retry_call
+from conftest import XML, read
+
+
+def _failing_polls(status, ok_after=None):
+    def result(ticket):
+        if ok_after is not None and ticket["polls"] > ok_after:
+            return 200, XML, "application/xml"
+        return status, {"error": f"HTTP {status}"}, "application/json"
+
+    return result
+
+
+def test_poll_5xx_counts_against_max_retries(btg_api, make_config, fast_polls):
+    btg_api.results["/reports/Cash/Cashflow"] = _failing_polls(503)
+
+    records, _ = read(make_config(end_date="2024-01-01", max_retries=2))
+
+    assert btg_api.polls() == 3
+    assert len(records) == 1 and "503" in records[0]["error"]
+    assert len(btg_api.submits()) == 1
+
+
+def test_poll_5xx_recovers_within_max_retries(btg_api, make_config, fast_polls):
+    btg_api.results["/reports/Cash/Cashflow"] = _failing_polls(502, ok_after=2)
+
+    records, _ = read(make_config(end_date="2024-01-01", max_retries=2))
+
+    assert records and not any("error" in r for r in records)
+    assert btg_api.polls() == 3
+
+
+def test_poll_4xx_fails_the_ticket_at_once(btg_api, make_config, fast_polls):
+    btg_api.results["/reports/Cash/Cashflow"] = _failing_polls(404)
+
+    records, _ = read(make_config(max_retries=3, polling_max_wait_seconds=1))
+
+    assert btg_api.polls() == 1
+    assert len(btg_api.submits()) == 1  # sem timeout, a janela 01..03 não é dividida
+    assert len(records) == 1 and "404" in records[0]["error"]
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(retry, "backoff", lambda attempt: 0)
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"HTTP {status}", response=response)
+
+
+@pytest.mark.parametrize("error, transient", [
+    (_http_error(500), True),
+    (_http_error(503), True),
+    (_http_error(429), True),
+    (_http_error(408), True),
+    (_http_error(400), False),
+    (_http_error(404), False),
+    (requests.Timeout("read timeout"), True),
+    (requests.ConnectionError("reset"), True),
+    (requests.exceptions.ChunkedEncodingError("truncado"), True),
+    (BadZipFile("File is not a zip file"), True),
+    (TimeoutError(), True),
+    (ValueError("contrato"), False),
+])
+def test_is_transient(error, transient):
+    assert is_transient(error) is transient
+
+
+def test_retry_call_honours_max_retries(no_backoff):
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        raise requests.ConnectionError("reset")
+
+    with pytest.raises(requests.ConnectionError):
+        retry_call(flaky, "teste", max_retries=2)
+    assert len(calls) == 3
+
+
+def test_retry_call_does_not_repeat_permanent_errors(no_backoff):
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise _http_error(400)
+
+    with pytest.raises(requests.HTTPError):
+        retry_call(broken, "teste", max_retries=5)
+    assert len(calls) == 1
+
+
+def _download_mode(btg_api, *bodies):
+    """Ticket pronto lista /files/r.zip; cada GET do arquivo devolve o próximo corpo (o último se repete)."""
+    btg_api.results["/reports/Cash/Cashflow"] = lambda ticket: (200, {"files": ["/files/r.zip"]}, "application/json")
+    served = []
+
+    def body():
+        served.append(1)
+        return bodies[min(len(served), len(bodies)) - 1]
+
+    btg_api.files["r.zip"] = body
+    return served
+
+
+def test_truncated_download_is_retried_without_resubmitting(btg_api, make_config, no_backoff):
+    archive = io.BytesIO()
+    with ZipFile(archive, "w") as zf:
+        zf.writestr("r.xml", XML)
+    served = _download_mode(btg_api, (200, archive.getvalue()[:40], "application/zip"),
+                            (200, archive.getvalue(), "application/zip"))
+
+    records, _ = read(make_config(end_date="2024-01-01", max_retries=2))
+
+    assert len(served) == 2
+    assert len(btg_api.submits()) == 1
+    assert records and not any("error" in r for r in records)
+
+
+def test_download_5xx_stops_after_max_retries(btg_api, make_config, no_backoff):
+    served = _download_mode(btg_api, (503, {"error": "HTTP 503"}, "application/json"))
+
+    records, _ = read(make_config(end_date="2024-01-01", max_retries=2))
+
+    assert len(served) == 3
+    assert len(btg_api.submits()) == 1
+    assert len(records) == 1 and "503" in records[0]["error"]
@@ -0,0 +1,127 @@
+from concurrent.futures import Future
+
+from airbyte_cdk.models import SyncMode
+
+from source_btg import SourceBtg
+from source_btg.plan import plan_sync
+from source_btg.streams.payload import Payload
+from source_btg.streams.shared import RequestRegistry
+from conftest import read
+
+GROUP = ("host", "client")
+
+
+def _registry(*consumers):
+    registry = RequestRegistry()
+    for consumer in consumers:
+        registry.join(GROUP, consumer)
+    return registry
+
+
+def _share(registry, key, consumer, events):
+    def start():
+        future = Future()
+        future.set_result(key)
+        return future
+
+    return registry.share(key, GROUP, consumer, start, lambda r: events.append(("release", r)),
+                          lambda r: events.append(("park", r)))
+
+
+def test_last_consumer_releases_the_result():
+    registry, events = _registry("a", "b"), []
+    _share(registry, "k", "a", events)
+    assert _share(registry, "k", "b", events)[1] is True
+
+    registry.done("k", "a")
+    assert events == [("park", "k")]
+    registry.done("k", "b")
+    assert events == [("park", "k"), ("release", "k")]
+
+
+def _plan(registry, consumer, keys):
+    registry.begin(consumer)
+    for key in keys:
+        registry.expect(consumer, key)
+    registry.finish(consumer)
+
+
+def test_plan_without_the_key_releases_it():
+    registry, events = _registry("a", "b"), []
+    _share(registry, "k1", "a", events)
+    _share(registry, "k2", "a", events)
+    registry.done("k1", "a")
+    registry.done("k2", "a")
+
+    _plan(registry, "b", ["k2"])
+
+    assert ("release", "k1") in events and ("release", "k2") not in events
+
+
+def test_open_plan_holds_keys_until_generation_ends():
+    registry, events = _registry("a", "b"), []
+    _share(registry, "k1", "a", events)
+    registry.done("k1", "a")
+
+    registry.begin("b")
+    registry.expect("b", "k2")
+    assert events == [("park", "k1")]
+
+    registry.finish("b")
+    assert events == [("park", "k1"), ("release", "k1")]
+
+
+def test_key_outside_other_plans_is_not_held():
+    registry, events = _registry("a", "b"), []
+    _plan(registry, "b", ["k2"])
+    _share(registry, "k1", "a", events)
+
+    registry.done("k1", "a")
+
+    assert events == [("release", "k1")]
+
+
+def test_spill_keeps_the_content():
+    payload = Payload.from_bytes(b"<Report/>" * 10)
+    payload.spill()
+
+    assert payload.spilled and payload.read() == b"<Report/>" * 10
+    payload.close()
+
+
+def _read(stream, state=None):
+    slices = list(stream.stream_slices(sync_mode=SyncMode.incremental, stream_state=state))
+    return [r for s in slices for r in stream.read_records(sync_mode=SyncMode.incremental, stream_slice=s,
+                                                           stream_state=state)]
+
+
+def test_categories_share_tickets_and_release_them(btg_api, make_config):
+    config = make_config(categories={"CAT1": {"enabled": True}, "CAT2": {"enabled": True}},
+                         enable_fluxo_caixa=False, enable_renda_fixa=True, share_spill_bytes=0)
+    source = SourceBtg()
+    first, second = source.streams(config)
+    registry = source.request_registry
+
+    records = _read(first)
+    assert records and not any("error" in r for r in records)
+    held = [entry.future.result() for entry in registry._entries.values()]
+    assert len(held) == 3 and all(r["status"]["payload"].spilled for r in held)
+
+    # a segunda categoria só pede o último dia: os outros resultados são liberados já no plano
+    records = _read(second, {second.name: "02/01/2024"})
+    assert records and not any("error" in r for r in records)
+    assert len(btg_api.submits()) == 3
+    assert registry._entries == {}
+
+
+def test_plan_counts_shared_requests_once(btg_api, make_config):
+    config = make_config(categories={"CAT1": {"enabled": True}, "CAT2": {"enabled": True}},
+                         enable_fluxo_caixa=False, enable_renda_fixa=True)
+
+    plan = plan_sync(SourceBtg(), config)
+
+    assert [(s["tickets"], s["shared"]) for s in plan["streams"]] == [(3, 0), (0, 3)]
+    assert plan["total"]["tickets"] == 3 and plan["total"]["shared"] == 3
+
+    read(config)
+    assert len(btg_api.submits()) == plan["total"]["tickets"]
@@ -0,0 +1,61 @@
+import io
+import zipfile
+
+from conftest import XML, last_state, read
+
+STREAM = "CAT1_cadastro_fundos"
+
+ROWS = [b"<Position><Asset>PETR4</Asset><Qty>10</Qty></Position>",
+        b"<Position><Asset>VALE3</Asset><Qty>20</Qty></Position>"]
+
+
+def _config(make_config):
+    return make_config(enable_fluxo_caixa=False, enable_cadastro_fundos=True)
+
+
+def _funds(records):
+    return [r for r in records if r.get("_ticket_id")]
+
+
+def _zipped(rows, date_time):
+    xml = b"<Report><Positions>" + b"".join(rows) + b"</Positions></Report>"
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(zipfile.ZipInfo("fundos.xml", date_time=date_time), xml)
+    return buffer.getvalue()
+
+
+def test_unchanged_snapshot_is_not_emitted_again(btg_api, make_config):
+    records, states = read(_config(make_config))
+    assert _funds(records) and not any("error" in r for r in records)
+
+    records, states = read(_config(make_config), state=last_state(states))
+    assert _funds(records) == []
+
+    btg_api.results["/reports/Fund"] = lambda ticket: (200, XML.replace(b"PETR4", b"BBAS3"), "application/xml")
+    records, _ = read(_config(make_config), state=last_state(states))
+    assert any("BBAS3" in str(r) for r in records)
+
+
+def test_reordered_rows_in_a_new_zip_are_unchanged(btg_api, make_config):
+    config = make_config(endpoints={"cadastro_fundos": {"record_path": "Report.Positions.Position"}})
+    btg_api.results["/reports/Fund"] = lambda ticket: (200, _zipped(ROWS, (2024, 1, 1, 8, 0, 0)), "application/zip")
+    records, states = read(config)
+    assert len(_funds(records)) == 2
+
+    reordered = _zipped(ROWS[::-1], (2024, 1, 2, 9, 30, 0))
+    btg_api.results["/reports/Fund"] = lambda ticket: (200, reordered, "application/zip")
+    records, _ = read(config, state=last_state(states))
+
+    assert _funds(records) == []
+
+
+def test_integers_beyond_64_bits_are_emitted(btg_api, make_config):
+    btg_api.results["/reports/Fund"] = lambda ticket: (200, {"result": [{"fundId": 2 ** 70}]}, "application/json")
+
+    records, states = read(_config(make_config))
+    assert _funds(records) and not any("error" in r for r in records)
+    assert str(2 ** 70) in str(records)
+
+    records, _ = read(_config(make_config), state=last_state(states))
+    assert _funds(records) == []
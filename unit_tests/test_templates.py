@@ -0,0 +1,59 @@
+import pytest
+
+from source_btg.streams import base_async
+from source_btg.streams.templates import RouteTemplate, TemplateError
+from conftest import read
+
+
+def test_render_fills_fields_and_keeps_literals():
+    template = RouteTemplate(
+        "t",
+        {"contract": {"date": "{{date_iso}}", "label": "de {{date_str}} a {{end_date_str}}!",
+                      "type": "{{report_type}}", "fixed": [1, None, True, "x"], "fundName": "{{fund_name}}"}},
+        {"q": "{{report_type}}"},
+        {"report_types": [1, 2], "fund_name": ["A", "B"]},
+        omit=["fund_name"],
+    )
+    context = {"date_iso": "2024-01-02", "date_str": "02/01/2024", "end_date_str": "03/01/2024", "report_type": 2}
+
+    body, params = template.render(context)
+
+    assert body == {"contract": {"date": "2024-01-02", "label": "de 02/01/2024 a 03/01/2024!", "type": "2",
+                                 "fixed": [1, None, True, "x"]}}
+    assert params == {"q": "2"}
+    assert template.render(context)[0] is not body
+    assert template.omitted_parameters == {"fund_name": ["A", "B"]}
+    assert list(template.combinations()) == [{"report_type": 1}, {"report_type": 2}]
+
+
+def test_render_reports_missing_slice_value():
+    template = RouteTemplate("t", {"d": "{{end_date_iso}}"}, {})
+
+    with pytest.raises(TemplateError, match="end_date_iso"):
+        template.render({"date_iso": "2024-01-01"})
+
+
+def test_unknown_placeholder_fails_at_compile_time():
+    with pytest.raises(TemplateError, match="fund_name"):
+        RouteTemplate("t", {"f": "{{fund_name}}"}, {})
+
+
+@pytest.mark.parametrize("max_concurrent_tickets", [1, 3])
+def test_template_error_only_fails_its_slice(btg_api, make_config, monkeypatch, max_concurrent_tickets):
+    render = base_async.AsyncJobStream._render_request
+
+    def failing(self, slice_ctx):
+        if slice_ctx.get("date_iso") == "2024-01-02":
+            raise TemplateError("template quebrado")
+        return render(self, slice_ctx)
+
+    monkeypatch.setattr(base_async.AsyncJobStream, "_render_request", failing)
+    config = make_config(enable_fluxo_caixa=False, enable_renda_fixa=True,
+                         max_concurrent_tickets=max_concurrent_tickets)
+
+    records, _ = read(config)
+
+    errors = [r for r in records if "error" in r]
+    assert [r["_dt_referencia"] for r in errors] == ["02/01/2024"]
+    assert "template quebrado" in errors[0]["error"]
+    assert {r["_dt_referencia"] for r in records if "error" not in r} == {"01/01/2024", "03/01/2024"}
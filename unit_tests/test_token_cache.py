@@ -0,0 +1,60 @@
+import os
+import threading
+
+import pytest
+
+from source_btg import token_cache
+from source_btg.token_cache import TokenCache, get_token_cache
+
+pytestmark = pytest.mark.skipif(not TokenCache.available(), reason="cryptography não instalado")
+
+URL = "https://auth.example/connect/token"
+
+
+def test_round_trip_is_encrypted(tmp_path):
+    cache = TokenCache(str(tmp_path))
+
+    cache.store(URL, "client", "secret", "tok-123", 1234.5)
+
+    assert cache.load(URL, "client", "secret") == ("tok-123", 1234.5)
+    (path,) = [p for p in tmp_path.iterdir() if p.suffix == ".token"]
+    assert b"tok-123" not in path.read_bytes()
+    assert oct(os.stat(path).st_mode & 0o777) == oct(0o600)
+
+
+def test_other_secret_or_corrupted_file_is_ignored(tmp_path):
+    cache = TokenCache(str(tmp_path))
+    cache.store(URL, "client", "secret", "tok-123", 1234.5)
+
+    assert cache.load(URL, "client", "outro") is None
+    (path,) = [p for p in tmp_path.iterdir() if p.suffix == ".token"]
+    path.write_bytes(path.read_bytes()[:-10])
+    assert cache.load(URL, "client", "secret") is None
+
+
+def test_clear_only_removes_the_given_token(tmp_path):
+    cache = TokenCache(str(tmp_path))
+    cache.store(URL, "client", "secret", "novo", 1234.5)
+
+    cache.clear(URL, "client", "secret", token="antigo")
+    assert cache.load(URL, "client", "secret") == ("novo", 1234.5)
+    cache.clear(URL, "client", "secret", token="novo")
+    assert cache.load(URL, "client", "secret") is None
+
+
+def test_one_instance_per_directory_across_threads(tmp_path, monkeypatch):
+    monkeypatch.setattr(token_cache, "_CACHES", {})
+    barrier = threading.Barrier(8)
+    found = []
+
+    def get():
+        barrier.wait()
+        found.append(get_token_cache(str(tmp_path)))
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len({id(c) for c in found}) == 1